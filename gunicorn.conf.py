@@ -0,0 +1,20 @@
+# Despliegue WSGI: gunicorn reservas_project.wsgi:application
+# (gunicorn carga este archivo automáticamente desde el directorio de trabajo)
+import multiprocessing
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Hilos por worker: las descargas y el SMTP dejan al worker esperando E/S
+# (con DB_POOL=True, DB_POOL_MAX_SIZE debería ser al menos GUNICORN_THREADS)
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+accesslog = '-'
+
+# LocMemCache es por proceso: con varios workers las versiones de caché (reservas.caching) no
+# se comparten y cada worker seguiría sirviendo datos viejos tras una escritura atendida por
+# otro. Sin un backend compartido configurado se usa el caché en archivo, común a la máquina.
+if workers > 1 and 'CACHE_BACKEND' not in os.environ:
+    os.environ['CACHE_BACKEND'] = 'django.core.cache.backends.filebased.FileBasedCache'
+    os.environ['CACHE_LOCATION'] = os.path.join(tempfile.gettempdir(), 'reservas-cache')
@@ -0,0 +1,19 @@
+# Despliegue ASGI: gunicorn reservas_project.asgi:application -c gunicorn_asgi.conf.py
+# Las vistas asíncronas (calendario, disponibilidad, exportaciones, recordatorios) atienden
+# muchas peticiones concurrentes por worker; las síncronas corren en hilos de asgiref.
+import multiprocessing
+import os
+import tempfile
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'uvicorn_worker.UvicornWorker'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '120'))
+accesslog = '-'
+
+# LocMemCache es por proceso: con varios workers las versiones de caché (reservas.caching) no
+# se comparten y cada worker seguiría sirviendo datos viejos tras una escritura atendida por
+# otro. Sin un backend compartido configurado se usa el caché en archivo, común a la máquina.
+if workers > 1 and 'CACHE_BACKEND' not in os.environ:
+    os.environ['CACHE_BACKEND'] = 'django.core.cache.backends.filebased.FileBasedCache'
+    os.environ['CACHE_LOCATION'] = os.path.join(tempfile.gettempdir(), 'reservas-cache')
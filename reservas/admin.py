@@ -1,6 +1,7 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import CustomUser, Space, Schedule, Reservation
+from .models import CustomUser, Space, Schedule, Reservation, ReservationSeries, ReportJob
+from .pagination import EstimatedCountPaginator
 
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
@@ -23,3 +24,19 @@ class ReservationAdmin(admin.ModelAdmin):
     list_display = ('space', 'date', 'schedule', 'user', 'status', 'created_at')
     list_filter = ('status', 'space', 'date')
     search_fields = ('user__username', 'space__name', 'purpose')
+    list_select_related = ('space', 'schedule', 'user')
+    ordering = ('-date', '-created_at', 'id')
+    # El ChangeList del admin pagina por número de página; se evitan los COUNT(*) exactos
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+@admin.register(ReservationSeries)
+class ReservationSeriesAdmin(admin.ModelAdmin):
+    list_display = ('space', 'schedule', 'frequency', 'start_date', 'until', 'user', 'status')
+    list_filter = ('status', 'frequency', 'space')
+    list_select_related = ('space', 'schedule', 'user')
+
+@admin.register(ReportJob)
+class ReportJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'format', 'status', 'requested_by', 'created_at', 'finished_at')
+    list_filter = ('format', 'status')
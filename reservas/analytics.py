@@ -0,0 +1,206 @@
+"""Estadísticas de reservas en columnas NumPy.
+
+Los hechos (espacio, intervalo reservado, día, estado y peso) se cargan con una sola consulta
+values_list y cada serie de los gráficos sale de operaciones vectorizadas
+(np.unique, np.bincount) en lugar de una agregación SQL por gráfico.
+
+Este módulo importa NumPy: las vistas lo importan dentro de las funciones que lo
+usan para no encarecer el arranque de los workers (ver StartupBudgetTests).
+"""
+from itertools import chain
+import numpy as np
+from django.db.models import Case, Func, IntegerField, Value, When
+from django.db.models.functions import ExtractHour, ExtractMinute
+from .models import DailySpaceUsage, Reservation, Space
+from .reports import filter_reservations
+
+STATUS_CODES = {code: i for i, (code, _) in enumerate(Reservation.STATUS_CHOICES)}
+CONFIRMED = STATUS_CODES['CONFIRMED']
+TOP_SPACES = 5
+MINUTES_PER_DAY = 24 * 60
+
+
+class EpochDay(Func):
+    """Días desde 1970-01-01 calculados en la base: evita convertir cada fila a datetime.date."""
+    output_field = IntegerField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="CAST(julianday(%(expressions)s) - 2440587.5 AS INTEGER)",
+                           **extra_context)
+
+    def as_postgresql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="(%(expressions)s - DATE '1970-01-01')", **extra_context)
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="DATEDIFF(%(expressions)s, '1970-01-01')", **extra_context)
+
+
+def _minutes(field):
+    return ExtractHour(field) * 60 + ExtractMinute(field)
+
+
+def _slot_code():
+    # Intervalo [inicio, fin) como un entero: minutos de inicio * 1440 + minutos de fin
+    return _minutes('start_time') * MINUTES_PER_DAY + _minutes('end_time')
+
+
+def slot_label(slot):
+    start, end = divmod(int(slot), MINUTES_PER_DAY)
+    return f"{start // 60:02d}:{start % 60:02d} - {end // 60:02d}:{end % 60:02d}"
+
+
+def _status_code():
+    return Case(*[When(status=code, then=Value(i)) for code, i in STATUS_CODES.items()],
+                output_field=IntegerField())
+
+
+class ReservationFacts:
+    """Una fila por hecho; `weight` es 1 por reserva o el conteo de una fila del rollup.
+
+    `slot` es el intervalo reservado codificado por _slot_code (ordenar por slot ordena por
+    hora de inicio); queda en -1 cuando los hechos vienen del rollup, que no distingue horas.
+    """
+
+    def __init__(self, space, slot, day, status, weight):
+        self.space = space
+        self.slot = slot
+        self.day = day
+        self.status = status
+        self.weight = weight
+
+    @classmethod
+    def _from_rows(cls, rows):
+        # Todas las columnas son enteros: un solo np.fromiter sobre las filas aplanadas
+        data = np.fromiter(chain.from_iterable(rows), dtype=np.int64).reshape(-1, 5)
+        return cls(
+            data[:, 0],
+            data[:, 1],
+            data[:, 2].astype('datetime64[D]'),
+            data[:, 3].astype(np.int8),
+            data[:, 4],
+        )
+
+    @classmethod
+    def from_reservations(cls, queryset):
+        """Hechos por reserva, con su intervalo; una consulta sin instanciar modelos."""
+        rows = (queryset.order_by()
+                .annotate(day=EpochDay('date'), status_code=_status_code(), slot=_slot_code(),
+                          one=Value(1, output_field=IntegerField()))
+                .values_list('space_id', 'slot', 'day', 'status_code', 'one'))
+        return cls._from_rows(rows.iterator(chunk_size=10000))
+
+    @classmethod
+    def from_usage(cls, queryset=None):
+        """Hechos del rollup DailySpaceUsage: una fila por espacio, día y estado, con peso."""
+        queryset = DailySpaceUsage.objects.all() if queryset is None else queryset
+        rows = (queryset.filter(count__gt=0).order_by()
+                .annotate(day=EpochDay('date'), status_code=_status_code(),
+                          no_slot=Value(-1, output_field=IntegerField()))
+                .values_list('space_id', 'no_slot', 'day', 'status_code', 'count'))
+        return cls._from_rows(rows.iterator(chunk_size=10000))
+
+    def total(self):
+        return int(self.weight.sum())
+
+    def _grouped(self, keys, mask=None):
+        """Suma de pesos por clave: (claves únicas ordenadas, totales)."""
+        if mask is not None:
+            keys, weights = keys[mask], self.weight[mask]
+        else:
+            weights = self.weight
+        unique, inverse = np.unique(keys, return_inverse=True)
+        return unique, np.bincount(inverse, weights=weights, minlength=len(unique)).astype(np.int64)
+
+    def by_status(self):
+        totals = np.bincount(self.status, weights=self.weight, minlength=len(STATUS_CODES)).astype(np.int64)
+        return {code: int(totals[i]) for code, i in STATUS_CODES.items()}
+
+    def by_month(self):
+        months, counts = self._grouped(self.day.astype('datetime64[M]'))
+        return [str(m) for m in months], counts.tolist()
+
+    def iso_weeks(self):
+        # Semana ISO: la que contiene el jueves; 1970-01-01 fue jueves
+        epoch = self.day.astype(np.int64)
+        weekday = (epoch + 3) % 7
+        thursday = (epoch - weekday + 3).astype('datetime64[D]')
+        jan1 = thursday.astype('datetime64[Y]').astype('datetime64[D]')
+        return (thursday - jan1).astype(np.int64) // 7 + 1
+
+    def confirmed_by_week(self):
+        """Reservas confirmadas por número de semana ISO (como ExtractWeek)."""
+        weeks, counts = self._grouped(self.iso_weeks(), self.status == CONFIRMED)
+        return [str(w) for w in weeks], counts.tolist()
+
+    def by_space(self, mask=None):
+        spaces, counts = self._grouped(self.space, mask)
+        return dict(zip(spaces.tolist(), counts.tolist()))
+
+    def top_spaces(self, n=TOP_SPACES):
+        spaces, counts = self._grouped(self.space)
+        # Orden estable por conteo descendente; a igualdad, el id menor primero
+        order = np.lexsort((spaces, -counts))[:n]
+        return list(zip(spaces[order].tolist(), counts[order].tolist()))
+
+    def by_slot(self):
+        """Reservas por intervalo, en orden de hora de inicio."""
+        slots, counts = self._grouped(self.slot, self.slot >= 0)
+        return dict(zip(slots.tolist(), counts.tolist()))
+
+    def by_key_and_status(self, keys, mask=None):
+        """Totales por clave y estado con un solo bincount: (claves ordenadas, matriz claves x estados)."""
+        status, weights = self.status, self.weight
+        if mask is not None:
+            keys, status, weights = keys[mask], status[mask], weights[mask]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        width = len(STATUS_CODES)
+        counts = np.bincount(inverse * width + status, weights=weights, minlength=len(unique) * width)
+        return unique, counts.astype(np.int64).reshape(-1, width)
+
+    def active_days(self):
+        return int(np.unique(self.day[self.weight > 0]).size)
+
+    def usage_rate(self, space_ids, schedule_count):
+        """Porcentaje de horarios confirmados por espacio sobre los días con actividad."""
+        confirmed = self.by_space(self.status == CONFIRMED)
+        total_slots = schedule_count * self.active_days() or 1
+        return [round(confirmed.get(pk, 0) / total_slots * 100, 1) for pk in space_ids]
+
+
+def filtered_stats(filters, space_names=None):
+    """Resumen de las reservas que cumplen los filtros de reportes (fechas, espacio, estado).
+
+    Una sola consulta si quien llama pasa `space_names` ({id: nombre}, p. ej. el desplegable
+    de espacios que ya cargó); si no, otra más para los nombres de los espacios destacados.
+    """
+    facts = ReservationFacts.from_reservations(filter_reservations(filters))
+    months, month_counts = facts.by_month()
+    per_slot = facts.by_slot()
+    top = facts.top_spaces()
+    spaces, space_totals = facts.by_key_and_status(facts.space)
+    slots, slot_totals = facts.by_key_and_status(facts.slot, facts.slot >= 0)
+    names = space_names
+    if names is None:
+        names = dict(Space.objects.filter(pk__in=spaces.tolist()).values_list('id', 'name'))
+    return {
+        'total': facts.total(),
+        'by_status': facts.by_status(),
+        'active_days': facts.active_days(),
+        'months': months,
+        'month_counts': month_counts,
+        'schedule_labels': [slot_label(slot) for slot in per_slot],
+        'schedule_counts': list(per_slot.values()),
+        'top_spaces': [(names.get(pk, str(pk)), n) for pk, n in top],
+        # Tablas de totales por espacio y por intervalo, de los mismos hechos (sin otra consulta)
+        'summary': {
+            'by_space': sorted((_totals_row(names.get(pk, str(pk)), row)
+                                for pk, row in zip(spaces.tolist(), space_totals.tolist())),
+                               key=lambda r: (-r['total'], r['label'])),
+            'by_schedule': [_totals_row(slot_label(slot), row)
+                            for slot, row in zip(slots.tolist(), slot_totals.tolist())],
+        },
+    }
+
+
+def _totals_row(label, counts):
+    return {'label': label, 'total': sum(counts), **{code: counts[i] for code, i in STATUS_CODES.items()}}
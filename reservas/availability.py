@@ -0,0 +1,131 @@
+from datetime import timedelta
+from .intervals import IntervalIndex
+from .models import Reservation, ReservationSeries, Schedule, Space
+
+
+class OccupancyGrid:
+    """Ocupación de un rango de fechas como un bitmap por (espacio, día).
+
+    El bit i de cada máscara corresponde al i-ésimo Schedule en orden de hora de
+    inicio; un bit en 1 significa que el horario se solapa con una reserva (en
+    cualquier estado, porque las rechazadas también ocupan su intervalo) o con una
+    ocurrencia de una serie no rechazada.
+    """
+
+    def __init__(self, start, end, spaces, schedules):
+        self.start = start
+        self.end = end
+        self.spaces = spaces
+        self.schedules = schedules
+        self.positions = {pk: i for i, (pk, *_) in enumerate(schedules)}
+        self.full_mask = (1 << len(schedules)) - 1
+        self.masks = {}
+        self._decoded = {}
+        self._index = IntervalIndex((start, end, i) for i, (_pk, start, end) in enumerate(schedules))
+        self._interval_masks = {}
+
+    def mark(self, space_id, day, schedule_id):
+        key = (space_id, day)
+        self.masks[key] = self.masks.get(key, 0) | (1 << self.positions[schedule_id])
+
+    def interval_mask(self, start, end):
+        """Bits de los horarios que se solapan con [start, end); se calcula una vez por intervalo."""
+        if (start, end) not in self._interval_masks:
+            mask = 0
+            for *_, i in self._index.overlapping(start, end):
+                mask |= 1 << i
+            self._interval_masks[(start, end)] = mask
+        return self._interval_masks[(start, end)]
+
+    def mark_interval(self, space_id, day, start, end):
+        key = (space_id, day)
+        self.masks[key] = self.masks.get(key, 0) | self.interval_mask(start, end)
+
+    def mark_series(self, series):
+        start, end = series.schedule.start_time, series.schedule.end_time
+        for day in series.dates(self.start, self.end):
+            self.mark_interval(series.space_id, day, start, end)
+
+    def days(self):
+        day = self.start
+        while day <= self.end:
+            yield day
+            day += timedelta(days=1)
+
+    def free_schedule_ids(self, space_id, day):
+        free = ~self.masks.get((space_id, day), 0) & self.full_mask
+        # Las máscaras se repiten mucho: cada una se decodifica una sola vez
+        if free not in self._decoded:
+            self._decoded[free] = tuple(pk for i, (pk, *_) in enumerate(self.schedules) if free >> i & 1)
+        return self._decoded[free]
+
+    def free_slots(self):
+        """Genera (space_id, schedule_id, date) libres."""
+        for space_id, *_ in self.spaces:
+            for day in self.days():
+                for schedule_id in self.free_schedule_ids(space_id, day):
+                    yield space_id, schedule_id, day
+
+
+def _grid_sources(start, end, space_type=None, min_capacity=None, space_ids=None):
+    spaces = Space.objects.filter(is_active=True)
+    if space_type:
+        spaces = spaces.filter(type=space_type)
+    if min_capacity:
+        spaces = spaces.filter(capacity__gte=min_capacity)
+    if space_ids is not None:
+        spaces = spaces.filter(pk__in=space_ids)
+    schedules = Schedule.objects.order_by('start_time').values_list('id', 'start_time', 'end_time')
+    taken = (Reservation.objects.order_by()
+             .filter(date__gte=start, date__lte=end, space__in=spaces)
+             .values_list('space_id', 'date', 'start_time', 'end_time'))
+    # Las series no tienen filas por ocurrencia: se expanden solo dentro del rango
+    series = (ReservationSeries.objects.exclude(status='REJECTED')
+              .filter(start_date__lte=end, until__gte=start, space__in=spaces)
+              .select_related('schedule')
+              .only('space_id', 'schedule__start_time', 'schedule__end_time',
+                    'frequency', 'start_date', 'until', 'exceptions'))
+    return spaces.values_list('id', 'name', 'type', 'capacity'), schedules, taken, series
+
+
+def occupancy_grid(start, end, space_type=None, min_capacity=None, space_ids=None):
+    """Construye la grilla con cuatro consultas: espacios, horarios, reservas y series del rango."""
+    spaces, schedules, taken, series = _grid_sources(start, end, space_type, min_capacity, space_ids)
+    grid = OccupancyGrid(start, end, list(spaces), list(schedules))
+    for space_id, day, start_time, end_time in taken.iterator(chunk_size=5000):
+        grid.mark_interval(space_id, day, start_time, end_time)
+    for s in series:
+        grid.mark_series(s)
+    return grid
+
+
+async def aoccupancy_grid(start, end, space_type=None, min_capacity=None, space_ids=None):
+    """Igual que occupancy_grid, con el ORM asíncrono para vistas ASGI."""
+    spaces, schedules, taken, series = _grid_sources(start, end, space_type, min_capacity, space_ids)
+    grid = OccupancyGrid(start, end, [row async for row in spaces], [row async for row in schedules])
+    # aiterator() falla con values_list() sin flat en Django 5.2: se recorre el queryset completo
+    async for space_id, day, start_time, end_time in taken:
+        grid.mark_interval(space_id, day, start_time, end_time)
+    async for s in series:
+        grid.mark_series(s)
+    return grid
+
+
+def space_occupancy(space_id, start, end, exclude=None):
+    """Grilla de un solo espacio con tres consultas (horarios, reservas y series), sin leer el espacio.
+
+    `exclude` omite una reserva, para que al editarla su propio horario no figure como ocupado.
+    """
+    _spaces, schedules, taken, series = _grid_sources(start, end, space_ids=[space_id])
+    if exclude:
+        taken = taken.exclude(pk=exclude)
+    grid = OccupancyGrid(start, end, [], list(schedules))
+    for space, day, start_time, end_time in taken:
+        grid.mark_interval(space, day, start_time, end_time)
+    for s in series:
+        grid.mark_series(s)
+    return grid
+
+
+def free_schedule_ids(space_id, day):
+    return occupancy_grid(day, day, space_ids=[space_id]).free_schedule_ids(space_id, day)
@@ -0,0 +1,168 @@
+from collections import Counter
+from datetime import timedelta
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from .models import Reservation, ReservationSeries, Space
+from .signals import apply_usage_deltas, record_changes
+
+SLOT_TAKEN_MESSAGE = "Ya existe una reserva para ese espacio y fecha que se solapa con ese horario."
+MAX_WEEKS = 20
+SERIES_MAX_DAYS = 366
+
+
+def overlapping_times(start, end, prefix=''):
+    """Filas cuyo intervalo [start_time, end_time) se solapa con [start, end)."""
+    return Q(**{f'{prefix}start_time__lt': end, f'{prefix}end_time__gt': start})
+
+
+def lock_space(space_id):
+    """Serializa las escrituras de un espacio hasta el final de la transacción en curso.
+
+    La restricción de exclusión de PostgreSQL no cubre las series (no tienen filas por
+    fecha), así que la comprobación y el guardado se protegen bloqueando la fila del
+    espacio con SELECT ... FOR UPDATE. En SQLite la transacción IMMEDIATE ya toma el
+    bloqueo de escritura al empezar y no hace falta otra consulta.
+    """
+    if connection.features.has_select_for_update:
+        list(Space.objects.select_for_update().filter(pk=space_id).values_list('pk', flat=True))
+
+
+def book_reservation(reserva):
+    """Guarda la reserva si su intervalo no se solapa con otra del mismo espacio y día.
+
+    La comprobación es una consulta por rango sobre res_space_day_start_idx dentro de la
+    transacción, con el espacio bloqueado (ver lock_space); un IntegrityError de la
+    restricción de exclusión se convierte en ValidationError.
+    """
+    start, end = reserva.resolve_times()
+    try:
+        with transaction.atomic():
+            lock_space(reserva.space_id)
+            if (Reservation.objects.overlapping(reserva.space_id, reserva.date, start, end)
+                    .exclude(pk=reserva.pk).exists()):
+                raise ValidationError(SLOT_TAKEN_MESSAGE)
+            if series_on(reserva.space_id, start, end, reserva.date, exclude=reserva.series_id):
+                raise ValidationError(SLOT_TAKEN_MESSAGE)
+            reserva.save()
+    except IntegrityError:
+        raise ValidationError(SLOT_TAKEN_MESSAGE)
+    return reserva
+
+
+def active_series():
+    return ReservationSeries.objects.exclude(status='REJECTED')
+
+
+def series_on(space_id, start, end, day, exclude=None):
+    """Series vigentes con una ocurrencia ese día en ese espacio cuyo horario se solapa con [start, end)."""
+    candidates = active_series().filter(overlapping_times(start, end, 'schedule__'), space_id=space_id,
+                                        start_date__lte=day, until__gte=day)
+    if exclude:
+        candidates = candidates.exclude(pk=exclude)
+    return [s for s in candidates if s.occurs_on(day)]
+
+
+def series_conflicts(series):
+    """Fechas de la serie ya ocupadas: una consulta contra Reservation y otra contra las demás series.
+
+    Para que el resultado siga valiendo al guardar hay que llamarla dentro de la
+    transacción que bloquea el espacio, como hace book_series.
+    """
+    dates = set(series.dates())
+    if not dates:
+        return []
+    start, end = series.schedule.start_time, series.schedule.end_time
+    taken = set(Reservation.objects
+                .filter(overlapping_times(start, end), space_id=series.space_id,
+                        date__gte=min(dates), date__lte=max(dates))
+                .values_list('date', flat=True))
+    others = (active_series()
+              .filter(overlapping_times(start, end, 'schedule__'), space_id=series.space_id,
+                      start_date__lte=max(dates), until__gte=min(dates))
+              .exclude(pk=series.pk))
+    for other in others:
+        taken.update(other.dates(min(dates), max(dates)))
+    return sorted(dates & taken)
+
+
+def book_series(series):
+    """Guarda la serie si ninguna de sus ocurrencias choca; no crea filas Reservation."""
+    with transaction.atomic():
+        lock_space(series.space_id)
+        conflicts = series_conflicts(series)
+        if conflicts:
+            raise ValidationError(
+                "Ya hay reservas para ese espacio y horario en: %(fechas)s.",
+                params={'fechas': ', '.join(d.strftime('%Y-%m-%d') for d in conflicts)},
+            )
+        series.save()
+    return series
+
+
+def materialize_series(series, start, end):
+    """Escribe como Reservation las ocurrencias de [start, end] y las marca como excepciones.
+
+    Se usa para el horizonte cercano (recordatorios, rollup, exportaciones); el resto
+    de la serie sigue generándose al vuelo. Las fechas ya ocupadas por otra reserva no
+    se crean ni se marcan: siguen siendo ocurrencias de la serie y se devuelven junto
+    con las creadas para que quien llama informe del conflicto.
+    """
+    dates = list(series.dates(start, end))
+    if not dates:
+        return [], []
+    with transaction.atomic():
+        lock_space(series.space_id)
+        schedule = series.schedule
+        taken = set(Reservation.objects
+                    .filter(overlapping_times(schedule.start_time, schedule.end_time),
+                            space_id=series.space_id, date__in=dates)
+                    .values_list('date', flat=True))
+        rows = [Reservation(
+            user_id=series.user_id, space_id=series.space_id, schedule_id=series.schedule_id,
+            start_time=schedule.start_time, end_time=schedule.end_time,
+            date=d, purpose=series.purpose, status=series.status, series=series,
+        ) for d in dates if d not in taken]
+        created = Reservation.objects.bulk_create(rows)
+        apply_usage_deltas(Counter((r.space_id, r.date, r.status) for r in created))
+        record_changes(created, 'CREATE')
+        if created:
+            series.exceptions = sorted(set(series.exceptions) | {r.date.isoformat() for r in created})
+            series.save(update_fields=['exceptions', 'updated_at'])
+    return created, sorted(taken)
+
+
+def book_weekly(reserva, weeks):
+    """Reserva el mismo espacio y horario durante `weeks` semanas con un solo bulk_create.
+
+    La comprobación va dentro de la transacción, igual que en book_reservation.
+    """
+    dates = [reserva.date + timedelta(weeks=i) for i in range(weeks)]
+    start, end = reserva.resolve_times()
+    rows = [Reservation(
+        user_id=reserva.user_id, space_id=reserva.space_id, schedule_id=reserva.schedule_id,
+        start_time=start, end_time=end, date=d, purpose=reserva.purpose, status=reserva.status,
+    ) for d in dates]
+    try:
+        with transaction.atomic():
+            lock_space(reserva.space_id)
+            taken = set(Reservation.objects
+                        .filter(overlapping_times(start, end), space_id=reserva.space_id, date__in=dates)
+                        .values_list('date', flat=True))
+            for series in (active_series().filter(overlapping_times(start, end, 'schedule__'),
+                                                  space_id=reserva.space_id,
+                                                  start_date__lte=dates[-1], until__gte=dates[0])):
+                taken.update(series.dates(dates[0], dates[-1]))
+            taken = sorted(taken.intersection(dates))
+            if taken:
+                raise ValidationError(
+                    "Ya hay reservas para ese espacio y horario en: %(fechas)s.",
+                    params={'fechas': ', '.join(d.strftime('%Y-%m-%d') for d in taken)},
+                )
+            created = Reservation.objects.bulk_create(rows)
+            # bulk_create no dispara señales: se actualiza el rollup a mano
+            apply_usage_deltas(Counter((r.space_id, r.date, r.status) for r in rows))
+            record_changes(created, 'CREATE')
+    except IntegrityError:
+        raise ValidationError(SLOT_TAKEN_MESSAGE)
+    return created
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import Counter
+from django.core.cache import cache
+
+VERSION_KEY = 'reservas:version:{}'
+_MISSING = object()
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _new_version():
+    # Si la clave de versión se pierde (expulsión del caché) se reinicia con un valor
+    # mayor que cualquier versión anterior, así nunca se reutilizan entradas viejas
+    return time.time_ns()
+
+
+def model_versions(*names):
+    keys = [VERSION_KEY.format(n) for n in names]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _new_version(), None)
+            found[key] = cache.get(key)
+        versions.append(found[key])
+    return versions
+
+
+def bump_version(*names):
+    for name in names:
+        key = VERSION_KEY.format(name)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, _new_version(), None)
+
+
+def versioned_key(name, models, *extra):
+    parts = [str(v) for v in model_versions(*models)] + [str(x) for x in extra]
+    return ':'.join(['reservas', name, *parts])
+
+
+def cached(name, models, builder, *extra, timeout=None):
+    """Devuelve builder() cacheado bajo una clave que cambia con la versión de `models`."""
+    key = versioned_key(name, models, *extra)
+    value = cache.get(key, _MISSING)
+    hit = value is not _MISSING
+    if not hit:
+        value = builder()
+        if timeout is None:
+            cache.set(key, value)
+        else:
+            cache.set(key, value, timeout)
+    with _stats_lock:
+        _stats[(name, 'hits' if hit else 'misses')] += 1
+    return value
+
+
+def cache_stats():
+    with _stats_lock:
+        snapshot = dict(_stats)
+    stats = {}
+    for (name, kind), n in snapshot.items():
+        stats.setdefault(name, {'hits': 0, 'misses': 0})[kind] = n
+    for entry in stats.values():
+        total = entry['hits'] + entry['misses']
+        entry['hit_ratio'] = round(entry['hits'] / total, 3) if total else 0
+    return stats
@@ -0,0 +1,32 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db.models import Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import ReservationChange
+
+
+def settled_change_version(since=0):
+    """Mayor id del registro de cambios por debajo del cual ya no puede aparecer otra fila.
+
+    En PostgreSQL los ids se reservan al insertar pero se ven al confirmar: una transacción
+    lenta puede hacer visible el id 10 después del 11. Un cursor que avanzara hasta el 11
+    perdería el 10 para siempre, así que se avanza solo por ids consecutivos; un hueco se
+    da por definitivo (transacción revertida) cuando la fila que lo sigue tiene más de
+    CHANGES_SETTLE_SECONDS. Sin filas nuevas basta una búsqueda por la clave primaria; si
+    las hay, una consulta más: la última fila asentada tras `since` (la subconsulta recorre
+    hacia atrás solo las filas recientes) y las que la siguen.
+    """
+    if not ReservationChange.objects.filter(id__gt=since).exists():
+        return since
+    cutoff = timezone.now() - timedelta(seconds=settings.CHANGES_SETTLE_SECONDS)
+    anchor = (ReservationChange.objects.filter(id__gt=since, created_at__lte=cutoff)
+              .order_by('-id').values('id')[:1])
+    rows = (ReservationChange.objects.filter(id__gte=Coalesce(Subquery(anchor), Value(since + 1)))
+            .order_by('id').values_list('id', 'created_at'))
+    version = since
+    for pk, created_at in rows:
+        if pk != version + 1 and created_at > cutoff:
+            break
+        version = pk
+    return version
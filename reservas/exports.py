@@ -0,0 +1,254 @@
+# openpyxl, xhtml2pdf y pypdf se importan dentro de las funciones que los usan, no al cargar las vistas
+import csv
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils import timezone
+from django.utils.http import content_disposition_header
+from .pdfparts import render_pdf_part
+
+EXCEL_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+PDF_CONTENT_TYPE = 'application/pdf'
+EXCEL_COLUMNS = ('id', 'user', 'space', 'date', 'schedule', 'status', 'created_at')
+CHUNK_SIZE = 2000
+# Exportación de filas crudas para integraciones: (content type, extensión)
+ROW_EXPORT_FORMATS = {'csv': ('text/csv; charset=utf-8', 'csv'), 'ndjson': ('application/x-ndjson', 'ndjson')}
+ROW_EXPORT_COLUMNS = ('id', 'user', 'space', 'date', 'start_time', 'end_time', 'status', 'created_at')
+# Filas por bloque enviado al cliente
+STREAM_BATCH_ROWS = 500
+# Renders PDF (solo CPU, sin base de datos) desde vistas asíncronas; acotado para no saturar el proceso
+RENDER_EXECUTOR = ThreadPoolExecutor(max_workers=settings.EXPORT_RENDER_WORKERS, thread_name_prefix='export-render')
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def reservation_rows(qs, chunk_size=CHUNK_SIZE):
+    """Filas planas de reservas leídas por bloques, sin instanciar modelos."""
+    rows = qs.values_list(
+        'id', 'user__username', 'space__name', 'date',
+        'start_time', 'end_time', 'status', 'created_at',
+    )
+    for pk, username, space, day, start, end, status, created_at in rows.iterator(chunk_size=chunk_size):
+        if created_at is not None and timezone.is_aware(created_at):
+            # Excel no admite fechas con zona horaria
+            created_at = timezone.make_naive(created_at)
+        yield (
+            pk, username, space, day,
+            f"{start.strftime('%H:%M')} - {end.strftime('%H:%M')}",
+            status, created_at,
+        )
+
+
+def write_reservations_xlsx(rows, fileobj):
+    """Escribe las filas con un libro write-only: openpyxl no retiene las celdas en memoria."""
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet('reservas')
+    ws.append(EXCEL_COLUMNS)
+    for row in rows:
+        ws.append(row)
+    wb.save(fileobj)
+
+
+def build_excel_file(qs):
+    # El libro se vuelca a un archivo temporal y se sirve por bloques desde disco
+    tmp = tempfile.TemporaryFile()
+    write_reservations_xlsx(reservation_rows(qs), tmp)
+    tmp.seek(0)
+    return tmp
+
+
+def excel_response(qs, filename='reservas.xlsx'):
+    return FileResponse(build_excel_file(qs), as_attachment=True, filename=filename, content_type=EXCEL_CONTENT_TYPE)
+
+
+def render_reservations_html(rows, first=True):
+    return render_to_string('reports/reservations_report.html', {'rows': rows, 'first': first})
+
+
+def pdf_executor():
+    """Pool de procesos para las partes del PDF si EXPORT_PDF_PROCESSES > 0; si no, los hilos de RENDER_EXECUTOR.
+
+    Los procesos se crean con spawn (el servidor tiene hilos: fork no es seguro) y se reutilizan
+    entre exportaciones, así xhtml2pdf se importa una vez por proceso.
+    """
+    global _process_pool
+    if settings.EXPORT_PDF_PROCESSES <= 0:
+        return RENDER_EXECUTOR
+    with _process_pool_lock:
+        if _process_pool is None:
+            _process_pool = ProcessPoolExecutor(max_workers=settings.EXPORT_PDF_PROCESSES,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return _process_pool
+
+
+def pdf_workers():
+    """Partes que el pool de pdf_executor() renderiza a la vez."""
+    if settings.EXPORT_PDF_PROCESSES > 0:
+        return settings.EXPORT_PDF_PROCESSES
+    return settings.EXPORT_RENDER_WORKERS
+
+
+def write_chunked_pdf(rows, fileobj, chunk_rows=None, executor=None, workers=None):
+    """Renderiza el reporte en partes de `chunk_rows` filas y las une con pypdf en fileobj.
+
+    xhtml2pdf crece más que linealmente con el tamaño de la tabla: cada parte es un PDF
+    independiente escrito a disco y solo hay 2 * `workers` en vuelo, así la memoria del
+    render depende del tamaño de la parte y no del total. La unión no está acotada igual:
+    PdfWriter conserva todas las páginas hasta escribir, así que su pico crece con el
+    tamaño del PDF final (del orden de sus bytes, muy por debajo del render monolítico).
+    Devuelve False si alguna parte falla; las partes pendientes se cancelan.
+    """
+    from pypdf import PdfWriter
+    chunk_rows = chunk_rows or settings.EXPORT_PDF_CHUNK_ROWS
+    if executor is None:
+        executor, workers = pdf_executor(), workers or pdf_workers()
+    max_pending = 2 * max(workers or 1, 1)
+    rows = iter(rows)
+    with tempfile.TemporaryDirectory(prefix='reservas-pdf-') as tmpdir:
+        paths, pending = [], deque()
+        ok = True
+        try:
+            while ok and (chunk := list(islice(rows, chunk_rows))):
+                path = os.path.join(tmpdir, f'{len(paths):06d}.pdf')
+                pending.append(executor.submit(render_pdf_part, render_reservations_html(chunk, first=not paths), path))
+                paths.append(path)
+                if len(pending) >= max_pending:
+                    ok = pending.popleft().result()
+            while ok and pending:
+                ok = pending.popleft().result()
+        finally:
+            # Tras un fallo o una excepción ninguna parte puede seguir escribiendo en tmpdir al borrarlo
+            for future in pending:
+                future.cancel()
+            wait(pending)
+        if not ok:
+            return False
+        if not paths:
+            # Sin filas: una parte con la tabla vacía
+            paths.append(os.path.join(tmpdir, 'vacio.pdf'))
+            if not render_pdf_part(render_reservations_html([]), paths[0]):
+                return False
+        writer = PdfWriter()
+        for path in paths:
+            writer.append(path)
+        writer.write(fileobj)
+    return True
+
+
+def write_reservations_pdf(qs, fileobj):
+    """Renderiza el reporte PDF en fileobj. Devuelve False si pisa reporta errores."""
+    return write_chunked_pdf(reservation_rows(qs), fileobj)
+
+
+def build_pdf_file(qs):
+    """PDF en un archivo temporal listo para servir por bloques, o None si falla el render."""
+    tmp = tempfile.TemporaryFile()
+    if not write_reservations_pdf(qs, tmp):
+        tmp.close()
+        return None
+    tmp.seek(0)
+    return tmp
+
+
+def raw_rows(qs, chunk_size=CHUNK_SIZE):
+    """Filas crudas en orden de id (recorre el índice de la clave primaria, sin ordenar)."""
+    rows = qs.order_by('id').values_list(
+        'id', 'user__username', 'space__name', 'date',
+        'start_time', 'end_time', 'status', 'created_at',
+    )
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield [v.isoformat() if hasattr(v, 'isoformat') else v for v in row]
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+class _Echo:
+    # csv.writer escribe en un "archivo" que devuelve la línea en lugar de guardarla
+    def write(self, value):
+        return value
+
+
+def csv_chunks(rows, batch_rows=STREAM_BATCH_ROWS):
+    writer = csv.writer(_Echo())
+    # El encabezado sale antes de la primera consulta: el primer byte no espera a la base
+    yield writer.writerow(ROW_EXPORT_COLUMNS)
+    for batch in _batches(rows, batch_rows):
+        yield ''.join(writer.writerow(row) for row in batch)
+
+
+def ndjson_chunks(rows, batch_rows=STREAM_BATCH_ROWS):
+    for batch in _batches(rows, batch_rows):
+        yield ''.join(json.dumps(dict(zip(ROW_EXPORT_COLUMNS, row)), ensure_ascii=False) + '\n' for row in batch)
+
+
+def gzip_chunks(chunks):
+    """Comprime al vuelo; Z_SYNC_FLUSH por bloque para que zlib no retenga los datos hasta el final."""
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        yield compressor.compress(chunk.encode('utf-8')) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def rows_response(qs, fmt, compress=False, asynchronous=False):
+    """Descarga en streaming de las filas filtradas en CSV o NDJSON, opcionalmente gzip.
+
+    Con asynchronous=True (peticiones ASGI) los bloques salen de un iterador asíncrono:
+    con uno síncrono Django lo consumiría entero antes de enviar el primer byte.
+    """
+    content_type, extension = ROW_EXPORT_FORMATS[fmt]
+    chunks = (csv_chunks if fmt == 'csv' else ndjson_chunks)(raw_rows(qs))
+    filename = f'reservas.{extension}'
+    if compress:
+        chunks, content_type, filename = gzip_chunks(chunks), 'application/gzip', filename + '.gz'
+    if asynchronous:
+        chunks = aiter_sync(chunks)
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
+
+
+async def aiter_sync(iterator):
+    """Recorre un generador síncrono que consulta la base desde el event loop, un bloque por salto de hilo.
+
+    sync_to_async es thread_sensitive: cada bloque corre en el hilo (y la conexión) del resto
+    de la petición, así el cursor de .iterator() sigue siendo válido entre bloques.
+    """
+    step = sync_to_async(next)
+    done = object()
+    try:
+        while (chunk := await step(iterator, done)) is not done:
+            yield chunk
+    finally:
+        # Si el cliente corta la descarga se cierra el generador (y su cursor) en el mismo hilo
+        await sync_to_async(iterator.close)()
+
+
+async def aread_chunks(fileobj, chunk_size=FileResponse.block_size):
+    read = sync_to_async(fileobj.read, thread_sensitive=False)
+    try:
+        while chunk := await read(chunk_size):
+            yield chunk
+    finally:
+        fileobj.close()
+
+
+def async_file_response(fileobj, filename, content_type):
+    """Descarga con iterador asíncrono: bajo ASGI un FileResponse se leería entero en memoria."""
+    response = StreamingHttpResponse(aread_chunks(fileobj), content_type=content_type)
+    response['Content-Disposition'] = content_disposition_header(True, filename)
+    return response
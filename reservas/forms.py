@@ -1,8 +1,10 @@
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
-from .models import CustomUser, Reservation, Schedule, Space
+from .models import CustomUser, Reservation, ReservationSeries, Schedule, Space
 from django.core.exceptions import ValidationError
 from datetime import date
+from .occupancy import slots
+from .booking import MAX_WEEKS, SERIES_MAX_DAYS
 
 class CustomUserCreationForm(UserCreationForm):
     class Meta:
@@ -65,14 +67,21 @@ class SpaceForm(forms.ModelForm):
         }
 
 class ReservationForm(forms.ModelForm):
+    weeks = forms.IntegerField(
+        label='Repetir semanalmente (semanas)', required=False, min_value=1, max_value=MAX_WEEKS, initial=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control'}),
+    )
+
     class Meta:
         model = Reservation
-        fields = ['space', 'date', 'schedule', 'purpose']
+        fields = ['space', 'date', 'schedule', 'start_time', 'end_time', 'purpose']
         widgets = {
             'date': forms.DateInput(attrs={
                 'type': 'date',
                 'class': 'form-control'
             }),
+            'start_time': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
+            'end_time': forms.TimeInput(attrs={'type': 'time', 'class': 'form-control'}),
             'purpose': forms.TextInput(attrs={
                 'placeholder': 'Motivo de la reserva',
                 'class': 'form-control'
@@ -82,8 +91,29 @@ class ReservationForm(forms.ModelForm):
             'space': 'Espacio',
             'date': 'Fecha',
             'schedule': 'Horario',
+            'start_time': 'Desde (opcional)',
+            'end_time': 'Hasta (opcional)',
             'purpose': 'Motivo'
         }
+        help_texts = {
+            'start_time': 'Deja las horas vacías para usar las del horario elegido.',
+        }
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Solo lo que usa Space.__str__ para las opciones
+        self.fields['space'].queryset = Space.objects.only('id', 'name', 'type')
+        # La repetición semanal solo aplica al crear
+        if self.instance.pk:
+            del self.fields['weeks']
+        elif not self.is_bound:
+            self._limit_to_free_schedules()
+    def _limit_to_free_schedules(self):
+        try:
+            space_id = int(self.initial.get('space'))
+            day = date.fromisoformat(str(self.initial.get('date')))
+        except (TypeError, ValueError):
+            return
+        self.fields['schedule'].queryset = Schedule.objects.filter(pk__in=slots.free_schedule_ids(space_id, day))
     def clean_date(self):
         d = self.cleaned_data['date']
         if d < date.today():
@@ -91,13 +121,56 @@ class ReservationForm(forms.ModelForm):
         return d
     def clean(self):
         cleaned = super().clean()
-        space = cleaned.get('space')
-        date_v = cleaned.get('date')
-        schedule = cleaned.get('schedule')
-        if space and date_v and schedule:
-            exists = Reservation.objects.filter(space=space, date=date_v, schedule=schedule).exists()
-            if exists:
-                raise ValidationError("Ya existe una reserva para ese espacio, fecha y horario.")
+        start, end = cleaned.get('start_time'), cleaned.get('end_time')
+        if (start is None) != (end is None):
+            raise ValidationError("Indica ambas horas o deja las dos vacías.")
+        # El orden de las horas y los solapamientos los valida Reservation.clean() con una
+        # consulta por índice; el bitmap de occupancy.py solo filtra los horarios ofrecidos
+        return cleaned
+
+class ReservationSeriesForm(forms.ModelForm):
+    exceptions_text = forms.CharField(
+        label='Fechas a omitir', required=False,
+        help_text='Fechas aaaa-mm-dd separadas por comas (festivos, semana de exámenes...).',
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': '2025-04-14, 2025-04-16'}),
+    )
+
+    class Meta:
+        model = ReservationSeries
+        fields = ['space', 'schedule', 'frequency', 'start_date', 'until', 'purpose']
+        widgets = {
+            'start_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+            'until': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+            'purpose': forms.TextInput(attrs={'placeholder': 'Motivo de la reserva', 'class': 'form-control'}),
+        }
+        labels = {
+            'space': 'Espacio',
+            'schedule': 'Horario',
+            'frequency': 'Frecuencia',
+            'start_date': 'Primera fecha',
+            'until': 'Hasta',
+            'purpose': 'Motivo',
+        }
+    def clean_start_date(self):
+        d = self.cleaned_data['start_date']
+        if d < date.today():
+            raise ValidationError("No puedes reservar en fechas pasadas.")
+        return d
+    def clean_exceptions_text(self):
+        try:
+            return sorted({date.fromisoformat(d.strip()).isoformat()
+                           for d in self.cleaned_data['exceptions_text'].split(',') if d.strip()})
+        except ValueError:
+            raise ValidationError("Usa fechas con formato aaaa-mm-dd separadas por comas.")
+    def clean(self):
+        cleaned = super().clean()
+        start, until = cleaned.get('start_date'), cleaned.get('until')
+        if start and until:
+            if until < start:
+                raise ValidationError("La fecha final debe ser posterior a la primera fecha.")
+            if (until - start).days > SERIES_MAX_DAYS:
+                raise ValidationError("Una serie no puede durar más de un año.")
+        self.instance.exceptions = cleaned.get('exceptions_text') or []
         return cleaned
 
 class ScheduleForm(forms.ModelForm):
@@ -0,0 +1,95 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+from django.conf import settings
+from django.core.cache import cache
+
+SNAPSHOT_KEY = 'reservas:perf:{}'
+REGISTRY_KEY = 'reservas:perf:pids'
+# Intervalos de publicación sin noticias de un worker antes de descartar sus muestras
+SNAPSHOT_TTL_INTERVALS = 6
+METRICS = ('wall_ms', 'queries', 'db_ms', 'bytes')
+
+
+class SampleBuffer:
+    """Ring buffer en memoria del proceso, una cola acotada por vista."""
+
+    def __init__(self, size):
+        self.size = size
+        self.samples = {}
+        self.lock = threading.Lock()
+        self.last_publish = 0.0
+
+    def add(self, view, sample):
+        with self.lock:
+            if view not in self.samples:
+                self.samples[view] = deque(maxlen=self.size)
+            self.samples[view].append(sample)
+
+    def snapshot(self):
+        with self.lock:
+            return {view: list(samples) for view, samples in self.samples.items()}
+
+    def clear(self):
+        with self.lock:
+            self.samples.clear()
+
+
+buffer = SampleBuffer(getattr(settings, 'PERF_BUFFER_SIZE', 500))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def summarize(snapshot):
+    summary = {}
+    for view, samples in sorted(snapshot.items()):
+        entry = {'samples': len(samples)}
+        for metric in METRICS:
+            values = [s[metric] for s in samples]
+            entry[metric] = {f'p{p}': round(percentile(values, p), 2) for p in (50, 95, 99)}
+        duplicates = Counter()
+        for s in samples:
+            duplicates.update(dict(s['duplicates']))
+        entry['duplicate_queries'] = duplicates.most_common(5)
+        summary[view] = entry
+    return summary
+
+
+def publish(force=False):
+    """Copia las muestras del proceso al caché para que `perf_dump` las lea desde otro proceso.
+
+    Cada copia vence a los SNAPSHOT_TTL_INTERVALS intervalos de publicación: las de workers
+    ya reciclados por gunicorn desaparecen, y con ellas su entrada del registro de pids.
+    """
+    interval = getattr(settings, 'PERF_PUBLISH_SECONDS', 10)
+    now = time.monotonic()
+    if not force and now - buffer.last_publish < interval:
+        return
+    buffer.last_publish = now
+    pid = os.getpid()
+    ttl = max(interval, 1) * SNAPSHOT_TTL_INTERVALS
+    cache.set(SNAPSHOT_KEY.format(pid), buffer.snapshot(), ttl)
+    # Se reescribe en cada publicación: un pid perdido por una escritura concurrente vuelve solo
+    alive = set(live_snapshots(cache.get(REGISTRY_KEY) or ()))
+    cache.set(REGISTRY_KEY, sorted(alive | {pid}), ttl)
+
+
+def live_snapshots(pids):
+    """{pid: muestras} de los pids cuya copia no venció."""
+    keys = {SNAPSHOT_KEY.format(pid): pid for pid in pids}
+    return {keys[key]: samples for key, samples in cache.get_many(keys).items()}
+
+
+def published_snapshot():
+    merged = {}
+    for snapshot in live_snapshots(cache.get(REGISTRY_KEY) or ()).values():
+        for view, samples in snapshot.items():
+            merged.setdefault(view, []).extend(samples)
+    return merged
@@ -0,0 +1,40 @@
+from bisect import bisect_left, insort
+from itertools import accumulate
+
+
+def overlaps(start, end, other_start, other_end):
+    """Intervalos semiabiertos [inicio, fin): 08:00-10:00 y 10:00-12:00 no se solapan."""
+    return start < other_end and other_start < end
+
+
+class IntervalIndex:
+    """Intervalos de un espacio y día ordenados por inicio, con el máximo fin acumulado.
+
+    Hay solapamiento con [start, end) si algún intervalo que empieza antes de `end`
+    termina después de `start`: una búsqueda binaria sobre los inicios y una lectura
+    del máximo acumulado, O(log n), aunque los datos antiguos tengan solapes entre sí.
+    """
+
+    def __init__(self, intervals=()):
+        self.intervals = sorted(intervals)
+        self._reindex()
+
+    def _reindex(self):
+        self.starts = [start for start, _end, *_ in self.intervals]
+        self.max_end = list(accumulate((end for _start, end, *_ in self.intervals), max))
+
+    def overlaps(self, start, end):
+        i = bisect_left(self.starts, end)
+        return i > 0 and self.max_end[i - 1] > start
+
+    def overlapping(self, start, end):
+        """Intervalos que se solapan con [start, end), en orden de inicio."""
+        i = bisect_left(self.starts, end)
+        return [iv for iv in self.intervals[:i] if iv[1] > start]
+
+    def add(self, start, end, *payload):
+        insort(self.intervals, (start, end, *payload))
+        self._reindex()
+
+    def __len__(self):
+        return len(self.intervals)
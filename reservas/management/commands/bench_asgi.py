@@ -0,0 +1,133 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import date, timedelta
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+import json
+import os
+import shlex
+import socket
+import subprocess
+import time as _time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+from reservas.instrumentation import percentile
+from reservas.models import CustomUser
+
+SERVERS = {
+    'wsgi': 'gunicorn reservas_project.wsgi:application -c gunicorn.conf.py --bind 127.0.0.1:{port}',
+    'asgi': 'gunicorn reservas_project.asgi:application -c gunicorn_asgi.conf.py --bind 127.0.0.1:{port}',
+}
+
+
+class Command(BaseCommand):
+    help = ('Levanta el proyecto con gunicorn en modo WSGI y en modo ASGI (uvicorn) y compara el '
+            'throughput de peticiones concurrentes a las vistas asíncronas. Usa la base configurada: '
+            'conviene cargar datos antes con bench_reservas --use-current-db --keepdb.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modes', nargs='+', choices=sorted(SERVERS), default=['wsgi', 'asgi'])
+        parser.add_argument('--wsgi-command', default=SERVERS['wsgi'])
+        parser.add_argument('--asgi-command', default=SERVERS['asgi'])
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--workers', type=int, default=2, help='WEB_CONCURRENCY de ambos servidores.')
+        parser.add_argument('--concurrency', type=int, default=32, help='Peticiones simultáneas.')
+        parser.add_argument('--requests', type=int, default=200, help='Peticiones por ruta y modo.')
+        parser.add_argument('--username', default='bench-asgi')
+        parser.add_argument('--output', help='Archivo donde guardar los resultados en JSON.')
+
+    def handle(self, *args, **options):
+        cookie = self.session_cookie(options['username'])
+        results = {}
+        for mode in options['modes']:
+            command = options[f'{mode}_command'].format(port=options['port'])
+            self.stdout.write(f'[{mode}] {command}')
+            with self.server(command, options['port'], options['workers']):
+                results[mode] = {name: self.run(url, cookie, options) for name, url in self.targets(options['port'])}
+        self.print_table(results)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(results, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+
+    def session_cookie(self, username):
+        # Sesión de administrador guardada en la base que usarán los servidores
+        user, _ = CustomUser.objects.get_or_create(username=username, defaults={'role': 'ADMIN'})
+        client = Client()
+        client.force_login(user)
+        return f"{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}"
+
+    def targets(self, port):
+        today = date.today()
+        base = f'http://127.0.0.1:{port}'
+        return [
+            ('calendar-events', base + reverse('calendar-events') + '?' + urlencode({
+                'start': today.isoformat(), 'end': (today + timedelta(days=35)).isoformat()})),
+            ('availability', base + reverse('availability') + '?' + urlencode({
+                'fecha_inicio': today.isoformat(), 'fecha_fin': (today + timedelta(days=7)).isoformat()})),
+            ('reservation-changes', base + reverse('reservation-changes') + '?since=0'),
+            ('export-pdf', base + reverse('export-pdf') + '?' + urlencode({
+                'fecha_inicio': today.isoformat(), 'fecha_fin': today.isoformat()})),
+        ]
+
+    @contextmanager
+    def server(self, command, port, workers):
+        proc = subprocess.Popen(shlex.split(command), env={**os.environ, 'WEB_CONCURRENCY': str(workers)},
+                                cwd=settings.BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            deadline = _time.monotonic() + 30
+            while True:
+                if proc.poll() is not None:
+                    raise CommandError(f'El servidor terminó al arrancar: {command}')
+                try:
+                    socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+                    break
+                except OSError:
+                    if _time.monotonic() > deadline:
+                        raise CommandError(f'El servidor no respondió en 30 s: {command}')
+                    _time.sleep(0.2)
+            yield proc
+        finally:
+            proc.terminate()
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    def run(self, url, cookie, options):
+        def fetch(_):
+            t0 = _time.perf_counter()
+            try:
+                with urlopen(Request(url, headers={'Cookie': cookie}), timeout=60) as response:
+                    response.read()
+                    ok = response.status < 500
+            except HTTPError as exc:
+                ok = exc.code < 500
+            except URLError:
+                ok = False
+            return (_time.perf_counter() - t0) * 1000, ok
+
+        inicio = _time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            samples = list(pool.map(fetch, range(options['requests'])))
+        wall = _time.perf_counter() - inicio
+        latencies = [ms for ms, _ in samples]
+        return {
+            'requests': len(samples),
+            'errors': sum(1 for _, ok in samples if not ok),
+            'throughput_rps': round(len(samples) / wall, 2) if wall else 0,
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+        }
+
+    def print_table(self, results):
+        self.stdout.write(f"{'modo':<6} {'ruta':<22} {'n':>6} {'err':>4} {'req/s':>8} {'p50':>9} {'p95':>9}")
+        for mode, routes in results.items():
+            for name, r in routes.items():
+                self.stdout.write(
+                    f"{mode:<6} {name:<22} {r['requests']:>6} {r['errors']:>4} {r['throughput_rps']:>8} "
+                    f"{r['p50_ms']:>9} {r['p95_ms']:>9}"
+                )
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from datetime import date, datetime, time, timedelta
+import io
+import tempfile
+import time as _time
+import tracemalloc
+from reservas.exports import EXCEL_COLUMNS, write_reservations_xlsx
+
+
+def synthetic_rows(n):
+    start, end = time(8, 0), time(10, 0)
+    base_day = date(2025, 1, 1)
+    base_created = datetime(2024, 12, 1, 9, 30)
+    for i in range(n):
+        yield (
+            i + 1, f'usuario{i % 500}', f'Aula {i % 200}', base_day + timedelta(days=i % 365),
+            f"{start.strftime('%H:%M')} - {end.strftime('%H:%M')}",
+            'CONFIRMED', base_created + timedelta(minutes=i),
+        )
+
+
+def legacy_export(rows):
+    # Réplica de la exportación anterior: lista de dicts + DataFrame + BytesIO
+    import pandas as pd
+    data = [dict(zip(EXCEL_COLUMNS, r)) for r in rows]
+    df = pd.DataFrame(data)
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, index=False, sheet_name='reservas')
+    output.seek(0)
+    return len(output.read())
+
+
+def streaming_export(rows):
+    with tempfile.TemporaryFile() as tmp:
+        write_reservations_xlsx(rows, tmp)
+        return tmp.tell()
+
+
+class Command(BaseCommand):
+    help = 'Compara el pico de memoria de la exportación Excel anterior (pandas) con la exportación por streaming.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 50000])
+        parser.add_argument('--skip-legacy', action='store_true')
+
+    def measure(self, func, n):
+        tracemalloc.start()
+        t0 = _time.perf_counter()
+        size = func(synthetic_rows(n))
+        elapsed = _time.perf_counter() - t0
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return elapsed, peak, size
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'filas':>8} {'modo':>10} {'seg':>8} {'pico MiB':>10} {'bytes':>12}")
+        for n in options['rows']:
+            modes = [('streaming', streaming_export)]
+            if not options['skip_legacy']:
+                modes.insert(0, ('pandas', legacy_export))
+            for name, func in modes:
+                elapsed, peak, size = self.measure(func, n)
+                self.stdout.write(f'{n:>8} {name:>10} {elapsed:>8.2f} {peak / 2**20:>10.1f} {size:>12}')
@@ -0,0 +1,66 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import multiprocessing
+import os
+import resource
+import tempfile
+import time as _time
+from django.core.management.base import BaseCommand
+from reservas.exports import render_reservations_html, write_chunked_pdf
+from reservas.pdfparts import render_pdf_part
+from reservas.management.commands.bench_export_excel import synthetic_rows
+
+
+def monolithic_export(rows, _options):
+    # Réplica del render anterior: todas las filas en un solo HTML para pisa
+    with tempfile.NamedTemporaryFile(suffix='.pdf') as tmp:
+        render_pdf_part(render_reservations_html(list(rows)), tmp.name)
+        return tmp.seek(0, 2)
+
+
+def chunked_export(rows, options, executor):
+    with tempfile.TemporaryFile() as tmp:
+        write_chunked_pdf(rows, tmp, chunk_rows=options['chunk_rows'], executor=executor, workers=options['workers'])
+        return tmp.tell()
+
+
+class Command(BaseCommand):
+    help = ('Compara el reporte PDF en un solo render con el render por partes unidas con pypdf, '
+            'con hilos o con procesos. La memoria es el RSS máximo del proceso principal: el render en un '
+            'solo HTML se mide al final porque el máximo solo crece (tracemalloc hace a pisa ~30 veces más lento).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--chunk-rows', type=int, default=250)
+        parser.add_argument('--workers', type=int, default=max(multiprocessing.cpu_count(), 2))
+        parser.add_argument('--monolithic-max-rows', type=int, default=10000,
+                            help='No corre el render en un solo HTML por encima de estas filas '
+                                 '(crece más que linealmente: 1000 filas ~11 s, 10000 varios minutos).')
+
+    def measure(self, func, n, *args):
+        t0 = _time.perf_counter()
+        size = func(synthetic_rows(n), *args)
+        elapsed = _time.perf_counter() - t0
+        return elapsed, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, size
+
+    def handle(self, *args, **options):
+        threads = ThreadPoolExecutor(max_workers=options['workers'])
+        processes = ProcessPoolExecutor(max_workers=options['workers'], mp_context=multiprocessing.get_context('spawn'))
+        # Calienta los procesos para no medir el import de xhtml2pdf
+        with tempfile.TemporaryDirectory() as tmpdir:
+            list(processes.map(render_pdf_part, ['<p>-</p>'] * options['workers'],
+                               [os.path.join(tmpdir, f'{i}.pdf') for i in range(options['workers'])]))
+        self.stdout.write(f"{'filas':>8} {'modo':>12} {'seg':>8} {'RSS máx MiB':>12} {'bytes':>12}")
+        try:
+            for n in options['rows']:
+                for name, func, *extra in (('procesos', chunked_export, options, processes),
+                                           ('hilos', chunked_export, options, threads)):
+                    self.report(n, name, *self.measure(func, n, *extra))
+            for n in options['rows']:
+                if n <= options['monolithic_max_rows']:
+                    self.report(n, 'monolitico', *self.measure(monolithic_export, n, options))
+        finally:
+            threads.shutdown()
+            processes.shutdown()
+
+    def report(self, n, name, elapsed, rss_mb, size):
+        self.stdout.write(f'{n:>8} {name:>12} {elapsed:>8.2f} {rss_mb:>12.1f} {size:>12}')
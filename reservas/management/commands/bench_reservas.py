@@ -0,0 +1,199 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+import json
+import os
+import random
+import subprocess
+import time as _time
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from django.utils import timezone
+from reservas.instrumentation import percentile
+from reservas.models import CustomUser, Reservation, Schedule, Space
+
+BENCH_PASSWORD = 'bench-clave-123'
+FLOWS = ('login', 'reservation-create', 'reservation-list', 'calendar', 'dashboard', 'export-excel', 'export-pdf')
+
+
+class Command(BaseCommand):
+    help = ('Genera un conjunto de datos sintético y simula clientes concurrentes sobre los flujos '
+            'de reserva y reportes, reportando throughput y percentiles de latencia por flujo.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--spaces', type=int, default=50)
+        parser.add_argument('--schedules', type=int, default=8)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--years', type=float, default=1.0)
+        parser.add_argument('--density', type=float, default=0.25, help='Fracción de horarios ocupados.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--clients', type=int, default=8,
+                            help='Clientes simulados en paralelo (administradores, para cubrir las exportaciones).')
+        parser.add_argument('--iterations', type=int, default=5, help='Recorridos de los flujos por cliente.')
+        parser.add_argument('--export-days', type=int, default=7, help='Rango de fechas de las exportaciones.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Archivo donde guardar los resultados en JSON.')
+        parser.add_argument('--use-current-db', action='store_true',
+                            help='Usa la base configurada en lugar de una base de pruebas temporal.')
+        parser.add_argument('--keepdb', action='store_true', help='No destruye la base de pruebas al terminar.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = None
+        if not options['use_current_db']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            dataset = self.generate(options)
+            results = self.run_clients(options)
+        finally:
+            connections.close_all()
+            if old_name is not None and not options['keepdb']:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        report = {
+            'commit': self.git_commit(),
+            'timestamp': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'dataset': dataset,
+            'clients': options['clients'],
+            'iterations': options['iterations'],
+            'flows': results,
+        }
+        self.print_table(results)
+        if options['output']:
+            with open(options['output'], 'w') as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Resultados guardados en {options['output']}"))
+
+    def generate(self, options):
+        rnd = random.Random(options['seed'])
+        batch = options['batch_size']
+        inicio = _time.perf_counter()
+        spaces = Space.objects.bulk_create(
+            [Space(name=f'Bench {i:04d}', capacity=rnd.randint(10, 120), type=rnd.choice(('AULA', 'LAB', 'SALA')))
+             for i in range(options['spaces'])], batch_size=batch)
+        # Bloques de 30 minutos desde las 06:00 (máximo 36 en un día)
+        base = datetime.combine(date.today(), time(6))
+        schedules = Schedule.objects.bulk_create(
+            [Schedule(start_time=(base + timedelta(minutes=30 * i)).time(),
+                      end_time=(base + timedelta(minutes=30 * (i + 1))).time())
+             for i in range(min(options['schedules'], 36))], batch_size=batch)
+        password = make_password(BENCH_PASSWORD)
+        users = CustomUser.objects.bulk_create(
+            [CustomUser(username=f'bench{i:05d}', email=f'bench{i:05d}@ejemplo.com', password=password,
+                        role='ADMIN' if i < options['clients'] else 'USER')
+             for i in range(max(options['users'], options['clients']))], batch_size=batch)
+
+        days = int(options['years'] * 365)
+        start = date.today() - timedelta(days=days - 60)
+        rows = []
+        total = 0
+        for d in range(days):
+            day = start + timedelta(days=d)
+            for space in spaces:
+                for schedule in schedules:
+                    if rnd.random() >= options['density']:
+                        continue
+                    rows.append(Reservation(
+                        user=rnd.choice(users), space=space, schedule=schedule, date=day,
+                        status=rnd.choice(('PENDING', 'CONFIRMED', 'CONFIRMED', 'REJECTED')),
+                    ))
+                    if len(rows) >= batch:
+                        Reservation.objects.bulk_create(rows)
+                        total += len(rows)
+                        rows = []
+        Reservation.objects.bulk_create(rows)
+        total += len(rows)
+        # bulk_create no dispara señales: se reconstruye el rollup y se descarta el caché
+        call_command('rebuild_rollups', stdout=open(os.devnull, 'w'))
+        cache.clear()
+        elapsed = _time.perf_counter() - inicio
+        self.stdout.write(f'Datos generados: {total} reservas en {elapsed:.1f}s')
+        return {
+            'spaces': len(spaces), 'schedules': len(schedules), 'users': len(users),
+            'reservations': total, 'seconds': round(elapsed, 2),
+        }
+
+    def run_clients(self, options):
+        admins = list(CustomUser.objects.filter(role='ADMIN', username__startswith='bench')
+                      .order_by('pk')[:options['clients']])
+        spaces = list(Space.objects.values_list('pk', flat=True))
+        schedules = list(Schedule.objects.values_list('pk', flat=True))
+        today = date.today()
+        export_filter = {
+            'fecha_inicio': today.isoformat(),
+            'fecha_fin': (today + timedelta(days=options['export_days'])).isoformat(),
+        }
+
+        def simulate(index):
+            rnd = random.Random(options['seed'] + index)
+            user = admins[index]
+            client = Client(raise_request_exception=False)
+            samples = {flow: [] for flow in FLOWS}
+            errors = {flow: 0 for flow in FLOWS}
+
+            def timed(flow, method, url, data=None):
+                t0 = _time.perf_counter()
+                response = getattr(client, method)(url, data or {})
+                if response.streaming:
+                    b''.join(response.streaming_content)
+                samples[flow].append((_time.perf_counter() - t0) * 1000)
+                if response.status_code >= 500:
+                    errors[flow] += 1
+
+            timed('login', 'post', reverse('login'), {'username': user.username, 'password': BENCH_PASSWORD})
+            for _ in range(options['iterations']):
+                timed('reservation-create', 'post', reverse('reservation-create'), {
+                    'space': rnd.choice(spaces), 'schedule': rnd.choice(schedules),
+                    'date': (today + timedelta(days=rnd.randint(1, 90))).isoformat(), 'purpose': 'bench',
+                })
+                timed('reservation-list', 'get', reverse('reservation-list'))
+                month = today.replace(day=1)
+                timed('calendar', 'get', reverse('calendar'))
+                timed('calendar', 'get', reverse('calendar-events'), {
+                    'start': month.isoformat(), 'end': (month + timedelta(days=42)).isoformat(),
+                })
+                timed('dashboard', 'get', reverse('dashboard'))
+                timed('export-excel', 'get', reverse('export-excel'), export_filter)
+                timed('export-pdf', 'get', reverse('export-pdf'), export_filter)
+            connections.close_all()
+            return samples, errors
+
+        inicio = _time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['clients']) as pool:
+            outcomes = list(pool.map(simulate, range(len(admins))))
+        wall = _time.perf_counter() - inicio
+
+        results = {}
+        for flow in FLOWS:
+            latencies = [ms for samples, _ in outcomes for ms in samples[flow]]
+            results[flow] = {
+                'requests': len(latencies),
+                'errors': sum(errors[flow] for _, errors in outcomes),
+                'throughput_rps': round(len(latencies) / wall, 2) if wall else 0,
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+            }
+        return results
+
+    def print_table(self, results):
+        self.stdout.write(f"{'flujo':<20} {'n':>6} {'err':>4} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+        for flow, r in results.items():
+            self.stdout.write(
+                f"{flow:<20} {r['requests']:>6} {r['errors']:>4} {r['throughput_rps']:>8} "
+                f"{r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}"
+            )
+
+    def git_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                                  check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -1,24 +1,20 @@
-from django.core.management.base import BaseCommand
-from reservas.models import Reservation
-from django.core.mail import send_mail
-from django.utils import timezone
-from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from reservas.reminders import REMINDER_BATCH_SIZE, ReminderSendError, pending_reminders, send_reminders
+import time
 
 class Command(BaseCommand):
     help = 'Envia recordatorios automáticos por correo a reservas del día siguiente.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REMINDER_BATCH_SIZE, help='Mensajes por conexión SMTP.')
+        parser.add_argument('--workers', type=int, default=1, help='Lotes enviados en paralelo.')
+
     def handle(self, *args, **options):
-        manana = timezone.now().date() + timedelta(days=1)
-        reservas = Reservation.objects.filter(date=manana, status='CONFIRMED')
-        enviados = 0
-        for reserva in reservas:
-            user_email = reserva.user.email
-            if user_email:
-                send_mail(
-                    subject='Recordatorio de reserva',
-                    message=f'Recuerda tu reserva para el espacio {reserva.space.name} el {reserva.date} en horario {reserva.schedule}.',
-                    from_email=None,
-                    recipient_list=[user_email],
-                )
-                enviados += 1
-        self.stdout.write(self.style.SUCCESS(f'Se enviaron {enviados} recordatorios automáticos.'))
+        inicio = time.perf_counter()
+        try:
+            enviados = send_reminders(pending_reminders(), batch_size=options['batch_size'], workers=options['workers'])
+        except ReminderSendError as exc:
+            # Código de salida distinto de cero para que cron lo registre; lo enviado ya quedó marcado
+            raise CommandError(str(exc))
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(f'Se enviaron {enviados} recordatorios automáticos en {duracion:.2f}s.'))
@@ -0,0 +1,23 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from reservas.booking import active_series, materialize_series
+
+class Command(BaseCommand):
+    help = ('Convierte en reservas concretas las ocurrencias de series de los próximos días, '
+            'para que recordatorios, rollup y exportaciones las vean.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7, help='Horizonte a materializar, en días desde hoy.')
+
+    def handle(self, *args, **options):
+        start = timezone.now().date()
+        end = start + timedelta(days=options['days'])
+        creadas = omitidas = 0
+        for series in active_series().filter(start_date__lte=end, until__gte=start):
+            created, taken = materialize_series(series, start, end)
+            creadas += len(created)
+            omitidas += len(taken)
+            for day in taken:
+                self.stdout.write(self.style.WARNING(f'Serie {series.pk}: {day} ya estaba ocupado, se omite y queda pendiente de revisión.'))
+        self.stdout.write(self.style.SUCCESS(f'Se materializaron {creadas} reservas ({omitidas} omitidas).'))
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+import json
+from reservas.instrumentation import METRICS, published_snapshot, summarize
+
+
+class Command(BaseCommand):
+    help = 'Muestra los percentiles por vista registrados por PerformanceMiddleware.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--json', action='store_true', help='Salida JSON.')
+
+    def handle(self, *args, **options):
+        if 'locmem' in settings.CACHES['default']['BACKEND'].lower():
+            self.stderr.write(self.style.WARNING(
+                'El caché es locmem: las muestras de otros procesos no son visibles. '
+                'Configura CACHE_BACKEND con un backend compartido (archivo, Redis, ...).'))
+        summary = summarize(published_snapshot())
+        if options['json']:
+            self.stdout.write(json.dumps(summary, indent=2))
+            return
+        header = f"{'vista':<24} {'n':>5} " + ' '.join(f'{m + " p50/p95/p99":>26}' for m in METRICS)
+        self.stdout.write(header)
+        for view, entry in summary.items():
+            cols = ' '.join(
+                f"{entry[m]['p50']:>8}/{entry[m]['p95']:>8}/{entry[m]['p99']:>8}" for m in METRICS
+            )
+            self.stdout.write(f"{view:<24} {entry['samples']:>5} {cols}")
+            for sql, n in entry['duplicate_queries']:
+                self.stdout.write(f"    x{n} {sql}")
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+import time
+from reservas.reports import claim_next_report_job, run_report_job
+
+
+class Command(BaseCommand):
+    help = 'Worker que consulta la base de datos y genera los reportes PDF/Excel encolados.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Procesa los trabajos pendientes y termina.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Segundos entre consultas cuando no hay trabajos.')
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            job = claim_next_report_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+                continue
+            run_report_job(job)
+            if job.status == 'DONE':
+                self.stdout.write(self.style.SUCCESS(f'Reporte {job.pk} generado: {job.file.name}'))
+            else:
+                self.stdout.write(self.style.ERROR(f'Reporte {job.pk} falló: {job.error}'))
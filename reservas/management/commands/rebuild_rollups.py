@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+from reservas.models import DailySpaceUsage, Reservation
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye la tabla DailySpaceUsage a partir de las reservas existentes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        rows = (Reservation.objects.order_by()
+                .values('space_id', 'date', 'status')
+                .annotate(total=Count('id')))
+        with transaction.atomic():
+            DailySpaceUsage.objects.all().delete()
+            created = DailySpaceUsage.objects.bulk_create(
+                (DailySpaceUsage(space_id=r['space_id'], date=r['date'], status=r['status'], count=r['total'])
+                 for r in rows.iterator()),
+                batch_size=options['batch_size'],
+            )
+        self.stdout.write(self.style.SUCCESS(f'Se reconstruyeron {len(created)} filas de uso diario.'))
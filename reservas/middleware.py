@@ -0,0 +1,148 @@
+import random
+import time
+from collections import Counter
+from contextlib import ExitStack
+from functools import cache
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from .instrumentation import buffer, publish
+
+
+@cache
+def view_names():
+    """Nombres de las rutas de reservas/urls.py, comparados con ResolverMatch.view_name.
+
+    view_name lleva el namespace (`admin:login`), así una ruta de otra aplicación con el
+    mismo nombre no pasa por una de reservas. Las urls se cargan en la primera petición:
+    importarlas con el middleware arrastra todas las vistas.
+    """
+    from .urls import urlpatterns
+    return frozenset(p.name for p in urlpatterns if p.name)
+
+
+class QueryRecorder:
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+            # La huella es el SQL con placeholders: iguales = misma consulta con otros parámetros
+            self.statements[sql] += 1
+
+
+class PerformanceMiddleware:
+    """Mide tiempo, consultas, tiempo de BD, consultas repetidas y tamaño de respuesta por vista.
+
+    Solo registra una fracción PERF_SAMPLE_RATE de las peticiones a vistas de reservas/urls.py.
+    Funciona en modo síncrono (WSGI) y asíncrono (ASGI) para no forzar adaptadores de hilo.
+    En las respuestas en streaming el tiempo y las consultas incluyen la generación del cuerpo.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, 'PERF_SAMPLE_RATE', 0.1)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _sampled(self):
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self._sampled():
+            return self.get_response(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        stack = self._install(recorder)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            stack.close()
+            raise
+        self.record(request, response, recorder, start, stack)
+        return response
+
+    async def __acall__(self, request):
+        if not self._sampled():
+            return await self.get_response(request)
+        recorder = QueryRecorder()
+        start = time.perf_counter()
+        # Las consultas del ORM corren en el hilo sincrónico de la petición: el wrapper se instala
+        # allí, y allí mismo corren los iteradores de las respuestas en streaming (ver aiter_sync)
+        stack = await sync_to_async(self._install)(recorder)
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            await sync_to_async(stack.close)()
+            raise
+        await sync_to_async(self.record)(request, response, recorder, start, stack)
+        return response
+
+    def _install(self, recorder):
+        stack = ExitStack()
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(recorder))
+        return stack
+
+    def record(self, request, response, recorder, start, stack):
+        """Guarda la muestra, o la deja pendiente hasta el final del cuerpo si es un streaming.
+
+        Las exportaciones y la tabla completa consultan la base mientras generan el cuerpo:
+        el recorder sigue instalado hasta que se termina de enviar.
+        """
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else None
+        if view not in view_names():
+            stack.close()
+        elif not response.streaming:
+            self.finish(view, response, recorder, start, stack, len(response.content))
+        elif response.has_header('Content-Length'):
+            # FileResponse con tamaño conocido: sin envolver, para no perder wsgi.file_wrapper
+            self.finish(view, response, recorder, start, stack, int(response['Content-Length']))
+        else:
+            response.streaming_content = self._counted(view, response, recorder, start, stack)
+
+    def _counted(self, view, response, recorder, start, stack):
+        content = response.streaming_content
+        if response.is_async:
+            async def counted():
+                size = 0
+                try:
+                    async for chunk in content:
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    await sync_to_async(self.finish)(view, response, recorder, start, stack, size)
+        else:
+            def counted():
+                size = 0
+                try:
+                    for chunk in content:
+                        size += len(chunk)
+                        yield chunk
+                finally:
+                    self.finish(view, response, recorder, start, stack, size)
+        return counted()
+
+    def finish(self, view, response, recorder, start, stack, size):
+        stack.close()
+        buffer.add(view, {
+            'wall_ms': (time.perf_counter() - start) * 1000,
+            'queries': recorder.count,
+            'db_ms': recorder.seconds * 1000,
+            'bytes': size,
+            'duplicates': [(sql[:200], n) for sql, n in recorder.statements.most_common(5) if n > 1],
+            'status': response.status_code,
+        })
+        publish()
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_usage(apps, schema_editor):
+    Reservation = apps.get_model('reservas', 'Reservation')
+    DailySpaceUsage = apps.get_model('reservas', 'DailySpaceUsage')
+    rows = (Reservation.objects.order_by()
+            .values('space_id', 'date', 'status')
+            .annotate(total=Count('id')))
+    DailySpaceUsage.objects.bulk_create(
+        [DailySpaceUsage(space_id=r['space_id'], date=r['date'], status=r['status'], count=r['total']) for r in rows],
+        batch_size=5000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0003_reportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySpaceUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(db_index=True)),
+                ('status', models.CharField(choices=[('PENDING', 'Pendiente'), ('CONFIRMED', 'Confirmada'), ('REJECTED', 'Rechazada')], max_length=10)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('space', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to='reservas.space')),
+            ],
+            options={
+                'unique_together': {('space', 'date', 'status')},
+            },
+        ),
+        migrations.RunPython(backfill_usage, migrations.RunPython.noop),
+    ]
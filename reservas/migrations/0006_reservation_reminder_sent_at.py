@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0005_reservation_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='reminder_sent_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
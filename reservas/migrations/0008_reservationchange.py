@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:49
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0007_reservation_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('reservation_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('CREATE', 'Creación'), ('UPDATE', 'Modificación'), ('STATUS', 'Cambio de estado'), ('DELETE', 'Eliminación')], max_length=10)),
+                ('date', models.DateField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pendiente'), ('CONFIRMED', 'Confirmada'), ('REJECTED', 'Rechazada')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('space', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='reservas.space')),
+                ('user', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+    ]
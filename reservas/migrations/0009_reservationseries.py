@@ -0,0 +1,48 @@
+# Generated by Django 5.2.8 on 2026-10-18 15:56
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0008_reservationchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationSeries',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('frequency', models.CharField(choices=[('WEEKLY', 'Semanal'), ('BIWEEKLY', 'Quincenal')], default='WEEKLY', max_length=10)),
+                ('start_date', models.DateField()),
+                ('until', models.DateField()),
+                ('exceptions', models.JSONField(blank=True, default=list)),
+                ('purpose', models.CharField(blank=True, max_length=250)),
+                ('status', models.CharField(choices=[('PENDING', 'Pendiente'), ('CONFIRMED', 'Confirmada'), ('REJECTED', 'Rechazada')], default='PENDING', max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('schedule', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='reservas.schedule')),
+                ('space', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservation_series', to='reservas.space')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservation_series', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-start_date', '-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='series',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='reservas.reservationseries'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationseries',
+            index=models.Index(fields=['space', 'schedule', 'until'], name='series_slot_until_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationseries',
+            index=models.Index(fields=['until', 'start_date'], name='series_window_idx'),
+        ),
+    ]
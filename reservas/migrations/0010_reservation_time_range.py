@@ -0,0 +1,84 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+EXCLUSION_NAME = 'res_space_day_no_overlap'
+
+
+def copy_schedule_times(apps, schema_editor):
+    Reservation = apps.get_model('reservas', 'Reservation')
+    Schedule = apps.get_model('reservas', 'Schedule')
+    schedule = Schedule.objects.filter(pk=OuterRef('schedule_id'))
+    Reservation.objects.update(start_time=Subquery(schedule.values('start_time')[:1]),
+                               end_time=Subquery(schedule.values('end_time')[:1]))
+
+
+def add_exclusion_constraint(apps, schema_editor):
+    # Solo PostgreSQL: en SQLite la garantía es la consulta por rango dentro de la transacción IMMEDIATE
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('reservas', 'Reservation')._meta.db_table
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"""
+            SELECT count(*) FROM {table} a JOIN {table} b
+              ON a.space_id = b.space_id AND a.date = b.date AND a.id < b.id
+             AND a.start_time < b.end_time AND b.start_time < a.end_time
+        """)
+        overlapping = cursor.fetchone()[0]
+    if overlapping:
+        raise RuntimeError(
+            f"Hay {overlapping} pares de reservas solapadas en el mismo espacio y día; "
+            "elimine o mueva una de cada par antes de aplicar esta migración."
+        )
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute(
+        f'ALTER TABLE {table} ADD CONSTRAINT {EXCLUSION_NAME} EXCLUDE USING gist '
+        f'(space_id WITH =, tsrange(date + start_time, date + end_time) WITH &&)'
+    )
+
+
+def remove_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('reservas', 'Reservation')._meta.db_table
+    schema_editor.execute(f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS {EXCLUSION_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0009_reservationseries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='reservation',
+            name='start_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='end_time',
+            field=models.TimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(copy_schedule_times, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='reservation',
+            name='start_time',
+            field=models.TimeField(blank=True),
+        ),
+        migrations.AlterField(
+            model_name='reservation',
+            name='end_time',
+            field=models.TimeField(blank=True),
+        ),
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['space', 'date', 'start_time'], name='res_space_day_start_idx'),
+        ),
+        # La coincidencia exacta de horario queda cubierta por el solapamiento
+        migrations.AlterUniqueTogether(
+            name='reservation',
+            unique_together=set(),
+        ),
+        migrations.RunPython(add_exclusion_constraint, remove_exclusion_constraint),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0010_reservation_time_range'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='reservation',
+            constraint=models.CheckConstraint(
+                condition=models.Q(('start_time__lt', models.F('end_time'))),
+                name='res_start_before_end',
+                violation_error_message='La hora de inicio debe ser anterior a la de fin.',
+            ),
+        ),
+    ]
@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('reservas', '0011_reservation_res_start_before_end'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='space',
+            name='occupancy_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+    ]
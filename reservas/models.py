@@ -1,3 +1,5 @@
+from datetime import timedelta
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth.models import AbstractUser
 from django.urls import reverse
@@ -23,6 +25,8 @@ class Space(models.Model):
     location = models.CharField(max_length=200, blank=True)
     type = models.CharField(max_length=10, choices=SPACE_TYPE)
     is_active = models.BooleanField(default=True)
+    # Sube con cada escritura que cambia la ocupación del espacio (ver signals.bump_occupancy)
+    occupancy_version = models.PositiveBigIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['name']
@@ -33,6 +37,14 @@ class Space(models.Model):
     def get_absolute_url(self):
         return reverse('space-detail', args=[str(self.id)])
 
+    def save(self, *args, **kwargs):
+        # occupancy_version solo cambia con el UPDATE F()+1 de signals.bump_occupancy: un save
+        # completo escribiría el valor leído y desharía un incremento ocurrido entre medio
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [f.name for f in self._meta.concrete_fields
+                                       if not f.primary_key and f.name != 'occupancy_version']
+        super().save(*args, **kwargs)
+
 class Schedule(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
@@ -45,6 +57,28 @@ class Schedule(models.Model):
     def __str__(self):
         return f"{self.start_time.strftime('%H:%M')} - {self.end_time.strftime('%H:%M')}"
 
+class ReservationQuerySet(models.QuerySet):
+    def overlapping(self, space_id, day, start_time, end_time):
+        """Reservas del espacio y día cuyo intervalo se solapa con [start_time, end_time).
+
+        Rango sobre el índice (space, date, start_time): start_time < fin acota la búsqueda
+        y end_time > inicio filtra las pocas filas de ese día.
+        """
+        return self.filter(space_id=space_id, date=day, start_time__lt=end_time, end_time__gt=start_time)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        # bulk_create no llama a save(): las horas se copian del horario aquí
+        objs = list(objs)
+        missing = {o.schedule_id for o in objs if o.start_time is None or o.end_time is None}
+        if missing:
+            times = {pk: (st, et) for pk, st, et in
+                     Schedule.objects.filter(pk__in=missing).values_list('id', 'start_time', 'end_time')}
+            for o in objs:
+                if o.start_time is None or o.end_time is None:
+                    o.start_time, o.end_time = times[o.schedule_id]
+        return super().bulk_create(objs, *args, **kwargs)
+
+
 class Reservation(models.Model):
     STATUS_CHOICES = (
         ('PENDING', 'Pendiente'),
@@ -55,13 +89,226 @@ class Reservation(models.Model):
     space = models.ForeignKey(Space, on_delete=models.CASCADE, related_name='reservations')
     schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE)
     date = models.DateField()
+    # Intervalo reservado [start_time, end_time): por defecto el del horario, pero puede ser
+    # cualquier rango; los conflictos se detectan por solapamiento (ver intervals.py)
+    start_time = models.TimeField(blank=True)
+    end_time = models.TimeField(blank=True)
     purpose = models.CharField(max_length=250, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    reminder_sent_at = models.DateTimeField(null=True, blank=True)
+    # Ocurrencia materializada de una serie (ver ReservationSeries)
+    series = models.ForeignKey('reservas.ReservationSeries', on_delete=models.SET_NULL, null=True, blank=True,
+                               related_name='reservations')
+
+    objects = ReservationQuerySet.as_manager()
 
     class Meta:
         ordering = ['-date', '-created_at']
-        unique_together = ('space', 'date', 'schedule')
+        constraints = [
+            # Un intervalo vacío o invertido nunca coincidiría con la consulta de solapamiento
+            models.CheckConstraint(
+                condition=models.Q(start_time__lt=models.F('end_time')),
+                name='res_start_before_end',
+                violation_error_message='La hora de inicio debe ser anterior a la de fin.',
+            ),
+        ]
+        indexes = [
+            # Listado general y rangos de fechas de reportes, en el orden por defecto
+            models.Index(fields=['-date', '-created_at'], name='res_date_recent_idx'),
+            # Listado de un usuario normal
+            models.Index(fields=['user', '-date', '-created_at'], name='res_user_recent_idx'),
+            # Calendario, gráfico semanal y filtros por estado
+            models.Index(fields=['status', 'date'], name='res_status_date_idx'),
+            # Reportes filtrados por espacio y estado
+            models.Index(fields=['space', 'status', 'date'], name='res_space_status_date_idx'),
+            # Reservas recientes del dashboard
+            models.Index(fields=['created_at'], name='res_created_idx'),
+            # Solapamientos de un espacio y día (ReservationQuerySet.overlapping); en PostgreSQL
+            # además hay una restricción de exclusión (migración 0010)
+            models.Index(fields=['space', 'date', 'start_time'], name='res_space_day_start_idx'),
+            # Recordatorios aún no enviados
+            models.Index(
+                fields=['date'],
+                condition=models.Q(status='CONFIRMED', reminder_sent_at__isnull=True),
+                name='res_reminder_pending_idx',
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.space.name} - {self.date} ({self.schedule}) - {self.user.username}"
+        return (f"{self.space.name} - {self.date} "
+                f"({self.start_time:%H:%M} - {self.end_time:%H:%M}) - {self.user.username}")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_times = (instance.__dict__.get('schedule_id'), instance.__dict__.get('start_time'),
+                                  instance.__dict__.get('end_time'))
+        instance._loaded_date = instance.__dict__.get('date')
+        return instance
+
+    def resolve_times(self):
+        """Copia las horas del horario si faltan o si cambió el horario sin elegir horas a mano."""
+        loaded = getattr(self, '_loaded_times', None)
+        schedule_changed = loaded and loaded[0] != self.schedule_id and (self.start_time, self.end_time) == loaded[1:]
+        if self.start_time is None or self.end_time is None or schedule_changed:
+            self.start_time, self.end_time = self.schedule.start_time, self.schedule.end_time
+        return self.start_time, self.end_time
+
+    def clean(self):
+        """Valida el intervalo y los solapamientos en el admin y en cualquier ModelForm.
+
+        book_reservation repite la comprobación dentro de la transacción: esta es la
+        validación temprana para los caminos que guardan sin pasar por booking.py.
+        """
+        super().clean()
+        if self.schedule_id is None or self.space_id is None or self.date is None:
+            return
+        start, end = self.resolve_times()
+        if start >= end:
+            raise ValidationError({'end_time': 'La hora de inicio debe ser anterior a la de fin.'})
+        from .booking import SLOT_TAKEN_MESSAGE, series_on
+        if (Reservation.objects.overlapping(self.space_id, self.date, start, end).exclude(pk=self.pk).exists()
+                or series_on(self.space_id, start, end, self.date, exclude=self.series_id)):
+            raise ValidationError(SLOT_TAKEN_MESSAGE)
+
+    def save(self, *args, **kwargs):
+        self.resolve_times()
+        loaded_date = getattr(self, '_loaded_date', None)
+        if self.reminder_sent_at and loaded_date and loaded_date != self.date:
+            # El recordatorio enviado era para la fecha anterior: se vuelve a enviar para la nueva
+            self.reminder_sent_at = None
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'reminder_sent_at'}
+        super().save(*args, **kwargs)
+        self._loaded_times = (self.schedule_id, self.start_time, self.end_time)
+        self._loaded_date = self.date
+
+class ReservationSeries(models.Model):
+    """Reserva recurrente (semanal o quincenal) cuyas ocurrencias se generan al vuelo.
+
+    Solo se guardan como Reservation las ocurrencias materializadas (ver
+    booking.materialize_series); sus fechas pasan a `exceptions`, junto con las
+    canceladas, para que la expansión no las repita.
+    """
+    FREQUENCY_CHOICES = (
+        ('WEEKLY', 'Semanal'),
+        ('BIWEEKLY', 'Quincenal'),
+    )
+    INTERVAL_WEEKS = {'WEEKLY': 1, 'BIWEEKLY': 2}
+    user = models.ForeignKey('reservas.CustomUser', on_delete=models.CASCADE, related_name='reservation_series')
+    space = models.ForeignKey(Space, on_delete=models.CASCADE, related_name='reservation_series')
+    schedule = models.ForeignKey(Schedule, on_delete=models.CASCADE)
+    frequency = models.CharField(max_length=10, choices=FREQUENCY_CHOICES, default='WEEKLY')
+    start_date = models.DateField()
+    until = models.DateField()
+    exceptions = models.JSONField(default=list, blank=True)
+    purpose = models.CharField(max_length=250, blank=True)
+    status = models.CharField(max_length=10, choices=Reservation.STATUS_CHOICES, default='PENDING')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-start_date', '-created_at']
+        indexes = [
+            models.Index(fields=['space', 'schedule', 'until'], name='series_slot_until_idx'),
+            models.Index(fields=['until', 'start_date'], name='series_window_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.space.name} - {self.get_frequency_display()} desde {self.start_date} ({self.schedule})"
+
+    def occurs_on(self, day):
+        step = 7 * self.INTERVAL_WEEKS[self.frequency]
+        return (self.start_date <= day <= self.until and (day - self.start_date).days % step == 0
+                and day.isoformat() not in self.exceptions)
+
+    def dates(self, start=None, end=None):
+        """Genera las fechas de la serie dentro de [start, end] sin recorrer las anteriores."""
+        step = timedelta(weeks=self.INTERVAL_WEEKS[self.frequency])
+        start = max(start or self.start_date, self.start_date)
+        end = min(end or self.until, self.until)
+        skipped = -(-(start - self.start_date).days // step.days)
+        day = self.start_date + skipped * step
+        exceptions = set(self.exceptions)
+        while day <= end:
+            if day.isoformat() not in exceptions:
+                yield day
+            day += step
+
+class DailySpaceUsage(models.Model):
+    """Conteo de reservas por espacio, día y estado, mantenido por señales (ver signals.py)."""
+    space = models.ForeignKey(Space, on_delete=models.CASCADE, related_name='daily_usage')
+    date = models.DateField(db_index=True)
+    status = models.CharField(max_length=10, choices=Reservation.STATUS_CHOICES)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('space', 'date', 'status')
+
+    def __str__(self):
+        return f"{self.space_id} - {self.date} - {self.status}: {self.count}"
+
+class ReservationChange(models.Model):
+    """Registro append-only de cambios en reservas; el id funciona como número de versión (ver changes.py)."""
+    ACTION_CHOICES = (
+        ('CREATE', 'Creación'),
+        ('UPDATE', 'Modificación'),
+        ('STATUS', 'Cambio de estado'),
+        ('DELETE', 'Eliminación'),
+    )
+    reservation_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES)
+    # Sin restricción de FK: el registro sobrevive a la reserva, espacio o usuario borrados
+    space = models.ForeignKey(Space, on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    user = models.ForeignKey('reservas.CustomUser', on_delete=models.DO_NOTHING, db_constraint=False, null=True, related_name='+')
+    date = models.DateField()
+    status = models.CharField(max_length=10, choices=Reservation.STATUS_CHOICES)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+
+    def __str__(self):
+        return f"v{self.pk} {self.action} reserva {self.reservation_id}"
+
+class ReportJob(models.Model):
+    FORMAT_CHOICES = (
+        ('EXCEL', 'Excel'),
+        ('PDF', 'PDF'),
+    )
+    STATUS_CHOICES = (
+        ('PENDING', 'Pendiente'),
+        ('RUNNING', 'En proceso'),
+        ('DONE', 'Terminado'),
+        ('FAILED', 'Fallido'),
+    )
+    ACTIVE_STATUSES = ('PENDING', 'RUNNING')
+    key = models.CharField(max_length=64, db_index=True)
+    format = models.CharField(max_length=10, choices=FORMAT_CHOICES)
+    filters = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='PENDING')
+    requested_by = models.ForeignKey('reservas.CustomUser', on_delete=models.SET_NULL, null=True, blank=True, related_name='report_jobs')
+    file = models.FileField(upload_to='reports/', blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        constraints = [
+            # Un solo trabajo activo por combinación de formato y filtros
+            models.UniqueConstraint(
+                fields=['key'],
+                condition=models.Q(status__in=['PENDING', 'RUNNING']),
+                name='unique_active_report_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_format_display()} #{self.pk} ({self.get_status_display()})"
+
+    def get_absolute_url(self):
+        return reverse('report-job-detail', args=[str(self.id)])
@@ -0,0 +1,70 @@
+import threading
+from datetime import timedelta
+from .availability import space_occupancy
+from .models import Space
+
+# Días que se cargan de una vez al consultar un espacio: el formulario suele pedir fechas cercanas
+OCCUPANCY_WINDOW_DAYS = 14
+# Espacios y días por espacio guardados antes de vaciar la estructura
+OCCUPANCY_MAX_SPACES = 2000
+OCCUPANCY_MAX_DAYS = 366
+
+
+class SlotOccupancy:
+    """Ocupación local del proceso: una máscara de bits por (espacio, día) sobre los horarios ordenados.
+
+    Cada espacio guarda (versión, horarios, {día: máscara}); la versión es
+    Space.occupancy_version, un contador en la base que suben las escrituras de reservas,
+    series y horarios (ver signals.bump_occupancy), así que lo ven todos los workers y
+    solo se descarta el espacio afectado. Una consulta si la ventana ya está cargada y
+    cuatro si no. Es solo una validación temprana: book_reservation (y en PostgreSQL la
+    restricción de exclusión) sigue decidiendo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._spaces = {}
+
+    def _mask(self, space_id, day):
+        # La versión se lee antes de cargar: si algo cambia en medio, la próxima consulta recarga
+        version = Space.objects.filter(pk=space_id).values_list('occupancy_version', flat=True).first()
+        with self._lock:
+            entry = self._spaces.get(space_id)
+            if entry and entry[0] == version and day in entry[2]:
+                return entry[2][day], entry[1]
+        # La carga va fuera del lock; dos hilos pueden cargar la misma ventana, el resultado es igual
+        grid = space_occupancy(space_id, day, day + timedelta(days=OCCUPANCY_WINDOW_DAYS - 1))
+        schedules = tuple(pk for pk, *_ in grid.schedules)
+        masks = {d: grid.masks.get((space_id, d), 0) for d in grid.days()}
+        with self._lock:
+            entry = self._spaces.get(space_id)
+            if entry and entry[:2] == (version, schedules) and len(entry[2]) < OCCUPANCY_MAX_DAYS:
+                entry[2].update(masks)
+            else:
+                if len(self._spaces) >= OCCUPANCY_MAX_SPACES:
+                    self._spaces.clear()
+                self._spaces[space_id] = (version, schedules, masks)
+        return masks[day], schedules
+
+    def taken_schedule_ids(self, space_id, day, exclude=None):
+        if exclude:
+            # Edición de una reserva: se calcula sin ella y sin tocar las máscaras compartidas
+            grid = space_occupancy(space_id, day, day, exclude=exclude)
+            mask, schedules = grid.masks.get((space_id, day), 0), [pk for pk, *_ in grid.schedules]
+        else:
+            mask, schedules = self._mask(space_id, day)
+        return [pk for i, pk in enumerate(schedules) if mask >> i & 1]
+
+    def free_schedule_ids(self, space_id, day):
+        mask, schedules = self._mask(space_id, day)
+        return [pk for i, pk in enumerate(schedules) if not mask >> i & 1]
+
+    def is_taken(self, space_id, day, schedule_id):
+        return schedule_id in self.taken_schedule_ids(space_id, day)
+
+    def clear(self):
+        with self._lock:
+            self._spaces = {}
+
+
+slots = SlotOccupancy()
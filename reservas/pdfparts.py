@@ -0,0 +1,11 @@
+"""Render de una parte del reporte PDF.
+
+No importa Django: los procesos del pool de exportación (spawn) solo cargan xhtml2pdf.
+"""
+
+
+def render_pdf_part(html, path):
+    """Escribe en `path` el PDF de un bloque de filas ya renderizado a HTML."""
+    from xhtml2pdf import pisa
+    with open(path, 'wb') as fh:
+        return not pisa.CreatePDF(html, dest=fh).err
@@ -0,0 +1,78 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.core.mail import EmailMessage, get_connection
+from django.utils import timezone
+from .models import Reservation
+
+REMINDER_SUBJECT = 'Recordatorio de reserva'
+REMINDER_BATCH_SIZE = 100
+
+
+class ReminderSendError(Exception):
+    """Falló algún lote; los `sent` recordatorios de los demás lotes sí salieron y quedaron marcados."""
+
+    def __init__(self, sent, error):
+        super().__init__(f'Se enviaron {sent} recordatorios, pero falló al menos un lote: {error}')
+        self.sent = sent
+        self.error = error
+
+
+def build_reminder(reserva):
+    return EmailMessage(
+        subject=REMINDER_SUBJECT,
+        body=(f'Recuerda tu reserva para el espacio {reserva.space.name} el {reserva.date} '
+              f'en horario {reserva.start_time:%H:%M} - {reserva.end_time:%H:%M}.'),
+        from_email=None,  # usa DEFAULT_FROM_EMAIL
+        to=[reserva.user.email],
+    )
+
+
+def pending_reminders(day=None):
+    """Reservas confirmadas del día (mañana por defecto) con correo y sin recordatorio enviado."""
+    day = day or timezone.now().date() + timedelta(days=1)
+    return (Reservation.objects
+            .filter(date=day, status='CONFIRMED', reminder_sent_at__isnull=True)
+            .exclude(user__email='')
+            .select_related('user', 'space')
+            .order_by('pk'))
+
+
+def _send_batch(messages):
+    # Una conexión SMTP por lote, reutilizada para todos sus mensajes
+    with get_connection() as connection:
+        return connection.send_messages(messages)
+
+
+def send_reminders(reservas, batch_size=REMINDER_BATCH_SIZE, workers=1):
+    """Envía los recordatorios en lotes y marca cada lote enviado para no repetirlo.
+
+    Con workers > 1 los lotes se envían en paralelo; el acceso a la base de datos
+    queda en el hilo que llama. Si falla algún lote se lanza ReminderSendError con la
+    cantidad enviada, una vez marcados los lotes que sí salieron.
+    """
+    batches = []
+    batch = []
+    for reserva in reservas.iterator(chunk_size=batch_size):
+        batch.append(reserva)
+        if len(batch) >= batch_size:
+            batches.append(batch)
+            batch = []
+    if batch:
+        batches.append(batch)
+
+    enviados = 0
+    error = None
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as pool:
+        futures = [(b, pool.submit(_send_batch, [build_reminder(r) for r in b])) for b in batches]
+        for b, future in futures:
+            try:
+                future.result()
+            except Exception as exc:
+                # Los lotes fallidos quedan sin marcar y se reintentan en la próxima ejecución
+                error = error or exc
+                continue
+            Reservation.objects.filter(pk__in=[r.pk for r in b]).update(reminder_sent_at=timezone.now())
+            enviados += len(b)
+    if error:
+        raise ReminderSendError(enviados, error) from error
+    return enviados
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import tempfile
+from datetime import timedelta
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.utils import timezone
+from .exports import write_reservations_pdf, write_reservations_xlsx, reservation_rows
+from .models import Reservation, ReportJob
+
+REPORT_FILTERS = ('fecha_inicio', 'fecha_fin', 'espacio', 'estado')
+REPORT_EXTENSIONS = {'EXCEL': 'xlsx', 'PDF': 'pdf'}
+REPORT_JOB_ATTEMPTS = 3
+
+
+def report_filters(params):
+    """Normaliza los filtros de reportes: solo claves conocidas y valores no vacíos."""
+    filters = {}
+    for name in REPORT_FILTERS:
+        value = (params.get(name) or '').strip()
+        if value:
+            filters[name] = value
+    return filters
+
+
+def filter_reservations(filters):
+    qs = Reservation.objects.select_related('space', 'user', 'schedule').all()
+    if filters.get('fecha_inicio'):
+        qs = qs.filter(date__gte=filters['fecha_inicio'])
+    if filters.get('fecha_fin'):
+        qs = qs.filter(date__lte=filters['fecha_fin'])
+    if filters.get('espacio'):
+        qs = qs.filter(space_id=filters['espacio'])
+    if filters.get('estado'):
+        qs = qs.filter(status=filters['estado'])
+    return qs
+
+
+def report_job_key(fmt, filters):
+    payload = json.dumps([fmt, filters], sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def expire_stale_report_jobs():
+    """Marca como fallidos los trabajos RUNNING cuyo worker no terminó en REPORT_JOB_STALE_SECONDS.
+
+    Un worker caído deja el trabajo en RUNNING y, por unique_active_report_job, bloquearía
+    para siempre los mismos filtros; al fallar, la siguiente petición encola uno nuevo.
+    """
+    stale_before = timezone.now() - timedelta(seconds=settings.REPORT_JOB_STALE_SECONDS)
+    return (ReportJob.objects.filter(status='RUNNING', started_at__lt=stale_before)
+            .update(status='FAILED', error='El worker no terminó a tiempo.', finished_at=timezone.now()))
+
+
+def reusable_report_job(key):
+    fresh_since = timezone.now() - timedelta(seconds=settings.REPORT_JOB_TTL)
+    return (ReportJob.objects.filter(key=key)
+            .filter(Q(status__in=ReportJob.ACTIVE_STATUSES) | Q(status='DONE', finished_at__gte=fresh_since))
+            .order_by('-created_at').first())
+
+
+def request_report_job(fmt, filters, user=None):
+    """Devuelve el trabajo activo o reciente con los mismos filtros, o encola uno nuevo."""
+    key = report_job_key(fmt, filters)
+    expire_stale_report_jobs()
+    for attempt in range(REPORT_JOB_ATTEMPTS):
+        job = reusable_report_job(key)
+        if job:
+            return job, False
+        try:
+            with transaction.atomic():
+                return ReportJob.objects.create(key=key, format=fmt, filters=filters, requested_by=user), True
+        except IntegrityError:
+            # Otro proceso encoló el mismo reporte entre la consulta y el insert; se vuelve a
+            # buscar, porque puede haber terminado (o fallado) antes de releerlo
+            if attempt == REPORT_JOB_ATTEMPTS - 1:
+                raise
+
+
+def claim_next_report_job():
+    """Toma el trabajo pendiente más antiguo; el UPDATE condicional evita que dos workers lo compartan."""
+    expire_stale_report_jobs()
+    for job in ReportJob.objects.filter(status='PENDING').order_by('created_at')[:10]:
+        claimed = (ReportJob.objects.filter(pk=job.pk, status='PENDING')
+                   .update(status='RUNNING', started_at=timezone.now()))
+        if claimed:
+            job.refresh_from_db()
+            return job
+    return None
+
+
+def run_report_job(job):
+    qs = filter_reservations(job.filters)
+    try:
+        with tempfile.TemporaryFile() as tmp:
+            if job.format == 'EXCEL':
+                write_reservations_xlsx(reservation_rows(qs), tmp)
+            elif not write_reservations_pdf(qs, tmp):
+                raise ValueError("Error al generar PDF")
+            tmp.seek(0)
+            job.file.save(f"{job.key[:16]}-{job.pk}.{REPORT_EXTENSIONS[job.format]}", File(tmp), save=False)
+    except Exception as exc:
+        job.status = 'FAILED'
+        job.error = str(exc)
+    else:
+        job.status = 'DONE'
+    job.finished_at = timezone.now()
+    # Solo si sigue en RUNNING: expire_stale_report_jobs pudo darlo por perdido y encolar otro
+    written = (ReportJob.objects.filter(pk=job.pk, status='RUNNING')
+               .update(file=job.file.name or '', status=job.status, error=job.error, finished_at=job.finished_at))
+    if not written:
+        if job.file:
+            job.file.delete(save=False)
+        job.refresh_from_db()
+    return job
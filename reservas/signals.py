@@ -0,0 +1,147 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from .caching import bump_version
+from .models import CustomUser, DailySpaceUsage, Reservation, ReservationChange, ReservationSeries, Schedule, Space
+
+
+def _rollup_key(reserva):
+    return (reserva.space_id, reserva.date, reserva.status)
+
+
+def bump_usage(space_id, day, status, delta):
+    updated = (DailySpaceUsage.objects
+               .filter(space_id=space_id, date=day, status=status)
+               .update(count=F('count') + delta))
+    if updated or delta < 0:
+        return
+    try:
+        with transaction.atomic():
+            DailySpaceUsage.objects.create(space_id=space_id, date=day, status=status, count=delta)
+    except IntegrityError:
+        # Otra petición creó la fila en paralelo
+        DailySpaceUsage.objects.filter(space_id=space_id, date=day, status=status).update(count=F('count') + delta)
+
+
+def bump_occupancy(*space_ids):
+    """Invalida la ocupación en memoria (occupancy.SlotOccupancy) de esos espacios en todos los workers."""
+    space_ids = {pk for pk in space_ids if pk}
+    if space_ids:
+        Space.objects.filter(pk__in=space_ids).update(occupancy_version=F('occupancy_version') + 1)
+
+
+def record_changes(reservas, action, batch_size=None):
+    """Añade entradas al registro de cambios; las operaciones masivas lo llaman directamente."""
+    ReservationChange.objects.bulk_create([
+        ReservationChange(reservation_id=r.pk, action=action, space_id=r.space_id, user_id=r.user_id,
+                          date=r.date, status=r.status)
+        for r in reservas
+    ], batch_size=batch_size)
+
+
+def apply_usage_deltas(deltas):
+    """Aplica {(space_id, date, status): delta} para operaciones masivas que no disparan señales.
+
+    Usa un número fijo de consultas: crea con count=0 las filas que falten y luego
+    incrementa todas con un único UPDATE ... CASE.
+    """
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if deltas:
+        DailySpaceUsage.objects.bulk_create(
+            [DailySpaceUsage(space_id=space_id, date=day, status=status, count=0)
+             for (space_id, day, status), delta in deltas.items() if delta > 0],
+            ignore_conflicts=True,
+        )
+        rows = (DailySpaceUsage.objects
+                .filter(space_id__in={k[0] for k in deltas}, date__in={k[1] for k in deltas},
+                        status__in={k[2] for k in deltas})
+                .values_list('pk', 'space_id', 'date', 'status'))
+        whens = {pk: deltas[(space_id, day, status)] for pk, space_id, day, status in rows
+                 if (space_id, day, status) in deltas}
+        if whens:
+            (DailySpaceUsage.objects.filter(pk__in=whens)
+             .update(count=F('count') + Case(*[When(pk=pk, then=Value(d)) for pk, d in whens.items()],
+                                             default=Value(0))))
+        bump_occupancy(*{space_id for space_id, _day, _status in deltas})
+    bump_version('reservation')
+
+
+@receiver(pre_save, sender=Reservation)
+def remember_previous_usage(sender, instance, raw=False, **kwargs):
+    instance._rollup_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._rollup_previous = (Reservation.objects.filter(pk=instance.pk)
+                                 .values_list('space_id', 'date', 'status').first())
+
+
+@receiver(post_save, sender=Reservation)
+def update_usage_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_rollup_previous', None)
+    current = _rollup_key(instance)
+    bump_occupancy(instance.space_id, previous and previous[0])
+    if created:
+        record_changes([instance], 'CREATE')
+    elif previous and previous[:2] == current[:2] and previous[2] != current[2]:
+        record_changes([instance], 'STATUS')
+    else:
+        record_changes([instance], 'UPDATE')
+    if previous == current:
+        return
+    if previous:
+        bump_usage(*previous, -1)
+    bump_usage(*current, 1)
+
+
+@receiver(post_delete, sender=Reservation)
+def update_usage_on_delete(sender, instance, **kwargs):
+    bump_usage(*_rollup_key(instance), -1)
+    bump_occupancy(instance.space_id)
+    record_changes([instance], 'DELETE')
+
+
+@receiver(pre_save, sender=ReservationSeries)
+def remember_previous_series_space(sender, instance, raw=False, **kwargs):
+    instance._previous_space_id = None
+    if not (raw or instance._state.adding or instance.pk is None):
+        instance._previous_space_id = (ReservationSeries.objects.filter(pk=instance.pk)
+                                       .values_list('space_id', flat=True).first())
+
+
+@receiver(post_save, sender=ReservationSeries)
+def update_occupancy_on_series_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_occupancy(instance.space_id, getattr(instance, '_previous_space_id', None))
+
+
+@receiver(post_delete, sender=ReservationSeries)
+def update_occupancy_on_series_delete(sender, instance, **kwargs):
+    bump_occupancy(instance.space_id)
+
+
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+def update_occupancy_on_schedule_change(sender, raw=False, **kwargs):
+    # Cambian las posiciones de los bits: se invalidan todos los espacios
+    if not raw:
+        Space.objects.update(occupancy_version=F('occupancy_version') + 1)
+
+
+@receiver(post_save, sender=Space)
+@receiver(post_delete, sender=Space)
+@receiver(post_save, sender=Schedule)
+@receiver(post_delete, sender=Schedule)
+@receiver(post_save, sender=Reservation)
+@receiver(post_delete, sender=Reservation)
+@receiver(post_save, sender=ReservationSeries)
+@receiver(post_delete, sender=ReservationSeries)
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def invalidate_cached_views(sender, update_fields=None, **kwargs):
+    # Un login solo guarda last_login, que ninguna vista muestra
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_version(sender._meta.model_name)
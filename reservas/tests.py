@@ -1,3 +1,1512 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, time, timedelta
+from pathlib import Path
+from unittest import mock, skipUnless
+import csv
+import gzip
+import io
+import json
+import os
+import runpy
+import subprocess
+import sys
+import tempfile
+import time as _time
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core import mail, signing
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection, transaction
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from reservas_project.database import database_config
+from .booking import (SLOT_TAKEN_MESSAGE, book_reservation, book_series, book_weekly, materialize_series,
+                      series_conflicts)
+from .changes import settled_change_version
+from .exports import EXCEL_COLUMNS, ROW_EXPORT_COLUMNS, render_reservations_html, write_chunked_pdf
+from .instrumentation import buffer
+from .intervals import IntervalIndex
+from .moderation import moderate_reservations
+from .models import (CustomUser, DailySpaceUsage, ReportJob, Reservation, ReservationChange, ReservationSeries,
+                     Schedule, Space)
+from .occupancy import slots
+from .pagination import EstimatedCountPaginator, KeysetPaginator
+from .pdfparts import render_pdf_part
+from .urls import urlpatterns
+from .reminders import ReminderSendError, _send_batch, build_reminder, pending_reminders, send_reminders
+from .reports import claim_next_report_job, request_report_job, reusable_report_job, run_report_job
+from .views import get_filtered_queryset
 
-# Create your tests here.
+
+def seed_reservations(spaces=40, schedules=6, users=30, days=120, start=date(2025, 1, 6), prefix=''):
+    """Carga un volumen sintético de reservas con bulk_create (sin señales)."""
+    space_objs = Space.objects.bulk_create(
+        Space(name=f'{prefix}Espacio {i:03d}', capacity=10 + i % 50, type=('AULA', 'LAB', 'SALA')[i % 3])
+        for i in range(spaces)
+    )
+    schedule_objs = Schedule.objects.bulk_create(
+        Schedule(start_time=time(7 + i, len(prefix)), end_time=time(8 + i, len(prefix))) for i in range(schedules)
+    )
+    user_objs = CustomUser.objects.bulk_create(
+        CustomUser(username=f'{prefix}usuario{i:03d}', email=f'{prefix}usuario{i:03d}@ejemplo.com') for i in range(users)
+    )
+    statuses = ('PENDING', 'CONFIRMED', 'REJECTED')
+    rows = []
+    n = 0
+    for d in range(days):
+        day = start + timedelta(days=d)
+        for sp in space_objs:
+            for sc in schedule_objs:
+                n += 1
+                if n % 3:
+                    continue
+                rows.append(Reservation(
+                    user=user_objs[n % users], space=sp, schedule=sc, date=day, status=statuses[n % 7 % 3],
+                ))
+    Reservation.objects.bulk_create(rows, batch_size=5000)
+    return space_objs, schedule_objs, user_objs
+
+
+class QueryPlanTests(TestCase):
+    """Cada patrón de acceso caliente sobre Reservation debe resolverse con un índice."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.spaces, cls.schedules, cls.users = seed_reservations()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assertUsesIndex(self, qs):
+        plan = qs.explain()
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan on reservas_reservation', plan, plan)
+        else:
+            for line in plan.splitlines():
+                if 'reservas_reservation' in line:
+                    self.assertIn('INDEX', line, plan)
+
+    def filtered(self, **params):
+        return get_filtered_queryset(RequestFactory().get('/reports/filtrar/', params))
+
+    def test_reminders(self):
+        self.assertUsesIndex(pending_reminders(date(2025, 2, 1)))
+
+    def test_calendar_window(self):
+        qs = Reservation.objects.filter(status='CONFIRMED', date__gte=date(2025, 2, 1), date__lt=date(2025, 3, 1))
+        self.assertUsesIndex(qs.values('date', 'space__name', 'user__username'))
+
+    def test_user_reservation_list(self):
+        self.assertUsesIndex(Reservation.objects.filter(user=self.users[0])[:12])
+
+    def test_admin_reservation_list(self):
+        self.assertUsesIndex(Reservation.objects.select_related('space', 'schedule', 'user')[:12])
+
+    def test_dashboard_recent(self):
+        self.assertUsesIndex(Reservation.objects.order_by('-created_at')
+                             .values('date', 'space__name', 'user__username', 'status')[:8])
+
+    def test_report_date_range(self):
+        self.assertUsesIndex(self.filtered(fecha_inicio='2025-02-01', fecha_fin='2025-02-15'))
+
+    def test_report_status_range(self):
+        self.assertUsesIndex(self.filtered(fecha_inicio='2025-02-01', fecha_fin='2025-02-15', estado='PENDING'))
+
+    def test_report_space_status_range(self):
+        self.assertUsesIndex(self.filtered(
+            fecha_inicio='2025-02-01', fecha_fin='2025-02-15', espacio=self.spaces[3].pk, estado='CONFIRMED',
+        ))
+
+    @skipUnless(connection.vendor == 'postgresql', 'Índice parcial verificado solo en PostgreSQL')
+    def test_reminders_partial_index(self):
+        self.assertIn('res_reminder_pending_idx', pending_reminders(date(2025, 2, 1)).explain())
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Ráfaga de reservas simultáneas sobre los mismos horarios: sin 500 ni reservas dobles."""
+
+    clients = 8
+    attempts = 4
+
+    def setUp(self):
+        self.space = Space.objects.create(name='Aula 101', capacity=30, type='AULA')
+        self.schedules = [Schedule.objects.create(start_time=time(8 + i), end_time=time(9 + i)) for i in range(2)]
+        self.users = [CustomUser.objects.create_user(f'cliente{i}') for i in range(self.clients)]
+        self.day = date.today() + timedelta(days=7)
+
+    def book(self, user):
+        client = Client()
+        client.force_login(user)
+        statuses = []
+        for i in range(self.attempts):
+            response = client.post(reverse('reservation-create'), {
+                'space': self.space.pk,
+                'schedule': self.schedules[i % 2].pk,
+                'date': self.day.isoformat(),
+                'purpose': 'Prueba de carga',
+            })
+            statuses.append(response.status_code)
+        connection.close()
+        return statuses
+
+    def test_no_double_bookings(self):
+        with ThreadPoolExecutor(max_workers=self.clients) as pool:
+            statuses = [s for result in pool.map(self.book, self.users) for s in result]
+        self.assertNotIn(500, statuses)
+        self.assertEqual(statuses.count(302), len(self.schedules))
+        self.assertEqual(Reservation.objects.filter(space=self.space, date=self.day).count(), len(self.schedules))
+
+    def test_weekly_series(self):
+        client = Client()
+        client.force_login(self.users[0])
+        data = {'space': self.space.pk, 'schedule': self.schedules[0].pk, 'date': self.day.isoformat(), 'weeks': 4}
+        self.assertEqual(client.post(reverse('reservation-create'), data).status_code, 302)
+        self.assertEqual(Reservation.objects.filter(space=self.space, schedule=self.schedules[0]).count(), 4)
+        # Repetir la serie choca con las fechas ya tomadas y no inserta nada
+        response = client.post(reverse('reservation-create'), data)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].non_field_errors())
+        self.assertEqual(Reservation.objects.count(), 4)
+
+    def test_concurrent_series(self):
+        def book(user):
+            try:
+                book_series(ReservationSeries(user=user, space=self.space, schedule=self.schedules[0],
+                                              start_date=self.day, until=self.day + timedelta(weeks=4)))
+                return True
+            except ValidationError:
+                return False
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(max_workers=self.clients) as pool:
+            results = list(pool.map(book, self.users))
+        self.assertEqual(results.count(True), 1)
+        self.assertEqual(ReservationSeries.objects.count(), 1)
+
+
+class OverlapBookingTests(TestCase):
+    """Los conflictos se detectan por solapamiento de intervalos, no por horario idéntico."""
+
+    def setUp(self):
+        self.space = Space.objects.create(name='Aula 101', capacity=30, type='AULA')
+        self.schedules = [Schedule.objects.create(start_time=time(h), end_time=time(h + 2)) for h in (8, 9, 10)]
+        self.client.force_login(CustomUser.objects.create_user('solapes'))
+        self.day = date.today() + timedelta(days=7)
+
+    def post(self, schedule, **extra):
+        return self.client.post(reverse('reservation-create'), {
+            'space': self.space.pk, 'schedule': schedule.pk, 'date': self.day.isoformat(), **extra,
+        })
+
+    def test_overlapping_schedules(self):
+        self.assertEqual(self.post(self.schedules[0]).status_code, 302)
+        # 09:00-11:00 se solapa con 08:00-10:00; 10:00-12:00 solo lo toca en el borde
+        self.assertEqual(self.post(self.schedules[1]).status_code, 200)
+        self.assertEqual(self.post(self.schedules[2]).status_code, 302)
+        # Un rango a medida se valida contra los intervalos guardados
+        self.assertEqual(self.post(self.schedules[2], start_time='11:30', end_time='12:30').status_code, 200)
+        self.assertEqual(list(Reservation.objects.order_by('start_time').values_list('start_time', 'end_time')),
+                         [(time(8), time(10)), (time(10), time(12))])
+
+    def test_admin_validates_overlaps(self):
+        # El admin guarda sin pasar por booking.py: Reservation.clean() hace la comprobación
+        admin = CustomUser.objects.create_superuser('root', 'root@ejemplo.com', 'clave')
+        self.client.force_login(admin)
+        data = {
+            'user': admin.pk, 'space': self.space.pk, 'schedule': self.schedules[0].pk,
+            'date': self.day.isoformat(), 'start_time': '', 'end_time': '', 'purpose': '', 'status': 'PENDING',
+            'reminder_sent_at_0': '', 'reminder_sent_at_1': '', 'series': '',
+        }
+        url = reverse('admin:reservas_reservation_add')
+        self.assertEqual(self.client.post(url, data).status_code, 302)
+        response = self.client.post(url, {**data, 'schedule': self.schedules[1].pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, SLOT_TAKEN_MESSAGE)
+        self.assertEqual(Reservation.objects.count(), 1)
+
+    def test_inverted_interval(self):
+        reserva = Reservation(user=CustomUser.objects.get(), space=self.space, schedule=self.schedules[0],
+                              date=self.day, start_time=time(11), end_time=time(9))
+        with self.assertRaises(ValidationError) as ctx:
+            reserva.full_clean()
+        self.assertIn('end_time', ctx.exception.message_dict)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            reserva.save()
+
+    def test_weekly_and_series_overlap(self):
+        user = CustomUser.objects.get()
+        Reservation.objects.create(user=user, space=self.space, schedule=self.schedules[1],
+                                   date=self.day + timedelta(weeks=2))
+        weekly = Reservation(user=user, space=self.space, schedule=self.schedules[0], date=self.day)
+        with self.assertRaisesMessage(ValidationError, (self.day + timedelta(weeks=2)).isoformat()):
+            book_weekly(weekly, 4)
+        self.assertEqual(Reservation.objects.count(), 1)
+        # Una serie de 10:00-12:00 choca con un rango a medida de 11:00-11:30 y con 09:00-11:00
+        Reservation.objects.create(user=user, space=self.space, schedule=self.schedules[2], date=self.day,
+                                   start_time=time(11), end_time=time(11, 30))
+        series = ReservationSeries(user=user, space=self.space, schedule=self.schedules[2],
+                                   start_date=self.day, until=self.day + timedelta(weeks=3))
+        self.assertEqual(series_conflicts(series), [self.day, self.day + timedelta(weeks=2)])
+        # 08:00-10:00 no toca el rango de 11:00-11:30
+        series.schedule = self.schedules[0]
+        self.assertEqual(series_conflicts(series), [self.day + timedelta(weeks=2)])
+
+    def test_custom_range_in_reminders_and_reports(self):
+        from .analytics import filtered_stats
+        reserva = Reservation.objects.create(user=CustomUser.objects.get(), space=self.space, date=self.day,
+                                             schedule=self.schedules[0], start_time=time(8, 30), end_time=time(9))
+        self.assertIn('08:30 - 09:00', build_reminder(reserva).body)
+        self.assertIn('08:30 - 09:00', str(reserva))
+        stats = filtered_stats({})
+        self.assertEqual([r['label'] for r in stats['summary']['by_schedule']], ['08:30 - 09:00'])
+        self.assertEqual(stats['schedule_labels'], ['08:30 - 09:00'])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Restricción de exclusión solo en PostgreSQL')
+    def test_exclusion_constraint(self):
+        user = CustomUser.objects.get()
+        rows = [Reservation(user=user, space=self.space, schedule=sc, date=self.day) for sc in self.schedules[:2]]
+        # bulk_create no valida: la restricción de la base rechaza el solapamiento
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Reservation.objects.bulk_create(rows)
+
+    def test_interval_index(self):
+        index = IntervalIndex([(time(8), time(12)), (time(13), time(14))])
+        self.assertTrue(index.overlaps(time(10), time(11)))
+        self.assertFalse(index.overlaps(time(12), time(13)))
+        index.add(time(12), time(13))
+        self.assertEqual(index.overlapping(time(11), time(13, 30)),
+                         [(time(8), time(12)), (time(12), time(13)), (time(13), time(14))])
+
+
+class RollupTests(TestCase):
+    """DailySpaceUsage sigue a las reservas al crear, borrar, cambiar de estado o mover."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('lector')
+        self.aula, self.lab = Space.objects.bulk_create([Space(name='Aula', capacity=5, type='AULA'),
+                                                         Space(name='Lab', capacity=5, type='LAB')])
+        self.schedule = Schedule.objects.create(start_time=time(8), end_time=time(9))
+        self.day = date(2025, 3, 3)
+
+    def usage(self):
+        return {(u.space_id, u.date, u.status): u.count for u in DailySpaceUsage.objects.filter(count__gt=0)}
+
+    def assertMatchesRebuild(self):
+        usage = self.usage()
+        call_command('rebuild_rollups', stdout=open(os.devnull, 'w'))
+        self.assertEqual(self.usage(), usage)
+
+    def test_create_status_move_delete(self):
+        reserva = Reservation.objects.create(user=self.user, space=self.aula, schedule=self.schedule, date=self.day)
+        Reservation.objects.create(user=self.user, space=self.aula, schedule=self.schedule,
+                                   date=self.day + timedelta(days=1))
+        self.assertEqual(self.usage(), {(self.aula.pk, self.day, 'PENDING'): 1,
+                                        (self.aula.pk, self.day + timedelta(days=1), 'PENDING'): 1})
+        reserva.status = 'CONFIRMED'
+        reserva.save()
+        self.assertEqual(self.usage()[(self.aula.pk, self.day, 'CONFIRMED')], 1)
+        self.assertNotIn((self.aula.pk, self.day, 'PENDING'), self.usage())
+        # Mover de espacio y de fecha a la vez resta en la fila vieja y suma en la nueva
+        reserva.space, reserva.date = self.lab, self.day + timedelta(days=1)
+        reserva.save()
+        self.assertEqual(self.usage(), {(self.aula.pk, self.day + timedelta(days=1), 'PENDING'): 1,
+                                        (self.lab.pk, self.day + timedelta(days=1), 'CONFIRMED'): 1})
+        self.assertMatchesRebuild()
+        # Guardar sin cambios no toca los contadores
+        reserva.save()
+        self.assertEqual(self.usage()[(self.lab.pk, self.day + timedelta(days=1), 'CONFIRMED')], 1)
+        reserva.delete()
+        self.assertEqual(self.usage(), {(self.aula.pk, self.day + timedelta(days=1), 'PENDING'): 1})
+        self.assertMatchesRebuild()
+
+class SeriesTests(TestCase):
+    """Series recurrentes: expansión de fechas, choques al guardar y materialización."""
+
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('serial')
+        self.space = Space.objects.create(name='Lab 3', capacity=12, type='LAB')
+        self.schedule = Schedule.objects.create(start_time=time(10), end_time=time(12))
+        self.day = date(2025, 3, 3)
+
+    def series(self, **kwargs):
+        return ReservationSeries(**{'user': self.user, 'space': self.space, 'schedule': self.schedule,
+                                    'start_date': self.day, 'until': self.day + timedelta(weeks=6), **kwargs})
+
+    def test_occurrences(self):
+        series = self.series(frequency='BIWEEKLY', exceptions=[(self.day + timedelta(weeks=2)).isoformat()])
+        self.assertEqual(list(series.dates()), [self.day, self.day + timedelta(weeks=4), self.day + timedelta(weeks=6)])
+        # La ventana empieza a mitad de la serie sin desplazar el paso de dos semanas
+        self.assertEqual(list(series.dates(self.day + timedelta(days=1), self.day + timedelta(weeks=5))),
+                         [self.day + timedelta(weeks=4)])
+        self.assertTrue(series.occurs_on(self.day + timedelta(weeks=6)))
+        self.assertFalse(series.occurs_on(self.day + timedelta(weeks=2)))
+        self.assertFalse(series.occurs_on(self.day + timedelta(weeks=1)))
+
+    def test_conflicts_rejected(self):
+        book_series(self.series(until=self.day + timedelta(weeks=2)))
+        Reservation.objects.create(user=self.user, space=self.space, schedule=self.schedule,
+                                   date=self.day + timedelta(weeks=4), start_time=time(11), end_time=time(13))
+        with self.assertRaisesMessage(ValidationError, '2025-03-17, 2025-03-31'):
+            book_series(self.series(start_date=self.day + timedelta(weeks=2)))
+        self.assertEqual(ReservationSeries.objects.count(), 1)
+        # Una reserva suelta sobre una ocurrencia de la serie también se rechaza
+        with self.assertRaisesMessage(ValidationError, SLOT_TAKEN_MESSAGE):
+            book_reservation(Reservation(user=self.user, space=self.space, schedule=self.schedule,
+                                         date=self.day + timedelta(weeks=1)))
+
+    def test_materialize_reports_taken_dates(self):
+        series = book_series(self.series())
+        # bulk_create no valida: una reserva ya ocupa la tercera ocurrencia
+        taken_day = self.day + timedelta(weeks=2)
+        Reservation.objects.bulk_create([Reservation(user=self.user, space=self.space, schedule=self.schedule,
+                                                     date=taken_day)])
+        created, taken = materialize_series(series, self.day, self.day + timedelta(weeks=3))
+        self.assertEqual(taken, [taken_day])
+        self.assertEqual(sorted(r.date for r in created),
+                         [self.day, self.day + timedelta(weeks=1), self.day + timedelta(weeks=3)])
+        series.refresh_from_db()
+        self.assertNotIn(taken_day.isoformat(), series.exceptions)
+        self.assertEqual(len(series.exceptions), 3)
+        self.assertEqual(ReservationChange.objects.filter(action='CREATE').count(), 3)
+        self.assertEqual(sum(DailySpaceUsage.objects.values_list('count', flat=True)), 3)
+        # Repetir no duplica y vuelve a informar del conflicto pendiente
+        self.assertEqual(materialize_series(series, self.day, self.day + timedelta(weeks=3)), ([], [taken_day]))
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class ModerationTests(TestCase):
+    """Moderación en bloque: estados, rollup, registro de cambios, avisos por correo y consultas fijas."""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('moderador', role='ADMIN')
+        self.users = [CustomUser.objects.create_user(f'socio{i}', f'socio{i}@ejemplo.com') for i in range(3)]
+        self.space = Space.objects.create(name='Sala A', capacity=10, type='SALA')
+        self.schedules = [Schedule.objects.create(start_time=time(h), end_time=time(h + 2)) for h in (8, 10, 12)]
+        self.day = date.today() + timedelta(days=3)
+        self.first, self.second, self.done = (
+            Reservation.objects.create(user=user, space=self.space, schedule=schedule, date=self.day, status=status)
+            for user, schedule, status in zip(self.users, self.schedules, ('PENDING', 'PENDING', 'CONFIRMED')))
+        self.client.force_login(self.admin)
+
+    def moderate(self, query='', **data):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(reverse('reservation-moderate') + query, data)
+
+    def statuses(self):
+        return dict(Reservation.objects.values_list('pk', 'status'))
+
+    def usage(self):
+        return dict(DailySpaceUsage.objects.filter(count__gt=0).values_list('status', 'count'))
+
+    def test_login_required(self):
+        self.client.logout()
+        response = self.client.post(reverse('reservation-moderate'), {'accion': 'confirmar'})
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(settings.LOGIN_URL, response['Location'])
+
+    def test_confirm_selection(self):
+        self.assertEqual(self.moderate(accion='confirmar', ids=[self.first.pk, self.done.pk]).status_code, 302)
+        self.assertEqual(self.statuses(), {self.first.pk: 'CONFIRMED', self.second.pk: 'PENDING',
+                                           self.done.pk: 'CONFIRMED'})
+        # La ya confirmada no se toca ni se notifica
+        self.assertEqual([(m.to, m.subject) for m in mail.outbox], [(['socio0@ejemplo.com'], 'Reserva confirmada')])
+        self.assertEqual(ReservationChange.objects.filter(action='STATUS').count(), 1)
+        self.assertEqual(self.usage(), {'CONFIRMED': 2, 'PENDING': 1})
+
+    def test_reject_whole_filter(self):
+        self.moderate('?estado=PENDING', accion='rechazar', alcance='filtro')
+        self.assertEqual(self.statuses(), {self.first.pk: 'REJECTED', self.second.pk: 'REJECTED',
+                                           self.done.pk: 'CONFIRMED'})
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(self.usage(), {'CONFIRMED': 1, 'REJECTED': 2})
+
+    def test_queries_do_not_depend_on_selection_size(self):
+        def count(day):
+            with CaptureQueriesContext(connection) as queries:
+                moderate_reservations(Reservation.objects.filter(date=day), 'confirmar')
+            return len(queries)
+
+        few = count(self.day)
+        user = self.users[0]
+        spaces = Space.objects.bulk_create(Space(name=f'Sala {i}', capacity=5, type='SALA') for i in range(40))
+        Reservation.objects.bulk_create(Reservation(user=user, space=space, schedule=schedule, date=self.day,
+                                                    start_time=schedule.start_time, end_time=schedule.end_time)
+                                        for space in spaces for schedule in self.schedules)
+        self.assertEqual(count(self.day), few)
+        self.assertEqual(Reservation.objects.filter(status='CONFIRMED').count(), 3 + 120)
+
+class AvailabilityGridTests(TestCase):
+    """La grilla de disponibilidad coincide con un recorrido directo de reservas y series."""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user('ocupante')
+        self.start, self.end = date(2025, 3, 3), date(2025, 3, 23)
+        self.spaces = [Space.objects.create(name=n, capacity=5, type='SALA') for n in ('Sala A', 'Sala B')]
+        inactive = Space.objects.create(name='Sala C', capacity=5, type='SALA', is_active=False)
+        self.schedules = [Schedule.objects.create(start_time=a, end_time=b) for a, b in
+                          ((time(8), time(9)), (time(9), time(10)), (time(9, 30), time(10, 30)), (time(11), time(12)))]
+        a, b = self.spaces
+        day = self.start
+        for space, offset, schedule, status, extra in (
+            (a, 0, 0, 'CONFIRMED', {}),
+            (a, 1, 1, 'PENDING', {'start_time': time(9, 45), 'end_time': time(10)}),
+            (b, 2, 3, 'REJECTED', {}),
+            (b, 25, 0, 'CONFIRMED', {}),
+            (inactive, 0, 0, 'CONFIRMED', {}),
+        ):
+            Reservation.objects.create(user=user, space=space, schedule=self.schedules[schedule],
+                                       date=day + timedelta(days=offset), status=status, **extra)
+        for space, start, schedule, frequency, status, exceptions in (
+            (a, day, 3, 'WEEKLY', 'CONFIRMED', [(day + timedelta(weeks=1)).isoformat()]),
+            (b, day - timedelta(weeks=1), 2, 'BIWEEKLY', 'PENDING', []),
+            (b, day, 0, 'WEEKLY', 'REJECTED', []),
+        ):
+            ReservationSeries.objects.create(user=user, space=space, schedule=self.schedules[schedule],
+                                             frequency=frequency, start_date=start, until=day + timedelta(days=40),
+                                             status=status, exceptions=exceptions)
+
+    def expected_free(self):
+        taken = [(r.space_id, r.date, r.start_time, r.end_time) for r in Reservation.objects.all()]
+        days = [self.start + timedelta(days=i) for i in range((self.end - self.start).days + 1)]
+        for serie in ReservationSeries.objects.exclude(status='REJECTED'):
+            taken += [(serie.space_id, d, serie.schedule.start_time, serie.schedule.end_time)
+                      for d in days if serie.occurs_on(d)]
+        return {(space.pk, sc.pk, d) for space in self.spaces for d in days for sc in self.schedules
+                if not any(sp == space.pk and day == d and a < sc.end_time and sc.start_time < b
+                           for sp, day, a, b in taken)}
+
+    def test_grid_matches_direct_scan(self):
+        from .availability import occupancy_grid
+        expected = self.expected_free()
+        # Ocupados: la reserva del día 0, el rango a medida (dos horarios), la rechazada, la serie
+        # semanal menos su excepción y la quincenal, que empezó antes y solapa dos horarios
+        self.assertEqual(len(self.schedules) * len(self.spaces) * 21 - len(expected), 1 + 2 + 1 + 2 + 2)
+        self.assertEqual(set(occupancy_grid(self.start, self.end).free_slots()), expected)
+
+    def test_view_matches_direct_scan(self):
+        self.client.force_login(CustomUser.objects.get())
+        response = self.client.get(reverse('availability'), {'fecha_inicio': self.start.isoformat(),
+                                                             'fecha_fin': self.end.isoformat()})
+        data = response.json()
+        self.assertEqual(set(data['spaces']), {str(space.pk) for space in self.spaces})
+        free = {(entry['space'], pk, date.fromisoformat(entry['date']))
+                for entry in data['free'] for pk in entry['schedules']}
+        self.assertEqual(free, self.expected_free())
+
+class SlotOccupancyTests(TestCase):
+    """Máscaras de ocupación por espacio: intervalos, series, invalidación por espacio y edición."""
+
+    def setUp(self):
+        slots.clear()
+        self.user = CustomUser.objects.create_user('ocupante')
+        self.space, self.other = (Space.objects.create(name=n, capacity=5, type='SALA') for n in ('Sala D', 'Sala E'))
+        self.schedules = [Schedule.objects.create(start_time=time(h), end_time=time(h + 1)) for h in (8, 9, 10)]
+        self.day = date.today() + timedelta(days=2)
+
+    def reserve(self, **kwargs):
+        return Reservation.objects.create(**{'user': self.user, 'space': self.space, 'schedule': self.schedules[0],
+                                             'date': self.day, **kwargs})
+
+    def ids(self, *indexes):
+        return [self.schedules[i].pk for i in indexes]
+
+    def test_bitmask(self):
+        self.reserve(start_time=time(9, 30), end_time=time(10, 30))
+        self.assertEqual(slots.taken_schedule_ids(self.space.pk, self.day), self.ids(1, 2))
+        self.assertEqual(slots.free_schedule_ids(self.space.pk, self.day), self.ids(0))
+        self.assertTrue(slots.is_taken(self.space.pk, self.day, self.schedules[2].pk))
+        self.assertEqual(slots.taken_schedule_ids(self.other.pk, self.day), [])
+
+    def test_invalidated_per_space(self):
+        self.assertEqual(slots.taken_schedule_ids(self.space.pk, self.day), [])
+        with self.assertNumQueries(1):
+            slots.taken_schedule_ids(self.space.pk, self.day + timedelta(days=3))
+        # Una reserva en otro espacio no invalida este
+        Reservation.objects.create(user=self.user, space=self.other, schedule=self.schedules[1], date=self.day)
+        with self.assertNumQueries(1):
+            self.assertEqual(slots.taken_schedule_ids(self.space.pk, self.day), [])
+        # Las series y las reservas en bloque (sin señales de Reservation) sí lo hacen
+        book_series(ReservationSeries(user=self.user, space=self.space, schedule=self.schedules[1],
+                                      start_date=self.day, until=self.day + timedelta(weeks=1)))
+        with self.assertNumQueries(4):
+            self.assertEqual(slots.taken_schedule_ids(self.space.pk, self.day), self.ids(1))
+        book_weekly(Reservation(user=self.user, space=self.space, schedule=self.schedules[2],
+                                date=self.day + timedelta(days=1)), 2)
+        self.assertEqual(slots.taken_schedule_ids(self.space.pk, self.day + timedelta(days=1)), self.ids(2))
+
+    def test_space_save_keeps_version(self):
+        self.assertEqual(slots.taken_schedule_ids(self.space.pk, self.day), [])
+        # Un Space leído antes de la reserva y guardado después (formulario o admin)
+        space = Space.objects.get(pk=self.space.pk)
+        self.reserve(schedule=self.schedules[1])
+        space.name = 'Sala D renombrada'
+        space.save()
+        self.assertEqual(Space.objects.get(pk=self.space.pk).name, 'Sala D renombrada')
+        self.assertEqual(slots.taken_schedule_ids(self.space.pk, self.day), self.ids(1))
+
+    def test_endpoint(self):
+        self.client.force_login(self.user)
+        self.reserve(schedule=self.schedules[1])
+        url = reverse('slot-occupancy')
+        data = self.client.get(url, {'space': self.space.pk, 'date': self.day.isoformat()}).json()
+        self.assertEqual(data, {'space': self.space.pk, 'date': self.day.isoformat(), 'taken': self.ids(1)})
+        self.assertEqual(self.client.get(url, {'space': 'x', 'date': self.day.isoformat()}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'space': self.space.pk}).status_code, 400)
+
+    def test_own_slot_on_edit(self):
+        # La reserva editada (08:30-09:30) no ocupa sus propios horarios; la ajena (09:00-10:00) sí
+        own = self.reserve(start_time=time(8, 30), end_time=time(9, 30))
+        self.reserve(schedule=self.schedules[1])
+        self.client.force_login(self.user)
+        params = {'space': self.space.pk, 'date': self.day.isoformat()}
+        url = reverse('slot-occupancy')
+        self.assertEqual(self.client.get(url, params).json()['taken'], self.ids(0, 1))
+        self.assertEqual(self.client.get(url, {**params, 'exclude': own.pk}).json()['taken'], self.ids(1))
+        response = self.client.get(reverse('reservation-update', args=[own.pk]))
+        self.assertContains(response, f"params.set('exclude', '{own.pk}')")
+
+class CalendarEventsTests(TestCase):
+    """GET condicionales del calendario: 304 mientras no cambie nada de lo que muestra."""
+
+    def setUp(self):
+        cache.clear()
+        self.admin = CustomUser.objects.create_superuser('root', 'root@ejemplo.com', 'clave')
+        self.space = Space.objects.create(name='Aula', capacity=5, type='AULA')
+        self.day = date.today()
+        Reservation.objects.create(user=self.admin, space=self.space, date=self.day, status='CONFIRMED',
+                                   schedule=Schedule.objects.create(start_time=time(8), end_time=time(9)))
+        self.client.force_login(self.admin)
+
+    def get(self, etag=None):
+        params = {'start': self.day.isoformat(), 'end': (self.day + timedelta(days=7)).isoformat()}
+        headers = {'If-None-Match': etag} if etag else {}
+        return self.client.get(reverse('calendar-events'), params, headers=headers)
+
+    def assertChanged(self, etag):
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        return response
+
+    def test_etag_follows_names(self):
+        otro = CustomUser.objects.create_user('otro')
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+        # Otro login solo guarda last_login: el calendario no cambia
+        Client().force_login(otro)
+        self.assertEqual(self.get(etag).status_code, 304)
+        self.space.name = 'Aula magna'
+        self.space.save()
+        response = self.assertChanged(etag)
+        self.assertEqual(response.json()[0]['title'], 'Aula magna - root')
+        etag = response['ETag']
+        self.admin.username = 'raiz'
+        self.admin.save()
+        response = self.assertChanged(etag)
+        self.assertEqual(response.json()[0]['title'], 'Aula magna - raiz')
+
+class CachedListTests(TestCase):
+    """Listas cacheadas por página: aciertos sin consultas, invalidación al escribir y backend compartido."""
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(CustomUser.objects.create_user('lector'))
+        Space.objects.bulk_create(Space(name=f'Espacio {i:02d}', capacity=5, type='AULA') for i in range(12))
+
+    def names(self, page=1):
+        response = self.client.get(reverse('space-list'), {'page': page})
+        return [space.name for space in response.context['page_obj'].object_list]
+
+    def test_pages_cached_and_invalidated(self):
+        self.assertEqual(len(self.names()), 10)
+        # Solo sesión y usuario: la página y la tabla renderizada salen del caché
+        with self.assertNumQueries(2):
+            self.assertEqual(len(self.names()), 10)
+        self.assertEqual(self.names(2), ['Espacio 10', 'Espacio 11'])
+        cached_keys = [key for key in cache._cache if ':reservas:space_page:' in key]
+        self.assertEqual(len(cached_keys), 2)
+        Space.objects.create(name='Espacio 12', capacity=5, type='AULA')
+        self.assertEqual(self.names(2), ['Espacio 10', 'Espacio 11', 'Espacio 12'])
+        self.assertEqual(self.client.get(reverse('space-list'), {'page': 9}).status_code, 404)
+
+    def test_dashboard_cached_as_plain_rows(self):
+        schedule = Schedule.objects.create(start_time=time(8), end_time=time(9))
+        user = CustomUser.objects.get()
+        Reservation.objects.create(user=user, space=Space.objects.get(name='Espacio 03'), schedule=schedule,
+                                   date=date(2025, 3, 3))
+        self.assertContains(self.client.get(reverse('dashboard')), '<b>Espacio 03</b> - lector')
+        recent = [value for key, value in cache._cache.items() if ':reservas:dashboard:' in key]
+        self.assertEqual(len(recent), 1)
+        self.assertNotIn(b'Reservation', recent[0])
+        # Sesión, usuario y las dos de la versión del registro de cambios; el resto sale del caché
+        with self.assertNumQueries(4):
+            self.assertContains(self.client.get(reverse('dashboard')), '<b>Espacio 03</b> - lector')
+        Reservation.objects.update(status='CONFIRMED')
+        Reservation.objects.get().save()
+        self.assertContains(self.client.get(reverse('dashboard')), 'CONFIRMED')
+
+    def test_gunicorn_uses_shared_cache_with_several_workers(self):
+        for conf in ('gunicorn.conf.py', 'gunicorn_asgi.conf.py'):
+            path = Path(settings.BASE_DIR) / conf
+            with self.subTest(conf=conf), mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '3'}):
+                os.environ.pop('CACHE_BACKEND', None)
+                runpy.run_path(str(path))
+                self.assertEqual(os.environ['CACHE_BACKEND'], 'django.core.cache.backends.filebased.FileBasedCache')
+            with mock.patch.dict(os.environ, {'WEB_CONCURRENCY': '1'}):
+                os.environ.pop('CACHE_BACKEND', None)
+                runpy.run_path(str(path))
+                self.assertNotIn('CACHE_BACKEND', os.environ)
+
+class PaginationTests(TestCase):
+    """Cursores de KeysetPaginator y conteo del paginator del admin."""
+
+    def setUp(self):
+        user = CustomUser.objects.create_user('lector')
+        spaces = Space.objects.bulk_create(Space(name=f'Espacio {i}', capacity=5, type='AULA') for i in range(5))
+        schedule = Schedule.objects.create(start_time=time(8), end_time=time(9))
+        Reservation.objects.bulk_create(Reservation(user=user, space=sp, schedule=schedule,
+                                                    date=date(2025, 3, 1) + timedelta(days=d))
+                                        for d in range(3) for sp in spaces)
+        # Empates en (date, created_at): solo el id desempata
+        Reservation.objects.update(created_at=timezone.now())
+        self.ordered = list(Reservation.objects.order_by('-date', '-created_at', 'id').values_list('id', flat=True))
+
+    def ids(self, page):
+        return [r.id for r in page]
+
+    def test_next_and_previous_round_trip(self):
+        paginator = KeysetPaginator(Reservation.objects.all(), 4)
+        pages, page = [], paginator.page()
+        self.assertFalse(page.has_previous)
+        while True:
+            pages.append(page)
+            if not page.has_next:
+                break
+            page = paginator.page(page.next_cursor)
+        self.assertEqual([pk for p in pages for pk in self.ids(p)], self.ordered)
+        self.assertEqual([len(p) for p in pages], [4, 4, 4, 3])
+        # Hacia atrás se recorren las mismas páginas, con los mismos cursores
+        for previous, current in zip(reversed(pages[:-1]), reversed(pages[1:])):
+            back = paginator.page(current.previous_cursor)
+            self.assertEqual(self.ids(back), self.ids(previous))
+            self.assertEqual(self.ids(paginator.page(back.next_cursor)), self.ids(current))
+        self.assertFalse(paginator.page(pages[1].previous_cursor).has_previous)
+
+    def test_tampered_cursor_falls_back_to_first_page(self):
+        paginator = KeysetPaginator(Reservation.objects.all(), 4)
+        cursor = paginator.page().next_cursor
+        forged = signing.dumps(['next', ['2000-01-01', timezone.now().isoformat(), 0]], salt='otra')
+        for bad in (cursor[:-2] + 'xx', forged, 'basura', ''):
+            with self.subTest(cursor=bad):
+                page = paginator.page(bad)
+                self.assertEqual(self.ids(page), self.ordered[:4])
+                self.assertFalse(page.has_previous)
+
+    def test_admin_count_exact_with_filters(self):
+        paginator = EstimatedCountPaginator(Reservation.objects.all(), 10)
+        with mock.patch('reservas.pagination.estimated_count', return_value=1000) as estimate:
+            self.assertEqual(paginator.count, 1000)
+            filtered = EstimatedCountPaginator(Reservation.objects.filter(date=date(2025, 3, 1)), 10)
+            self.assertEqual(filtered.count, 5)
+        estimate.assert_called_once()
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class ReminderTests(TestCase):
+    """Recordatorios: envío por lotes, fallos parciales y reenvío cuando cambia la fecha."""
+
+    total = 250
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('recordador', role='ADMIN')
+        space = Space.objects.create(name='Sala F', capacity=10, type='SALA')
+        schedule = Schedule.objects.create(start_time=time(8), end_time=time(9))
+        users = CustomUser.objects.bulk_create(
+            CustomUser(username=f'aviso{i}', email=f'aviso{i}@ejemplo.com') for i in range(self.total))
+        self.tomorrow = timezone.now().date() + timedelta(days=1)
+        Reservation.objects.bulk_create(
+            Reservation(user=u, space=space, schedule=schedule, date=self.tomorrow, status='CONFIRMED',
+                        start_time=time(8), end_time=time(9)) for u in users)
+
+    def failing_second_batch(self):
+        calls = []
+
+        def send(messages):
+            calls.append(len(messages))
+            if len(calls) == 2:
+                raise OSError('SMTP caído')
+            return _send_batch(messages)
+        return mock.patch('reservas.reminders._send_batch', side_effect=send)
+
+    def test_throughput(self):
+        start = _time.perf_counter()
+        # Una consulta para leer las reservas y un UPDATE por lote enviado
+        with self.assertNumQueries(1 + 3):
+            sent = send_reminders(pending_reminders(self.tomorrow), batch_size=100, workers=2)
+        elapsed = _time.perf_counter() - start
+        self.assertEqual((sent, len(mail.outbox)), (self.total, self.total))
+        self.assertLess(elapsed, 5, f'{self.total / elapsed:.0f} recordatorios/s')
+        self.assertFalse(pending_reminders(self.tomorrow).exists())
+
+    def test_partial_failure(self):
+        with self.failing_second_batch(), self.assertRaises(ReminderSendError) as ctx:
+            send_reminders(pending_reminders(self.tomorrow), batch_size=100)
+        self.assertEqual(ctx.exception.sent, 150)
+        self.assertEqual(pending_reminders(self.tomorrow).count(), 100)
+        # El siguiente envío solo repite el lote que falló
+        self.assertEqual(send_reminders(pending_reminders(self.tomorrow), batch_size=100), 100)
+        self.assertEqual(len(mail.outbox), self.total)
+
+    def test_partial_failure_in_view_and_command(self):
+        self.client.force_login(self.admin)
+        with self.failing_second_batch():
+            response = self.client.get(reverse('recordar-automatico'), follow=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Se enviaron 150 recordatorios; algunos fallaron', str(list(response.context['messages'])[0]))
+        Reservation.objects.update(reminder_sent_at=None)
+        with self.failing_second_batch(), self.assertRaisesMessage(CommandError, 'SMTP caído'):
+            call_command('enviar_recordatorios', stdout=open(os.devnull, 'w'))
+
+    async def test_views_under_asgi(self):
+        reserva = await Reservation.objects.select_related('user').order_by('pk').afirst()
+        urls = [reverse('recordar-reserva', args=[reserva.pk]), reverse('recordar-automatico'),
+                reverse('export-excel'), reverse('export-pdf')]
+        # Sin sesión se redirige al login en lugar de fallar al consultar el usuario anónimo
+        for url in urls:
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 302)
+            self.assertIn(settings.LOGIN_URL, response['Location'])
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(urls[0])
+        self.assertEqual((response.status_code, response['Location']), (302, reverse('reservation-list')))
+        self.assertEqual([m.to for m in mail.outbox], [[reserva.user.email]])
+        response = await self.async_client.get(urls[1])
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), self.total + 1)
+        self.assertFalse(await pending_reminders(self.tomorrow).aexists())
+
+    def test_date_change_resets_reminder(self):
+        send_reminders(pending_reminders(self.tomorrow))
+        reserva, other = Reservation.objects.order_by('pk')[:2]
+        reserva.purpose = 'Sin cambio de fecha'
+        reserva.save()
+        self.assertIsNotNone(reserva.reminder_sent_at)
+        reserva.date = self.tomorrow + timedelta(days=1)
+        reserva.save()
+        other.date = self.tomorrow + timedelta(days=1)
+        other.save(update_fields=['date'])
+        self.assertEqual(Reservation.objects.filter(reminder_sent_at__isnull=True).count(), 2)
+
+class ReservationFactsTests(TestCase):
+    """Las series de ReservationFacts coinciden con las agregaciones equivalentes del ORM."""
+
+    @classmethod
+    def setUpTestData(cls):
+        spaces, schedules, users = seed_reservations(spaces=6, schedules=4, users=5, days=40,
+                                                     start=date(2024, 12, 16))
+        # Un rango a medida: cuenta como su propio intervalo, no como el del horario
+        Reservation.objects.bulk_create([Reservation(user=users[0], space=spaces[0], schedule=schedules[0],
+                                                     date=date(2025, 1, 3), start_time=time(7, 30),
+                                                     end_time=time(7, 45), status='CONFIRMED')])
+        call_command('rebuild_rollups', stdout=open(os.devnull, 'w'))
+
+    def test_matches_orm_aggregates(self):
+        from django.db.models import Count
+        from django.db.models.functions import ExtractWeek, TruncMonth
+        from .analytics import ReservationFacts, slot_label
+        qs = Reservation.objects.all()
+        facts = ReservationFacts.from_reservations(qs)
+        self.assertEqual(facts.total(), qs.count())
+        by_status = dict(qs.values_list('status').annotate(n=Count('id')).order_by())
+        self.assertEqual({k: v for k, v in facts.by_status().items() if v}, by_status)
+        self.assertEqual(facts.by_space(), dict(qs.values_list('space_id').annotate(n=Count('id')).order_by()))
+        months = qs.annotate(m=TruncMonth('date')).values_list('m').annotate(n=Count('id')).order_by('m')
+        self.assertEqual(facts.by_month(), ([f'{m:%Y-%m}' for m, _ in months], [n for _, n in months]))
+        weeks = (qs.filter(status='CONFIRMED').annotate(w=ExtractWeek('date')).values_list('w')
+                 .annotate(n=Count('id')).order_by('w'))
+        self.assertEqual(facts.confirmed_by_week(), ([str(w) for w, _ in weeks], [n for _, n in weeks]))
+        slots = (qs.values_list('start_time', 'end_time').annotate(n=Count('id')).order_by('start_time', 'end_time'))
+        self.assertEqual([(slot_label(k), n) for k, n in facts.by_slot().items()],
+                         [(f'{a:%H:%M} - {b:%H:%M}', n) for a, b, n in slots])
+        self.assertEqual(facts.active_days(), qs.values('date').distinct().count())
+        top = list(qs.values_list('space_id').annotate(n=Count('id')).order_by('-n', 'space_id')[:5])
+        self.assertEqual(facts.top_spaces(), top)
+        # Los hechos del rollup dan los mismos totales por estado, espacio y mes
+        usage = ReservationFacts.from_usage()
+        self.assertEqual(usage.by_status(), facts.by_status())
+        self.assertEqual(usage.by_space(), facts.by_space())
+        self.assertEqual(usage.by_month(), facts.by_month())
+
+    def test_filtered_stats_uses_given_names(self):
+        from .analytics import filtered_stats
+        names = dict(Space.objects.values_list('id', 'name'))
+        with self.assertNumQueries(1):
+            stats = filtered_stats({'estado': 'CONFIRMED'}, names)
+        self.assertEqual(stats['total'], Reservation.objects.filter(status='CONFIRMED').count())
+        self.assertEqual(stats, filtered_stats({'estado': 'CONFIRMED'}))
+
+    def test_summary_matches_orm(self):
+        from django.db.models import Count
+        from .analytics import filtered_stats
+        qs = Reservation.objects.all()
+        summary = filtered_stats({})['summary']
+        names = dict(Space.objects.values_list('id', 'name'))
+        expected = {}
+        for space_id, status, n in qs.values_list('space_id', 'status').annotate(n=Count('id')).order_by():
+            expected.setdefault(names[space_id], {})[status] = n
+        statuses = [code for code, _ in Reservation.STATUS_CHOICES]
+        self.assertEqual({r['label']: {k: r[k] for k in statuses if r[k]} for r in summary['by_space']}, expected)
+        self.assertEqual([r['total'] for r in summary['by_space']],
+                         sorted((sum(v.values()) for v in expected.values()), reverse=True))
+        slots = (qs.values_list('start_time', 'end_time').annotate(n=Count('id'))
+                 .order_by('start_time', 'end_time'))
+        self.assertEqual([(r['label'], r['total']) for r in summary['by_schedule']],
+                         [(f'{a:%H:%M} - {b:%H:%M}', n) for a, b, n in slots])
+
+    def _all_rows_page(self, client):
+        admin = CustomUser.objects.create_superuser('root', 'root@ejemplo.com', 'clave')
+        client.force_login(admin)
+        return reverse('filtrar-reservas') + '?estado=REJECTED&todas=1'
+
+    def _expected_rows(self):
+        return [f'<td>{d}</td><td>{s}</td>' for d, s in Reservation.objects.filter(status='REJECTED')
+                .order_by('-date', '-created_at', 'id').values_list('date', 'space__name')]
+
+    def test_stream_all_rows_in_base_page(self):
+        response = self.client.get(self._all_rows_page(self.client))
+        self.assertTrue(response.streaming)
+        body = b''.join(response.streaming_content).decode()
+        self.assertIn('Sistema de Reservas', body)
+        self.assertTrue(body.rstrip().endswith('</html>'))
+        positions = [body.index(row) for row in self._expected_rows()]
+        self.assertTrue(positions)
+        self.assertEqual(positions, sorted(positions))
+
+    async def test_stream_is_async_under_asgi(self):
+        url = await sync_to_async(self._all_rows_page)(self.async_client)
+        response = await self.async_client.get(url)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        for row in await sync_to_async(self._expected_rows)():
+            self.assertIn(row, body)
+        self.assertTrue(body.rstrip().endswith('</html>'))
+
+class ReportJobTests(TestCase):
+    """Cola de reportes: deduplicación por filtros, reclamo único y vencimiento de trabajos colgados."""
+
+    filters = {'estado': 'CONFIRMED'}
+
+    def test_dedup(self):
+        job, created = request_report_job('EXCEL', self.filters)
+        self.assertTrue(created)
+        self.assertEqual(request_report_job('EXCEL', dict(self.filters)), (job, False))
+        self.assertTrue(request_report_job('PDF', self.filters)[1])
+        # Un trabajo terminado se reutiliza mientras no supere REPORT_JOB_TTL
+        ReportJob.objects.filter(pk=job.pk).update(status='DONE', finished_at=timezone.now())
+        self.assertEqual(request_report_job('EXCEL', self.filters), (job, False))
+        ReportJob.objects.filter(pk=job.pk).update(finished_at=timezone.now() - timedelta(days=1))
+        self.assertTrue(request_report_job('EXCEL', self.filters)[1])
+
+    def test_claim(self):
+        job, _ = request_report_job('EXCEL', self.filters)
+        claimed = claim_next_report_job()
+        self.assertEqual((claimed.pk, claimed.status), (job.pk, 'RUNNING'))
+        self.assertIsNotNone(claimed.started_at)
+        self.assertIsNone(claim_next_report_job())
+
+    def test_stale_running_job_expires(self):
+        job, _ = request_report_job('EXCEL', self.filters)
+        claim_next_report_job()
+        self.assertEqual(request_report_job('EXCEL', self.filters), (job, False))
+        ReportJob.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(seconds=settings.REPORT_JOB_STALE_SECONDS + 1))
+        new, created = request_report_job('EXCEL', self.filters)
+        self.assertTrue(created)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'FAILED')
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(claim_next_report_job().pk, new.pk)
+
+    def test_expired_job_result_discarded(self):
+        job, _ = request_report_job('EXCEL', self.filters)
+        job = claim_next_report_job()
+        # El worker sigue trabajando pero otro proceso ya lo dio por colgado
+        ReportJob.objects.filter(pk=job.pk).update(
+            started_at=timezone.now() - timedelta(seconds=settings.REPORT_JOB_STALE_SECONDS + 1))
+        new, created = request_report_job('EXCEL', self.filters)
+        self.assertTrue(created)
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            run_report_job(job)
+            self.assertEqual(list(Path(media).rglob('*.xlsx')), [])
+        self.assertEqual((job.status, job.error), ('FAILED', 'El worker no terminó a tiempo.'))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.file.name), ('FAILED', ''))
+        # Un trabajo todavía en RUNNING sí guarda su resultado
+        with tempfile.TemporaryDirectory() as media, override_settings(MEDIA_ROOT=media):
+            new = run_report_job(claim_next_report_job())
+            self.assertEqual(ReportJob.objects.get(pk=new.pk).status, 'DONE')
+            self.assertTrue(Path(media, new.file.name).exists())
+
+    def test_race_with_finished_job(self):
+        # El trabajo activo termina entre el insert fallido y la relectura: se encola uno nuevo
+        active, _ = request_report_job('EXCEL', self.filters)
+        lookups = []
+
+        def lookup(key):
+            lookups.append(key)
+            if len(lookups) == 1:
+                return None
+            ReportJob.objects.filter(pk=active.pk).update(status='FAILED')
+            return reusable_report_job(key)
+
+        with mock.patch('reservas.reports.reusable_report_job', side_effect=lookup):
+            job, created = request_report_job('EXCEL', self.filters)
+        self.assertTrue(created)
+        self.assertNotEqual(job.pk, active.pk)
+        self.assertEqual(len(lookups), 2)
+
+class ChangeFeedTests(TestCase):
+    """Registro de cambios: deltas por versión, 304 sin novedades, filas propias y commits fuera de orden."""
+
+    def setUp(self):
+        self.admin = CustomUser.objects.create_user('vigia', role='ADMIN')
+        self.owner, self.other = (CustomUser.objects.create_user(name) for name in ('ana', 'beto'))
+        self.space = Space.objects.create(name='Sala C', capacity=8, type='SALA')
+        self.schedule = Schedule.objects.create(start_time=time(8), end_time=time(9))
+        self.day = date.today() + timedelta(days=5)
+
+    def reserve(self, user, days=0):
+        return Reservation.objects.create(user=user, space=self.space, schedule=self.schedule,
+                                          date=self.day + timedelta(days=days))
+
+    def poll(self, user, since, etag=None):
+        self.client.force_login(user)
+        headers = {'If-None-Match': f'"v{since}"' if etag is None else etag}
+        return self.client.get(reverse('reservation-changes'), {'since': since}, headers=headers)
+
+    def log(self, pk, reserva, seconds_ago=0):
+        change = ReservationChange.objects.create(id=pk, reservation_id=reserva.pk, action='UPDATE',
+                                                  space=self.space, user=reserva.user, date=reserva.date,
+                                                  status=reserva.status)
+        ReservationChange.objects.filter(pk=pk).update(created_at=timezone.now() - timedelta(seconds=seconds_ago))
+        return change
+
+    def test_delta_and_not_modified(self):
+        first = self.reserve(self.owner)
+        data = self.poll(self.admin, 0).json()
+        self.assertEqual([c['reservation'] for c in data['changes']], [first.pk])
+        self.assertFalse(data['more'])
+        response = self.poll(self.admin, data['version'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], f'"v{data["version"]}"')
+        # Sin la versión en If-None-Match no hay 304 vacío: la lista de cambios vacía
+        response = self.poll(self.admin, data['version'], etag='')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'version': data['version'], 'more': False, 'changes': []})
+        self.assertEqual(response['ETag'], f'"v{data["version"]}"')
+        self.assertEqual(self.poll(self.admin, data['version'], etag='"v0"').status_code, 200)
+        # Sin cambios nuevos basta una búsqueda por clave primaria
+        with self.assertNumQueries(1):
+            self.assertEqual(settled_change_version(data['version']), data['version'])
+        second = self.reserve(self.other, days=1)
+        delta = self.poll(self.admin, data['version']).json()
+        self.assertEqual([(c['reservation'], c['action']) for c in delta['changes']], [(second.pk, 'CREATE')])
+        self.assertEqual(delta['version'], ReservationChange.objects.latest('id').pk)
+
+    def test_non_admin_sees_own_rows(self):
+        mine = self.reserve(self.owner)
+        self.reserve(self.other, days=1)
+        data = self.poll(self.owner, 0).json()
+        self.assertEqual([c['reservation'] for c in data['changes']], [mine.pk])
+        self.assertNotIn('title', data['changes'][0])
+        # La versión cubre también las filas ajenas: el siguiente sondeo no las vuelve a recorrer
+        self.assertEqual(data['version'], ReservationChange.objects.latest('id').pk)
+        self.assertEqual(self.poll(self.owner, data['version']).status_code, 304)
+        self.reserve(self.other, days=2)
+        self.assertEqual(self.poll(self.owner, data['version']).json()['changes'], [])
+
+    def test_out_of_order_commit_is_not_skipped(self):
+        reserva = self.reserve(self.owner)
+        since = ReservationChange.objects.latest('id').pk
+        # El id since+2 se confirmó antes que since+1: el cursor espera en el hueco
+        self.log(since + 2, reserva)
+        self.assertEqual(settled_change_version(since), since)
+        self.assertEqual(self.poll(self.admin, since).status_code, 304)
+        self.log(since + 1, reserva)
+        data = self.poll(self.admin, since).json()
+        self.assertEqual([c['version'] for c in data['changes']], [since + 1, since + 2])
+        # Un hueco que no se llena (transacción revertida) se salta pasada la ventana
+        self.log(since + 4, reserva, seconds_ago=settings.CHANGES_SETTLE_SECONDS + 1)
+        self.assertEqual(settled_change_version(since + 2), since + 4)
+
+class ExportRowsTests(TestCase):
+    """Exportación de filas crudas en CSV/NDJSON, con gzip opcional y los filtros del reporte, y el libro Excel."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user('exportador', role='ADMIN')
+        user = CustomUser.objects.create_user('socio', 'socio@ejemplo.com')
+        cls.space = Space.objects.create(name='Sala Ñ', capacity=10, type='SALA')
+        other = Space.objects.create(name='Aula B', capacity=20, type='AULA')
+        schedule = Schedule.objects.create(start_time=time(8), end_time=time(9))
+        day = date(2025, 3, 3)
+        cls.reservas = Reservation.objects.bulk_create([
+            Reservation(user=user, space=cls.space, schedule=schedule, date=day, status='CONFIRMED'),
+            Reservation(user=user, space=cls.space, schedule=schedule, date=day + timedelta(days=1)),
+            Reservation(user=user, space=other, schedule=schedule, date=day, status='REJECTED'),
+        ])
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def export(self, **params):
+        response = self.client.get(reverse('export-rows'), params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_header_and_rows(self):
+        rows = list(csv.reader(io.StringIO(self.export().decode('utf-8'))))
+        self.assertEqual(tuple(rows[0]), ROW_EXPORT_COLUMNS)
+        self.assertEqual([int(row[0]) for row in rows[1:]], [r.pk for r in self.reservas])
+        self.assertEqual(rows[1][1:7], ['socio', 'Sala Ñ', '2025-03-03', '08:00:00', '09:00:00', 'CONFIRMED'])
+
+    def test_ndjson(self):
+        lines = self.export(formato='ndjson').decode('utf-8').splitlines()
+        records = [json.loads(line) for line in lines]
+        self.assertEqual([r['id'] for r in records], [r.pk for r in self.reservas])
+        self.assertEqual(set(records[2]), set(ROW_EXPORT_COLUMNS))
+        self.assertEqual((records[2]['space'], records[2]['status']), ('Aula B', 'REJECTED'))
+
+    def test_gzip(self):
+        response = self.client.get(reverse('export-rows'), {'formato': 'ndjson', 'gzip': '1'})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('reservas.ndjson.gz', response['Content-Disposition'])
+        plain = self.export(formato='ndjson')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)), plain)
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get(reverse('export-rows'), {'formato': 'xml'}).status_code, 400)
+
+    def test_filters(self):
+        lines = self.export(formato='ndjson', espacio=self.space.pk, estado='PENDING').splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], [self.reservas[1].pk])
+
+    def test_login_required(self):
+        self.client.logout()
+        response = self.client.get(reverse('export-rows'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(settings.LOGIN_URL, response['Location'])
+
+    def test_excel_content(self):
+        from openpyxl import load_workbook
+        response = self.client.get(reverse('export-excel'), {'espacio': self.space.pk})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('reservas.xlsx', response['Content-Disposition'])
+        sheet = load_workbook(io.BytesIO(b''.join(response.streaming_content)), read_only=True)['reservas']
+        header, *rows = sheet.iter_rows(values_only=True)
+        self.assertEqual(header, EXCEL_COLUMNS)
+        by_id = {row[0]: row for row in rows}
+        self.assertEqual(set(by_id), {self.reservas[0].pk, self.reservas[1].pk})
+        pk, username, space, day, schedule, status, created_at = by_id[self.reservas[0].pk]
+        self.assertEqual((username, space, day.date(), schedule, status),
+                         ('socio', 'Sala Ñ', date(2025, 3, 3), '08:00 - 09:00', 'CONFIRMED'))
+        self.assertIsNotNone(created_at)
+
+    async def test_asgi_streams_async_iterator(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(reverse('export-rows'), {'formato': 'ndjson'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content])
+        self.assertEqual(await sync_to_async(self.export)(formato='ndjson'), content)
+
+class ChunkedPdfTests(SimpleTestCase):
+    """PDF por partes: páginas y filas del documento unido, y corte al fallar una parte."""
+
+    def rows(self, n):
+        return [(i, f'usuario{i:02d}', 'Sala G', date(2025, 3, 3), '08:00 - 09:00', 'CONFIRMED', None)
+                for i in range(n)]
+
+    def test_multi_chunk_pdf(self):
+        from pypdf import PdfReader
+        rows = self.rows(25)
+        with tempfile.TemporaryDirectory() as tmpdir, ThreadPoolExecutor(max_workers=2) as executor:
+            # Cada parte por separado da las páginas esperadas del documento unido
+            expected = 0
+            for i, start in enumerate(range(0, len(rows), 10)):
+                path = os.path.join(tmpdir, f'{i}.pdf')
+                self.assertTrue(render_pdf_part(render_reservations_html(rows[start:start + 10], first=not i), path))
+                expected += len(PdfReader(path).pages)
+            with tempfile.TemporaryFile() as tmp:
+                self.assertTrue(write_chunked_pdf(rows, tmp, chunk_rows=10, executor=executor, workers=2))
+                tmp.seek(0)
+                reader = PdfReader(tmp)
+                self.assertEqual(len(reader.pages), expected)
+                text = ''.join(page.extract_text() for page in reader.pages)
+        self.assertEqual(text.count('Reporte de Reservas'), 1)
+        positions = [text.index(f'usuario{i:02d}') for i in range(25)]
+        self.assertEqual(positions, sorted(positions))
+
+    def test_failed_part_stops_rendering(self):
+        calls = []
+
+        def render(html, path):
+            calls.append(path)
+            return len(calls) > 1 and render_pdf_part(html, path)
+
+        with mock.patch('reservas.exports.render_pdf_part', side_effect=render), \
+                ThreadPoolExecutor(max_workers=1) as executor, tempfile.TemporaryFile() as tmp:
+            self.assertFalse(write_chunked_pdf(self.rows(50), tmp, chunk_rows=5, executor=executor, workers=1))
+            self.assertEqual(tmp.tell(), 0)
+        # Con 2 partes en vuelo como máximo, el fallo de la primera corta las 8 restantes
+        self.assertLessEqual(len(calls), 2)
+
+@override_settings(PERF_SAMPLE_RATE=1)
+class PerformanceMiddlewareTests(TestCase):
+    """Muestras del middleware: bytes y consultas también en respuestas en streaming."""
+
+    def setUp(self):
+        buffer.clear()
+        self.admin = CustomUser.objects.create_superuser('root', 'root@ejemplo.com', 'clave')
+        seed_reservations(spaces=3, schedules=2, users=2, days=30)
+        self.url = reverse('filtrar-reservas') + '?todas=1'
+
+    def last_sample(self, view):
+        return buffer.snapshot()[view][-1]
+
+    def test_urls_not_imported_with_middleware(self):
+        script = ("import sys, django; django.setup(); import reservas.middleware; "
+                  "print('reservas.urls' in sys.modules)")
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'reservas_project.settings'}
+        result = subprocess.run([sys.executable, '-c', script], cwd=settings.BASE_DIR, env=env,
+                                capture_output=True, text=True, timeout=120)
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        self.assertEqual(result.stdout.strip().splitlines()[-1], 'False')
+
+    def test_streaming_bytes_counted_when_sent(self):
+        self.client.force_login(self.admin)
+        response = self.client.get(reverse('space-list'))
+        self.assertEqual(self.last_sample('space-list')['bytes'], len(response.content))
+        response = self.client.get(self.url)
+        # Hasta que se termina de enviar el cuerpo no hay muestra
+        self.assertNotIn('filtrar-reservas', buffer.snapshot())
+        body = b''.join(response.streaming_content)
+        self.assertEqual(self.last_sample('filtrar-reservas')['bytes'], len(body))
+        self.assertGreater(len(body), 1000)
+
+    async def test_async_streaming_bytes_counted(self):
+        await self.async_client.aforce_login(self.admin)
+        response = await self.async_client.get(self.url)
+        self.assertTrue(response.is_async)
+        body = b''.join([chunk async for chunk in response.streaming_content])
+        sample = await sync_to_async(self.last_sample)('filtrar-reservas')
+        self.assertEqual(sample['bytes'], len(body))
+        # Sesión, usuario y la consulta de las filas, que corre mientras se envía el cuerpo
+        self.assertEqual(sample['queries'], 3)
+
+    def test_streamed_export_queries_recorded(self):
+        self.client.force_login(self.admin)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('export-rows'), {'formato': 'ndjson'})
+            body = b''.join(response.streaming_content)
+        sample = self.last_sample('export-rows')
+        self.assertEqual(sample['queries'], len(queries))
+        self.assertGreater(sample['queries'], 2)
+        self.assertGreater(sample['db_ms'], 0)
+        self.assertEqual(sample['bytes'], len(body))
+
+    def test_published_snapshots_expire(self):
+        from .instrumentation import REGISTRY_KEY, SNAPSHOT_KEY, published_snapshot, publish
+        cache.clear()
+        dead = os.getpid() + 1
+        # Un worker reciclado: sigue en el registro pero su copia ya venció
+        cache.set(REGISTRY_KEY, [dead])
+        buffer.add('space-list', {'bytes': 1})
+        with override_settings(PERF_PUBLISH_SECONDS=10), mock.patch.object(cache, 'set', wraps=cache.set) as spy:
+            publish(force=True)
+        self.assertEqual({call.args[2] for call in spy.call_args_list}, {60})
+        self.assertEqual(cache.get(REGISTRY_KEY), [os.getpid()])
+        self.assertEqual(published_snapshot(), {'space-list': [{'bytes': 1}]})
+        cache.delete(SNAPSHOT_KEY.format(os.getpid()))
+        self.assertEqual(published_snapshot(), {})
+
+    def test_other_apps_with_same_name_not_recorded(self):
+        self.client.get(reverse('admin:login'))
+        self.client.get(reverse('login'))
+        self.assertEqual(set(buffer.snapshot()), {'login'})
+
+# Presupuesto de consultas por ruta y rol (admin, usuario normal), medido con el caché vacío.
+# Incluye las 2 consultas de sesión y usuario de cada petición autenticada.
+QUERY_BUDGETS = {
+    'dashboard': (12, 12),
+    'space-list': (4, 4),
+    'space-create': (2, 2),
+    'space-detail': (3, 3),
+    'space-update': (3, 2),
+    'space-delete': (3, 2),
+    'schedule-list': (4, 4),
+    'schedule-create': (2, 2),
+    'schedule-update': (3, 2),
+    'schedule-delete': (3, 2),
+    'reservation-list': (3, 3),
+    'reservation-create': (4, 4),
+    'reservation-detail': (3, 3),
+    'reservation-update': (5, 6),
+    'series-list': (3, 3),
+    'series-create': (4, 4),
+    'availability': (6, 6),
+    'reservation-delete': (3, 4),
+    'register': (2, 2),
+    'login': (2, 2),
+    'logout': (0, 0),
+    'export-excel': (3, 2),
+    'export-pdf': (3, 2),
+    'export-rows': (3, 2),
+    'filtrar-reservas': (5, 2),
+    'report-job-create': (2, 2),
+    'report-job-detail': (3, 2),
+    'report-job-status': (3, 2),
+    'report-job-download': (3, 2),
+    'accion-reserva': (3, 3),
+    'reservation-moderate': (2, 2),
+    'recordar-reserva': (3, 3),
+    'recordar-automatico': (5, 2),
+    'cache-stats': (2, 2),
+    'perf-stats': (2, 2),
+    'calendar': (3, 3),
+    'calendar-events': (6, 6),
+    'reservation-changes': (3, 3),
+    'slot-occupancy': (6, 6),
+}
+BASELINE_PATH = Path(os.environ.get('PERF_BASELINE', settings.BASE_DIR / 'perf_baseline.json'))
+LATENCY_THRESHOLD = float(os.environ.get('PERF_THRESHOLD', '1.5'))
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend', PERF_SAMPLE_RATE=0)
+class QueryBudgetTests(TestCase):
+    """Recorre todas las rutas con nombre de reservas/urls.py como admin y como usuario normal.
+
+    El número de consultas de cada ruta no debe superar su presupuesto ni crecer al
+    duplicar los datos. Con PERF_UPDATE_BASELINE=1 se guardan los tiempos en
+    PERF_BASELINE (perf_baseline.json por defecto); si ese archivo existe, una
+    ejecución posterior falla cuando una ruta supera PERF_THRESHOLD veces su tiempo.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.media = tempfile.TemporaryDirectory()
+        start = date.today() - timedelta(days=15)
+        cls.spaces, cls.schedules, cls.users = seed_reservations(spaces=200, users=200, days=30, start=start)
+        call_command('rebuild_rollups', stdout=open(os.devnull, 'w'))
+        cls.admin = CustomUser.objects.create_user('admin', 'admin@ejemplo.com', role='ADMIN')
+        cls.user = cls.users[0]
+        cls.reservation = Reservation.objects.filter(user=cls.user).order_by('date').last()
+        with override_settings(MEDIA_ROOT=cls.media.name):
+            cls.job = ReportJob.objects.create(key='prueba', format='EXCEL', status='DONE')
+            cls.job.file.save('prueba.xlsx', ContentFile(b'xlsx'))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media.cleanup()
+
+    def route_requests(self):
+        today = date.today()
+        window = {'start': today.isoformat(), 'end': (today + timedelta(days=35)).isoformat()}
+        one_day = {'fecha_inicio': today.isoformat(), 'fecha_fin': today.isoformat(), 'espacio': self.spaces[0].pk}
+        return {
+            'dashboard': ((), {}),
+            'space-list': ((), {}),
+            'space-create': ((), {}),
+            'space-detail': ((self.spaces[0].pk,), {}),
+            'space-update': ((self.spaces[0].pk,), {}),
+            'space-delete': ((self.spaces[0].pk,), {}),
+            'schedule-list': ((), {}),
+            'schedule-create': ((), {}),
+            'schedule-update': ((self.schedules[0].pk,), {}),
+            'schedule-delete': ((self.schedules[0].pk,), {}),
+            'reservation-list': ((), {}),
+            'reservation-create': ((), {}),
+            'reservation-detail': ((self.reservation.pk,), {}),
+            'reservation-update': ((self.reservation.pk,), {}),
+            'series-list': ((), {}),
+            'series-create': ((), {}),
+            'availability': ((), {'fecha_inicio': today.isoformat(), 'fecha_fin': (today + timedelta(days=30)).isoformat()}),
+            'reservation-delete': ((self.reservation.pk,), {}),
+            'register': ((), {}),
+            'login': ((), {}),
+            'logout': ((), {}),
+            'export-excel': ((), one_day),
+            'export-pdf': ((), one_day),
+            'export-rows': ((), {**one_day, 'formato': 'ndjson', 'gzip': '1'}),
+            'filtrar-reservas': ((), {}),
+            'report-job-create': ((), {}),
+            'report-job-detail': ((self.job.pk,), {}),
+            'report-job-status': ((self.job.pk,), {}),
+            'report-job-download': ((self.job.pk,), {}),
+            'accion-reserva': ((self.reservation.pk,), {}),
+            'reservation-moderate': ((), {}),
+            'recordar-reserva': ((self.reservation.pk,), {}),
+            'recordar-automatico': ((), {}),
+            'cache-stats': ((), {}),
+            'perf-stats': ((), {}),
+            'calendar': ((), {}),
+            'calendar-events': ((), window),
+            'reservation-changes': ((), {'since': 0}),
+            'slot-occupancy': ((), {'space': self.spaces[0].pk, 'date': today.isoformat()}),
+        }
+
+    def measure(self, user):
+        # recordar-automatico marca los recordatorios enviados; cada medición parte del mismo estado
+        Reservation.objects.update(reminder_sent_at=None)
+        client = Client()
+        client.force_login(user)
+        counts, timings = {}, {}
+        with override_settings(MEDIA_ROOT=self.media.name):
+            for name, (args, params) in self.route_requests().items():
+                cache.clear()
+                slots.clear()
+                with CaptureQueriesContext(connection) as queries:
+                    start = _time.perf_counter()
+                    response = client.get(reverse(name, args=args), params)
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    timings[name] = (_time.perf_counter() - start) * 1000
+                self.assertLess(response.status_code, 500, name)
+                counts[name] = len(queries)
+        return counts, timings
+
+    def test_every_route_has_a_budget(self):
+        names = {p.name for p in urlpatterns if p.name}
+        self.assertEqual(names, set(self.route_requests()))
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def check_budgets(self, role, index):
+        user = self.admin if role == 'admin' else self.user
+        before, timings = self.measure(user)
+        seed_reservations(spaces=50, users=50, days=30, start=date.today() - timedelta(days=15), prefix='x')
+        call_command('rebuild_rollups', stdout=open(os.devnull, 'w'))
+        after, _ = self.measure(user)
+        for name, count in before.items():
+            with self.subTest(route=name, role=role):
+                self.assertLessEqual(count, QUERY_BUDGETS[name][index])
+                self.assertEqual(after[name], count, 'el número de consultas crece con los datos')
+        return timings
+
+    def test_admin_budgets(self):
+        self.record_latency('admin', self.check_budgets('admin', 0))
+
+    def test_user_budgets(self):
+        self.record_latency('user', self.check_budgets('user', 1))
+
+    def record_latency(self, role, timings):
+        if os.environ.get('PERF_UPDATE_BASELINE') == '1':
+            baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+            baseline[role] = {name: round(ms, 2) for name, ms in timings.items()}
+            BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+            return
+        if not BASELINE_PATH.exists():
+            return
+        baseline = json.loads(BASELINE_PATH.read_text()).get(role, {})
+        # Margen absoluto de 20 ms para no marcar ruido en rutas muy rápidas
+        regressions = {
+            name: (baseline[name], round(ms, 2)) for name, ms in timings.items()
+            if name in baseline and ms > baseline[name] * LATENCY_THRESHOLD + 20
+        }
+        self.assertFalse(regressions, f'Regresiones de latencia (base, actual) ms: {regressions}')
+
+
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', '1200'))
+STARTUP_BUDGET_RSS_MB = float(os.environ.get('STARTUP_BUDGET_RSS_MB', '90'))
+# Dependencias que solo usan las exportaciones y los comandos de benchmark
+HEAVY_MODULES = ('pandas', 'numpy', 'xhtml2pdf', 'reportlab', 'openpyxl', 'pypdf')
+BOOT_SCRIPT = '''
+import json, os, resource, sys, time
+start = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'reservas_project.settings')
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from importlib import import_module
+get_wsgi_application()
+import_module(settings.ROOT_URLCONF)
+import reservas.management.commands.enviar_recordatorios
+elapsed = (time.perf_counter() - start) * 1000
+try:
+    # ru_maxrss se hereda del proceso padre en Linux: se lee la RSS propia del proceso
+    with open('/proc/self/status') as fh:
+        rss_kb = next(int(line.split()[1]) for line in fh if line.startswith('VmRSS:'))
+except OSError:
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({
+    'ms': elapsed,
+    'rss_mb': rss_kb / 1024,
+    'heavy': [m for m in %r if m in sys.modules],
+}))
+''' % (HEAVY_MODULES,)
+
+
+class StartupBudgetTests(SimpleTestCase):
+    """Arranque de un worker: aplicación WSGI, URLconf con todas las vistas y un comando de gestión.
+
+    Corre en un proceso nuevo con `python -X importtime`; el tiempo y la memoria máxima
+    (RSS) no deben superar STARTUP_BUDGET_MS y STARTUP_BUDGET_RSS_MB, y las dependencias
+    pesadas de las exportaciones no deben cargarse.
+    """
+
+    def boot(self):
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=120,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr[-2000:])
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        return stats, self.slowest_imports(result.stderr)
+
+    def slowest_imports(self, stderr, n=10):
+        # Formato de -X importtime: "import time: self [us] | cumulative | paquete"
+        rows = []
+        for line in stderr.splitlines():
+            parts = line.split('|')
+            if line.startswith('import time:') and len(parts) == 3 and parts[1].strip().isdigit():
+                rows.append((int(parts[1]) / 1000, parts[2].strip()))
+        top_level = [(ms, name) for ms, name in rows if not name.startswith(' ')]
+        return sorted(top_level, reverse=True)[:n]
+
+    def test_worker_boot_budget(self):
+        # La primera ejecución calienta los .pyc; se mide la segunda
+        self.boot()
+        stats, slowest = self.boot()
+        self.assertEqual(stats['heavy'], [], 'dependencias pesadas importadas al arrancar')
+        self.assertLessEqual(stats['ms'], STARTUP_BUDGET_MS, f'arranque lento; importaciones más costosas (ms): {slowest}')
+        self.assertLessEqual(stats['rss_mb'], STARTUP_BUDGET_RSS_MB, f'memoria al arrancar; importaciones más costosas (ms): {slowest}')
+
+
+class DatabaseConfigTests(SimpleTestCase):
+    """Conexiones persistentes por defecto; el pool de psycopg solo con DB_POOL en PostgreSQL."""
+
+    def test_persistent_connections_by_default(self):
+        config = database_config('postgres://u:p@db:5432/reservas', {})
+        self.assertEqual(config['CONN_MAX_AGE'], 60)
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+        self.assertNotIn('pool', config.get('OPTIONS', {}))
+
+    def test_pool_disables_persistent_connections(self):
+        config = database_config('postgres://u:p@db:5432/reservas', {
+            'DB_POOL': 'True', 'DB_POOL_MIN_SIZE': '1', 'DB_POOL_MAX_SIZE': '4'})
+        # Django rechaza pool con CONN_MAX_AGE distinto de 0
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+        self.assertEqual(config['OPTIONS']['pool']['min_size'], 1)
+        self.assertEqual(config['OPTIONS']['pool']['max_size'], 4)
+
+    def test_pool_ignored_outside_postgresql(self):
+        config = database_config('sqlite:///reservas.sqlite3', {'DB_POOL': 'True'})
+        self.assertNotIn('pool', config.get('OPTIONS', {}))
+
+    @skipUnless(connection.vendor == 'sqlite', 'Ajustes propios de SQLite')
+    def test_sqlite_test_overrides_live_in_test_settings(self):
+        self.assertEqual(settings.SETTINGS_MODULE, 'reservas_project.settings_test')
+        self.assertEqual(connection.settings_dict['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(connection.settings_dict['TEST']['NAME'], settings.BASE_DIR / 'test_db.sqlite3')
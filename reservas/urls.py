@@ -19,6 +19,11 @@ urlpatterns = [
     path('reservations/create/', views.ReservationCreateView.as_view(), name='reservation-create'),
     path('reservations/<int:pk>/', views.ReservationDetailView.as_view(), name='reservation-detail'),
     path('reservations/<int:pk>/update/', views.ReservationUpdateView.as_view(), name='reservation-update'),
+    path('reservations/series/', views.ReservationSeriesListView.as_view(), name='series-list'),
+    path('reservations/series/create/', views.ReservationSeriesCreateView.as_view(), name='series-create'),
+    path('reservations/availability/', views.disponibilidad, name='availability'),
+    path('reservations/changes/', views.reservation_changes, name='reservation-changes'),
+    path('reservations/ocupacion/', views.slot_occupancy, name='slot-occupancy'),
     path('reservations/<int:pk>/delete/', views.ReservationDeleteView.as_view(), name='reservation-delete'),
     # Auth
     path('register/', views.RegisterView.as_view(), name='register'),
@@ -27,11 +32,20 @@ urlpatterns = [
     # Reportes y filtros
     path('reports/export_excel/', views.export_reservations_excel, name='export-excel'),
     path('reports/export_pdf/', views.export_reservations_pdf, name='export-pdf'),
+    path('reports/export_rows/', views.export_reservations_rows, name='export-rows'),
     path('reports/filtrar/', views.filtrar_reservas, name='filtrar-reservas'),
+    path('reports/jobs/create/', views.crear_reporte, name='report-job-create'),
+    path('reports/jobs/<int:pk>/', views.reporte_detalle, name='report-job-detail'),
+    path('reports/jobs/<int:pk>/status/', views.reporte_estado, name='report-job-status'),
+    path('reports/jobs/<int:pk>/download/', views.reporte_descargar, name='report-job-download'),
     path('reservations/<int:pk>/accion/', views.accion_reserva, name='accion-reserva'),
+    path('reservations/moderar/', views.moderar_reservas, name='reservation-moderate'),
     path('reservations/<int:pk>/recordar/', views.enviar_recordatorio_reserva, name='recordar-reserva'),
     path('reservations/recordar_automatico/', views.enviar_recordatorios_automaticos, name='recordar-automatico'),
+    path('cache/stats/', views.cache_estadisticas, name='cache-stats'),
+    path('perf/', views.perf_estadisticas, name='perf-stats'),
     path('calendario/', views.calendar_view, name='calendar'),
+    path('calendario/eventos/', views.calendar_events, name='calendar-events'),
 
 
 
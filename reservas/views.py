@@ -1,61 +1,68 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.shortcuts import aget_object_or_404, render, redirect, get_object_or_404
 from django.views import generic
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib.auth.views import LoginView, LogoutView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (FileResponse, Http404, HttpResponse, JsonResponse,
+                         StreamingHttpResponse)
 from django.template.loader import render_to_string
-from django.core.mail import send_mail
-from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.html import format_html
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.utils import timezone
-from django.utils.safestring import mark_safe
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.contrib import messages
-from django.db.models import Count
-from django.db.models.functions import ExtractWeek
-from django.db import models
-from datetime import timedelta
-import io
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from datetime import date, timedelta
+import hashlib
 import json
-import pandas as pd
-from xhtml2pdf import pisa
-from .models import Space, Schedule, Reservation, CustomUser
-from .forms import CustomUserCreationForm, ReservationForm, ScheduleForm, SpaceForm
-def enviar_recordatorio_reserva(request, pk):
-    reserva = get_object_or_404(Reservation, pk=pk)
-    if not request.user.is_admin():
+import os
+from .models import Space, Schedule, Reservation, CustomUser, ReportJob, ReservationChange, ReservationSeries
+from .forms import CustomUserCreationForm, ReservationForm, ReservationSeriesForm, ScheduleForm, SpaceForm
+from .availability import aoccupancy_grid
+from .caching import cache_stats, cached, model_versions
+from .changes import settled_change_version
+from .booking import book_reservation, book_series, book_weekly
+from .exports import (EXCEL_CONTENT_TYPE, PDF_CONTENT_TYPE, ROW_EXPORT_FORMATS, aiter_sync, async_file_response,
+                      build_excel_file, build_pdf_file, rows_response)
+from .instrumentation import buffer as perf_buffer, summarize
+from .moderation import MODERATION_ACTIONS, moderate_reservations
+from .occupancy import slots
+from .pagination import KeysetPaginator
+from .reminders import ReminderSendError, build_reminder, pending_reminders, send_reminders
+from .reports import REPORT_EXTENSIONS, filter_reservations, report_filters, request_report_job
+@login_required
+async def enviar_recordatorio_reserva(request, pk):
+    reserva = await aget_object_or_404(Reservation.objects.select_related('user', 'space'), pk=pk)
+    user = await request.auser()
+    if not user.is_admin():
         return HttpResponse("No tienes permiso", status=403)
     if reserva.user.email:
-        send_mail(
-            subject='Recordatorio de reserva',
-            message=f'Recuerda tu reserva para el espacio {reserva.space.name} el {reserva.date} en horario {reserva.schedule}.',
-            from_email=None,  # usa DEFAULT_FROM_EMAIL
-            recipient_list=[reserva.user.email],
-        )
+        # El envío SMTP corre en un hilo aparte; el event loop sigue atendiendo peticiones
+        await sync_to_async(build_reminder(reserva).send, thread_sensitive=False)()
         messages.success(request, "¡Recordatorio enviado!")
     else:
         messages.warning(request, "El usuario no tiene correo registrado.")
     return redirect('reservation-list')
 
 
-def enviar_recordatorios_automaticos(request):
-    if not request.user.is_admin():
+@login_required
+async def enviar_recordatorios_automaticos(request):
+    user = await request.auser()
+    if not user.is_admin():
         return HttpResponse("No tienes permiso", status=403)
-    manana = timezone.now().date() + timedelta(days=1)
-    reservas = Reservation.objects.filter(date=manana, status='CONFIRMED')
-    enviados = 0
-    for reserva in reservas:
-        if reserva.user.email:
-            send_mail(
-                subject='Recordatorio de reserva',
-                message=f'Recuerda tu reserva para el espacio {reserva.space.name} el {reserva.date} en horario {reserva.schedule}.',
-                from_email=None,
-                recipient_list=[reserva.user.email],
-            )
-            enviados += 1
-    messages.success(request, f"Se enviaron {enviados} recordatorios para reservas del día siguiente.")
+    try:
+        enviados = await sync_to_async(send_reminders)(pending_reminders())
+    except ReminderSendError as exc:
+        messages.warning(request, f"Se enviaron {exc.sent} recordatorios; algunos fallaron y se reintentarán "
+                                  f"en el próximo envío ({exc.error}).")
+    else:
+        messages.success(request, f"Se enviaron {enviados} recordatorios para reservas del día siguiente.")
     return redirect('reservation-list')
 
 
@@ -74,8 +81,34 @@ class AdminRequiredMixin(UserPassesTestMixin):
     def test_func(self):
         return self.request.user.is_authenticated and self.request.user.is_admin()
 
+class CachedListMixin:
+    """Cada página (total, número y filas) cacheada por versión del modelo, no la tabla entera."""
+    def paginate_queryset(self, queryset, page_size):
+        name = self.model._meta.model_name
+        requested = self.kwargs.get(self.page_kwarg) or self.request.GET.get(self.page_kwarg) or 1
+
+        def build():
+            _paginator, page, rows, _paginated = super(CachedListMixin, self).paginate_queryset(queryset, page_size)
+            return page.paginator.count, page.number, list(rows)
+
+        count, number, rows = cached(f'{name}_page', (name,), build, requested)
+        paginator = self.get_paginator(queryset, page_size, orphans=self.get_paginate_orphans(),
+                                       allow_empty_first_page=self.get_allow_empty())
+        # count es un cached_property: con el total guardado, page() no vuelve a contar
+        paginator.count = count
+        page = paginator.page(number)
+        page.object_list = rows
+        return paginator, page, rows, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        ctx = super().get_context_data(**kwargs)
+        # Para {% cache %} de la tabla renderizada
+        ctx['cache_version'] = model_versions(self.model._meta.model_name)[0]
+        ctx['cache_timeout'] = settings.CACHES['default'].get('TIMEOUT', 300)
+        return ctx
+
 # Spaces
-class SpaceListView(LoginRequiredMixin, generic.ListView):
+class SpaceListView(LoginRequiredMixin, CachedListMixin, generic.ListView):
     model = Space
     template_name = 'spaces/space_list.html'
     paginate_by = 10
@@ -102,7 +135,7 @@ class SpaceDeleteView(LoginRequiredMixin, AdminRequiredMixin, generic.DeleteView
     success_url = reverse_lazy('space-list')
 
 # Schedules
-class ScheduleListView(LoginRequiredMixin, generic.ListView):
+class ScheduleListView(LoginRequiredMixin, CachedListMixin, generic.ListView):
     model = Schedule
     template_name = 'schedules/schedule_list.html'
     paginate_by = 10
@@ -128,7 +161,7 @@ class ScheduleDeleteView(LoginRequiredMixin, AdminRequiredMixin, generic.DeleteV
 class ReservationListView(LoginRequiredMixin, generic.ListView):
     model = Reservation
     template_name = 'reservations/reservation_list.html'
-    paginate_by = 12
+    per_page = 12
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -136,8 +169,16 @@ class ReservationListView(LoginRequiredMixin, generic.ListView):
             qs = qs.filter(user=self.request.user)
         return qs.select_related('space', 'schedule', 'user')
 
+    def get_context_data(self, **kwargs):
+        # Paginación por cursor: sin COUNT(*) ni OFFSET, latencia constante en páginas profundas
+        page = KeysetPaginator(self.object_list, self.per_page, with_total=True).page(self.request.GET.get('cursor'))
+        ctx = super().get_context_data(object_list=page.object_list, **kwargs)
+        ctx['page'] = page
+        return ctx
+
 class ReservationDetailView(LoginRequiredMixin, generic.DetailView):
     model = Reservation
+    queryset = Reservation.objects.select_related('space', 'schedule', 'user')
     template_name = 'reservations/reservation_detail.html'
 
 class ReservationCreateView(LoginRequiredMixin, generic.CreateView):
@@ -146,10 +187,60 @@ class ReservationCreateView(LoginRequiredMixin, generic.CreateView):
     template_name = 'reservations/reservation_form.html'
     success_url = reverse_lazy('reservation-list')
 
+    def get_initial(self):
+        # ?space=<id>&date=<aaaa-mm-dd> preselecciona y deja solo los horarios libres
+        initial = super().get_initial()
+        for name in ('space', 'date'):
+            if self.request.GET.get(name):
+                initial[name] = self.request.GET[name]
+        return initial
+
+    def form_valid(self, form):
+        form.instance.user = self.request.user
+        weeks = form.cleaned_data.get('weeks') or 1
+        try:
+            if weeks > 1:
+                book_weekly(form.instance, weeks)
+            else:
+                book_reservation(form.instance)
+        except ValidationError as e:
+            form.add_error(None, e)
+            return self.form_invalid(form)
+        self.object = form.instance
+        if weeks > 1:
+            messages.success(self.request, f"Se crearon {weeks} solicitudes de reserva, pendientes de confirmación.")
+        else:
+            messages.success(self.request, "Solicitud de reserva creada, pendiente de confirmación.")
+        return redirect(self.get_success_url())
+
+# Series recurrentes: una fila por serie, las ocurrencias se generan al vuelo
+class ReservationSeriesListView(LoginRequiredMixin, generic.ListView):
+    model = ReservationSeries
+    template_name = 'reservations/series_list.html'
+    paginate_by = 20
+
+    def get_queryset(self):
+        qs = super().get_queryset().select_related('space', 'schedule', 'user')
+        if not self.request.user.is_admin():
+            qs = qs.filter(user=self.request.user)
+        return qs
+
+class ReservationSeriesCreateView(LoginRequiredMixin, generic.CreateView):
+    model = ReservationSeries
+    form_class = ReservationSeriesForm
+    template_name = 'reservations/series_form.html'
+    success_url = reverse_lazy('series-list')
+
     def form_valid(self, form):
         form.instance.user = self.request.user
-        messages.success(self.request, "Solicitud de reserva creada, pendiente de confirmación.")
-        return super().form_valid(form)
+        try:
+            book_series(form.instance)
+        except ValidationError as e:
+            form.add_error(None, e)
+            return self.form_invalid(form)
+        self.object = form.instance
+        messages.success(self.request, "Serie de reservas creada, pendiente de confirmación.")
+        return redirect(self.get_success_url())
 
 class ReservationUpdateView(LoginRequiredMixin, generic.UpdateView):
     model = Reservation
@@ -164,6 +255,15 @@ class ReservationUpdateView(LoginRequiredMixin, generic.UpdateView):
             return redirect('reservation-list')
         return obj
 
+    def form_valid(self, form):
+        try:
+            book_reservation(form.instance)
+        except ValidationError as e:
+            form.add_error(None, e)
+            return self.form_invalid(form)
+        self.object = form.instance
+        return redirect(self.get_success_url())
+
 class ReservationDeleteView(LoginRequiredMixin, generic.DeleteView):
     model = Reservation
     template_name = 'confirm_delete.html'
@@ -176,97 +276,155 @@ class ReservationDeleteView(LoginRequiredMixin, generic.DeleteView):
             return redirect('reservation-list')
         return obj
 
-# Dashboard
-class DashboardView(LoginRequiredMixin, generic.TemplateView):
-    template_name = 'dashboard.html'
-    def get_context_data(self, **kwargs):
-        ctx = super().get_context_data(**kwargs)
-        ctx['total_spaces'] = Space.objects.count()
-        ctx['total_reservations'] = Reservation.objects.count()
-        ctx['recent_reservations'] = Reservation.objects.select_related('space','user').order_by('-created_at')[:8]
-        qs = Reservation.objects.all()
-        by_month = (qs
-                    .annotate(month=models.functions.TruncMonth('date'))
-                    .values('month')
-                    .annotate(count=Count('id'))
-                    .order_by('month') )
-        months = [x['month'].strftime('%Y-%m') for x in by_month if x['month']]
-        counts = [x['count'] for x in by_month]
-        ctx['chart_months'] = json.dumps(months)
-        ctx['chart_month_counts'] = json.dumps(counts)
-        top_spaces = (Space.objects
-                      .annotate(res_count=Count('reservations'))
-                      .order_by('-res_count')[:5])
-        ctx['top_labels'] = json.dumps([s.name for s in top_spaces])
-        ctx['top_values'] = json.dumps([s.res_count for s in top_spaces])
-        return ctx
-
 # Utils para filtro de reportes
 from django.utils.http import urlencode
 
+FILTRAR_PAGE_SIZE = 50
+STREAM_CHUNK_ROWS = 500
+STREAM_ROWS_MARKER = '<!-- filas -->'
+
 def get_filtered_queryset(request):
-    qs = Reservation.objects.select_related('space', 'user', 'schedule').all()
-    fecha_inicio = request.GET.get('fecha_inicio')
-    fecha_fin = request.GET.get('fecha_fin')
-    espacio_id = request.GET.get('espacio')
-    estado = request.GET.get('estado')
-    if fecha_inicio:
-        qs = qs.filter(date__gte=fecha_inicio)
-    if fecha_fin:
-        qs = qs.filter(date__lte=fecha_fin)
-    if espacio_id:
-        qs = qs.filter(space_id=espacio_id)
-    if estado:
-        qs = qs.filter(status=estado)
-    return qs
+    return filter_reservations(report_filters(request.GET))
 
 # Reports (solo admin)
+@login_required
 def filtrar_reservas(request):
     if not request.user.is_admin():
         return HttpResponse("No tienes permiso", status=403)
     reservas = get_filtered_queryset(request)
-    espacios = Space.objects.all()
+    filtros = request.GET.copy()
+    filtros.pop('cursor', None)
+    filtros.pop('todas', None)
+    if request.GET.get('todas'):
+        rows = stream_reservations_table(request, reservas, filtros.urlencode())
+        # Bajo ASGI un iterador síncrono se consumiría entero antes de enviar nada
+        return StreamingHttpResponse(aiter_sync(rows) if isinstance(request, ASGIRequest) else rows)
+    page = KeysetPaginator(reservas, FILTRAR_PAGE_SIZE, with_total=True).page(request.GET.get('cursor'))
+    # Solo id y nombre para el desplegable; los mismos nombres sirven a las estadísticas
+    espacios = list(Space.objects.order_by('name').values_list('id', 'name'))
     return render(request, 'reports/filtrar.html', {
-        'reservas': reservas,
-        'espacios': espacios
+        'reservas': page.object_list,
+        'page': page,
+        'filtros': filtros.urlencode(),
+        'espacios': espacios,
+        'stats': reservation_stats(report_filters(request.GET), dict(espacios)),
     })
 
-def export_reservations_excel(request):
+def stream_reservations_table(request, queryset, filtros):
+    """Todas las reservas filtradas como tabla HTML, enviada en bloques de STREAM_CHUNK_ROWS filas.
+
+    La página (con base.html) se renderiza una vez y se corta en STREAM_ROWS_MARKER: la
+    primera mitad sale antes de la consulta y las filas van entre las dos.
+    """
+    page = render_to_string('reports/todas.html', {'filtros': filtros, 'rows_marker': STREAM_ROWS_MARKER},
+                            request=request)
+    head, tail = page.split(STREAM_ROWS_MARKER)
+    yield head
+    labels = dict(Reservation.STATUS_CHOICES)
+    rows = (queryset.order_by('-date', '-created_at', 'id')
+            .values_list('date', 'space__name', 'start_time', 'end_time',
+                         'user__username', 'status')
+            .iterator(chunk_size=2000))
+    chunk = []
+    for day, space, start, end, username, status in rows:
+        chunk.append(format_html('<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>\n',
+                                 day, space, f'{start:%H:%M} - {end:%H:%M}', username, labels.get(status, status)))
+        if len(chunk) >= STREAM_CHUNK_ROWS:
+            yield ''.join(chunk)
+            chunk = []
+    yield ''.join(chunk)
+    yield tail
+
+def reservation_stats(filters, space_names=None):
+    # Cacheado por filtros y versión de los datos; NumPy se carga solo al calcularlo
+    def build():
+        from .analytics import filtered_stats
+        return filtered_stats(filters, space_names)
+    key = hashlib.md5(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+    return cached('reservation_stats', ('reservation', 'space', 'schedule'), build, key)
+
+@login_required
+async def export_reservations_excel(request):
+    user = await request.auser()
+    if not user.is_admin():
+        return HttpResponse("No tienes permiso.", status=403)
+    # Consulta y escritura del libro en el hilo de la petición, fuera del event loop
+    tmp = await sync_to_async(build_excel_file)(get_filtered_queryset(request))
+    if isinstance(request, ASGIRequest):
+        return async_file_response(tmp, 'reservas.xlsx', EXCEL_CONTENT_TYPE)
+    return FileResponse(tmp, as_attachment=True, filename='reservas.xlsx', content_type=EXCEL_CONTENT_TYPE)
+
+@login_required
+async def export_reservations_pdf(request):
+    user = await request.auser()
+    if not user.is_admin():
+        return HttpResponse("No tienes permiso.", status=403)
+    # Partes de EXPORT_PDF_CHUNK_ROWS filas renderizadas en el pool de exports.py y unidas en disco
+    tmp = await sync_to_async(build_pdf_file)(get_filtered_queryset(request))
+    if tmp is None:
+        return HttpResponse("Error al generar PDF", status=500)
+    if isinstance(request, ASGIRequest):
+        return async_file_response(tmp, 'reservas.pdf', PDF_CONTENT_TYPE)
+    return FileResponse(tmp, as_attachment=True, filename='reservas.pdf', content_type=PDF_CONTENT_TYPE)
+
+@login_required
+async def export_reservations_rows(request):
+    # Filas crudas para integraciones: ?formato=csv|ndjson y gzip=1 para comprimir al vuelo
+    user = await request.auser()
+    if not user.is_admin():
+        return HttpResponse("No tienes permiso.", status=403)
+    fmt = request.GET.get('formato', 'csv').lower()
+    if fmt not in ROW_EXPORT_FORMATS:
+        return HttpResponse("Formato no soportado.", status=400)
+    return rows_response(get_filtered_queryset(request), fmt, compress=request.GET.get('gzip') == '1',
+                         asynchronous=isinstance(request, ASGIRequest))
+
+# Reportes en segundo plano (ver manage.py procesar_reportes)
+@login_required
+def crear_reporte(request):
     if not request.user.is_admin():
         return HttpResponse("No tienes permiso.", status=403)
-    qs = get_filtered_queryset(request)
-    rows = []
-    for r in qs:
-        rows.append({
-            'id': r.id,
-            'user': r.user.username,
-            'space': r.space.name,
-            'date': r.date,
-            'schedule': str(r.schedule),
-            'status': r.status,
-            'created_at': r.created_at,
-        })
-    df = pd.DataFrame(rows)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        df.to_excel(writer, index=False, sheet_name='reservas')
-    output.seek(0)
-    response = HttpResponse(output.read(), content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
-    response['Content-Disposition'] = 'attachment; filename=reservas.xlsx'
-    return response
+    if request.method != 'POST':
+        return redirect('filtrar-reservas')
+    fmt = request.POST.get('formato', '').upper()
+    if fmt not in dict(ReportJob.FORMAT_CHOICES):
+        return HttpResponse("Formato no soportado.", status=400)
+    job, created = request_report_job(fmt, report_filters(request.POST), user=request.user)
+    if created:
+        messages.success(request, "Reporte encolado, se generará en segundo plano.")
+    else:
+        messages.info(request, "Ya existe un reporte con esos filtros, se reutiliza.")
+    return redirect(job)
 
-def export_reservations_pdf(request):
+@login_required
+def reporte_detalle(request, pk):
     if not request.user.is_admin():
         return HttpResponse("No tienes permiso.", status=403)
-    qs = get_filtered_queryset(request)
-    html = render_to_string('reports/reservations_report.html', {'reservations': qs})
-    result = io.BytesIO()
-    pisa_status = pisa.CreatePDF(html, dest=result)
-    if pisa_status.err:
-        return HttpResponse("Error al generar PDF", status=500)
-    response = HttpResponse(result.getvalue(), content_type='application/pdf')
-    response['Content-Disposition'] = 'attachment; filename=reservas.pdf'
-    return response
+    job = get_object_or_404(ReportJob, pk=pk)
+    return render(request, 'reports/report_job.html', {'job': job})
+
+@login_required
+def reporte_estado(request, pk):
+    if not request.user.is_admin():
+        return HttpResponse("No tienes permiso.", status=403)
+    job = get_object_or_404(ReportJob, pk=pk)
+    return JsonResponse({
+        'id': job.pk,
+        'status': job.status,
+        'error': job.error,
+        'download_url': reverse('report-job-download', args=[job.pk]) if job.status == 'DONE' else None,
+    })
+
+@login_required
+def reporte_descargar(request, pk):
+    if not request.user.is_admin():
+        return HttpResponse("No tienes permiso.", status=403)
+    job = get_object_or_404(ReportJob, pk=pk, status='DONE')
+    if not job.file:
+        raise Http404("El archivo del reporte ya no existe.")
+    content_type = EXCEL_CONTENT_TYPE if job.format == 'EXCEL' else PDF_CONTENT_TYPE
+    filename = f"reservas.{REPORT_EXTENSIONS[job.format]}"
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=filename, content_type=content_type)
 
 def accion_reserva(request, pk):
     reserva = get_object_or_404(Reservation, pk=pk)
@@ -284,72 +442,235 @@ def accion_reserva(request, pk):
             messages.warning(request, "Reserva rechazada!")
     return redirect('reservation-list')
 
+# Moderación en bloque: la selección marcada o todo lo que coincide con los filtros
+@login_required
+def moderar_reservas(request):
+    if not request.user.is_admin():
+        return HttpResponse("No tienes permiso", status=403)
+    destino = reverse('filtrar-reservas') + ('?' + request.GET.urlencode() if request.GET else '')
+    if request.method != 'POST':
+        return redirect(destino)
+    accion = request.POST.get('accion')
+    if accion not in MODERATION_ACTIONS:
+        messages.error(request, "Acción no válida.")
+        return redirect(destino)
+    reservas = get_filtered_queryset(request)
+    if request.POST.get('alcance') != 'filtro':
+        ids = [pk for pk in request.POST.getlist('ids') if pk.isdigit()]
+        if not ids:
+            messages.warning(request, "No seleccionaste ninguna reserva.")
+            return redirect(destino)
+        reservas = reservas.filter(pk__in=ids)
+    total = moderate_reservations(reservas, accion)
+    messages.success(request, (
+        f"Confirmadas: {total['confirmadas']}. Rechazadas: {total['rechazadas']}. "
+        f"Notificaciones en cola: {total['notificadas']}."
+    ))
+    return redirect(destino)
+
 # --- GRÁFICOS ESPECIALES EN EL DASHBOARD ---
+# Todos los agregados salen del rollup DailySpaceUsage: el número de consultas no depende
+# de la cantidad de espacios ni de reservas.
 class DashboardView(LoginRequiredMixin, generic.TemplateView):
     template_name = 'dashboard.html'
+    cache_models = ('space', 'schedule', 'reservation')
+
     def get_context_data(self, **kwargs):
         ctx = super().get_context_data(**kwargs)
-        ctx['total_spaces'] = Space.objects.count()
-        ctx['total_reservations'] = Reservation.objects.count()
-        ctx['recent_reservations'] = Reservation.objects.select_related('space','user').order_by('-created_at')[:8]
-        qs = Reservation.objects.all()
-        by_month = (
-            qs.annotate(month=models.functions.TruncMonth('date'))
-              .values('month').annotate(count=Count('id')).order_by('month') )
-        months = [x['month'].strftime('%Y-%m') for x in by_month if x['month']]
-        counts = [x['count'] for x in by_month]
-        ctx['chart_months'] = json.dumps(months)
-        ctx['chart_month_counts'] = json.dumps(counts)
-        top_spaces = (Space.objects
-                      .annotate(res_count=Count('reservations'))
-                      .order_by('-res_count')[:5])
-        ctx['top_labels'] = json.dumps([s.name for s in top_spaces])
-        ctx['top_values'] = json.dumps([s.res_count for s in top_spaces])
-
-        # --- GRÁFICO RESERVAS POR SEMANA ---
-        by_week = (
-            Reservation.objects.filter(status='CONFIRMED')
-            .annotate(week=ExtractWeek('date'))
-            .values('week').annotate(count=Count('id')).order_by('week')
-        )
-        ctx['chart_weeks'] = json.dumps([str(x['week']) for x in by_week if x['week']])
-        ctx['chart_week_counts'] = json.dumps([x['count'] for x in by_week])
-
-        # --- TASA DE USO POR SALA ---
-        total_days = Reservation.objects.values_list('date', flat=True).distinct().count()
-        total_slots = Schedule.objects.count() * total_days or 1
-        salas = Space.objects.all()
-        uso = []
-        labels = []
-        for s in salas:
-            count = Reservation.objects.filter(space=s, status='CONFIRMED').count()
-            perc = (count/total_slots)*100 if total_slots else 0
-            uso.append(round(perc,1))
-            labels.append(s.name)
-        ctx['chart_tasa_labels'] = json.dumps(labels)
-        ctx['chart_tasa_uso'] = json.dumps(uso)
+        # Una sola capa de caché: el diccionario con filas planas, sin instancias de modelos
+        ctx.update(cached('dashboard', self.cache_models, self.dashboard_data))
+        ctx['change_version'] = settled_change_version()
         return ctx
 
+    def dashboard_data(self):
+        # Todos los gráficos salen de una sola lectura del rollup en columnas NumPy
+        from .analytics import ReservationFacts
+        facts = ReservationFacts.from_usage()
+        spaces = list(Space.objects.values_list('id', 'name'))
+        names = dict(spaces)
+        months, month_counts = facts.by_month()
+        weeks, week_counts = facts.confirmed_by_week()
+        top = facts.top_spaces()
+        return {
+            'total_spaces': len(spaces),
+            'total_reservations': facts.total(),
+            'recent_reservations': list(Reservation.objects.order_by('-created_at')
+                                        .values('date', 'space__name', 'user__username', 'status')[:8]),
+            'chart_months': json.dumps(months),
+            'chart_month_counts': json.dumps(month_counts),
+            'top_labels': json.dumps([names.get(pk, str(pk)) for pk, _ in top]),
+            'top_values': json.dumps([n for _, n in top]),
+            # --- GRÁFICO RESERVAS POR SEMANA ---
+            'chart_weeks': json.dumps(weeks),
+            'chart_week_counts': json.dumps(week_counts),
+            # --- TASA DE USO POR SALA ---
+            'chart_tasa_labels': json.dumps([name for _, name in spaces]),
+            'chart_tasa_uso': json.dumps(facts.usage_rate([pk for pk, _ in spaces], Schedule.objects.count())),
+        }
+
+
+
+# Disponibilidad
+AVAILABILITY_MAX_DAYS = 92
+
+@login_required
+async def disponibilidad(request):
+    start = _parse_calendar_date(request.GET.get('fecha_inicio'))
+    end = _parse_calendar_date(request.GET.get('fecha_fin')) or start
+    if not start or end < start or (end - start).days > AVAILABILITY_MAX_DAYS:
+        return JsonResponse({'error': 'Parámetros fecha_inicio/fecha_fin inválidos.'}, status=400)
+    try:
+        min_capacity = int(request.GET.get('capacidad_min') or 0)
+    except ValueError:
+        return JsonResponse({'error': 'capacidad_min debe ser un entero.'}, status=400)
+    grid = await aoccupancy_grid(start, end, space_type=request.GET.get('tipo') or None, min_capacity=min_capacity)
+    libres = []
+    for space_id, *_ in grid.spaces:
+        for day in grid.days():
+            schedule_ids = grid.free_schedule_ids(space_id, day)
+            if schedule_ids:
+                libres.append({'space': space_id, 'date': day.isoformat(), 'schedules': schedule_ids})
+    return JsonResponse({
+        'spaces': {pk: {'name': name, 'type': tipo, 'capacity': cap} for pk, name, tipo, cap in grid.spaces},
+        'schedules': {pk: f"{st.strftime('%H:%M')} - {et.strftime('%H:%M')}" for pk, st, et in grid.schedules},
+        'free': libres,
+    })
+
+@login_required
+def cache_estadisticas(request):
+    if not request.user.is_admin():
+        return HttpResponse("No tienes permiso", status=403)
+    return JsonResponse(cache_stats())
+
+@login_required
+def perf_estadisticas(request):
+    if not request.user.is_admin():
+        return HttpResponse("No tienes permiso", status=403)
+    return JsonResponse({'pid': os.getpid(), 'views': summarize(perf_buffer.snapshot())})
+
+# Ventana máxima (en días) que puede pedir el calendario en una sola consulta
+CALENDAR_MAX_WINDOW_DAYS = 100
 
+def _parse_calendar_date(value):
+    # FullCalendar envía fechas ISO con hora y zona; solo interesa el día
+    try:
+        return date.fromisoformat((value or '')[:10])
+    except ValueError:
+        return None
 
 @login_required
 def calendar_view(request):
-    reservas = Reservation.objects.select_related('space', 'user').filter(status='CONFIRMED')
-    events = []
-    is_admin = request.user.is_admin()  # <-- Cambia aquí y pon los paréntesis
-    for r in reservas:
-        if is_admin:
-            events.append({
-                'title': f"{r.space.name} - {r.user.username}",
-                'start': r.date.strftime('%Y-%m-%d'),
-                'color': '#007bff',
-            })
-        else:
+    return render(request, 'calendar.html', {
+        'is_admin': request.user.is_admin(),
+        'change_version': settled_change_version(),
+    })
+
+@login_required
+async def calendar_events(request):
+    start = _parse_calendar_date(request.GET.get('start'))
+    end = _parse_calendar_date(request.GET.get('end'))
+    if not start or not end or end <= start or (end - start).days > CALENDAR_MAX_WINDOW_DAYS:
+        return JsonResponse({'error': 'Parámetros start/end inválidos.'}, status=400)
+    is_admin = (await request.auser()).is_admin()
+    reservas = Reservation.objects.filter(status='CONFIRMED', date__gte=start, date__lt=end)
+    series = ReservationSeries.objects.filter(status='CONFIRMED', start_date__lt=end, until__gte=start)
+
+    # Una agregación por tabla identifica el contenido de la ventana para GET condicionales;
+    # los títulos usan nombres de espacios y usuarios, que cambian sin tocar las reservas
+    stamp = await reservas.aaggregate(total=Count('id'), last=Max('updated_at'))
+    series_stamp = await series.aaggregate(total=Count('id'), last=Max('updated_at'))
+    names = await sync_to_async(model_versions)('space', 'customuser')
+    etag = quote_etag(hashlib.md5(
+        f"{is_admin}:{start}:{end}:{stamp['total']}:{stamp['last']}:"
+        f"{series_stamp['total']}:{series_stamp['last']}:{names}".encode()
+    ).hexdigest())
+    last = max(filter(None, (stamp['last'], series_stamp['last'])), default=None)
+    last_modified = int(last.timestamp()) if last else None
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        return not_modified
+
+    if is_admin:
+        events = [{
+            'id': r['id'],
+            'title': f"{r['space__name']} - {r['user__username']}",
+            'start': r['date'].strftime('%Y-%m-%d'),
+            'color': '#007bff',
+        } async for r in reservas.order_by('date').values('id', 'date', 'space__name', 'user__username')]
+    else:
+        events = [{
+            'id': pk,
+            'title': 'Ocupado',
+            'start': d.strftime('%Y-%m-%d'),
+            'color': '#dc3545',
+        } async for pk, d in reservas.order_by('date').values_list('id', 'date')]
+    # Ocurrencias de series generadas solo para la ventana pedida; el id no choca con el de las reservas
+    last_day = end - timedelta(days=1)
+    async for serie in (series.select_related('space', 'user') if is_admin else series):
+        for d in serie.dates(start, last_day):
             events.append({
-                'title': 'Ocupado',
-                'start': r.date.strftime('%Y-%m-%d'),
-                'color': '#dc3545',
+                'id': f's{serie.pk}-{d:%Y%m%d}',
+                'title': f"{serie.space.name} - {serie.user.username}" if is_admin else 'Ocupado',
+                'start': d.strftime('%Y-%m-%d'),
+                'color': '#007bff' if is_admin else '#dc3545',
             })
-    reservas_json = mark_safe(json.dumps(events, cls=DjangoJSONEncoder))
-    return render(request, 'calendar.html', {'reservas_json': reservas_json, 'is_admin': is_admin})
-    
\ No newline at end of file
+    response = JsonResponse(events, safe=False)
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+# Horarios ocupados de un espacio y día para deshabilitarlos en el formulario de reserva
+@login_required
+def slot_occupancy(request):
+    try:
+        space_id = int(request.GET['space'])
+        day = date.fromisoformat(request.GET['date'])
+        # Al editar, ?exclude=<id de la reserva> hace que su propio horario no cuente como ocupado
+        exclude = int(request.GET.get('exclude') or 0)
+    except (KeyError, ValueError):
+        return JsonResponse({'error': 'space debe ser un entero y date una fecha aaaa-mm-dd.'}, status=400)
+    taken = slots.taken_schedule_ids(space_id, day, exclude=exclude)
+    return JsonResponse({'space': space_id, 'date': day.isoformat(), 'taken': taken})
+
+# Registro de cambios: las pestañas abiertas consultan solo los deltas
+CHANGES_PAGE_SIZE = 500
+
+@login_required
+async def reservation_changes(request):
+    try:
+        since = int(request.GET.get('since', 0))
+    except ValueError:
+        return JsonResponse({'error': 'since debe ser un entero.'}, status=400)
+    settled = await sync_to_async(settled_change_version)(since)
+    if settled <= since:
+        # 304 solo para quien ya tiene esta versión; sin If-None-Match va la lista vacía
+        etag = quote_etag(f'v{since}')
+        response = get_conditional_response(request, etag=etag) or JsonResponse(
+            {'version': since, 'more': False, 'changes': []})
+        response['ETag'] = etag
+        return response
+    changes = ReservationChange.objects.filter(id__gt=since, id__lte=settled).order_by('id')
+    user = await request.auser()
+    if user.is_admin():
+        rows = [{
+            'version': c['id'], 'reservation': c['reservation_id'], 'action': c['action'],
+            'date': c['date'].isoformat(), 'status': c['status'], 'space': c['space_id'],
+            'title': f"{c['space__name']} - {c['user__username']}",
+        } async for c in changes.values('id', 'reservation_id', 'action', 'date', 'status', 'space_id',
+                                  'space__name', 'user__username')[:CHANGES_PAGE_SIZE + 1]]
+    else:
+        # Solo sus propias reservas; la versión avanza igual aunque no haya ninguna
+        rows = [{
+            'version': c['id'], 'reservation': c['reservation_id'], 'action': c['action'],
+            'date': c['date'].isoformat(), 'status': c['status'],
+        } async for c in changes.filter(user_id=user.pk)
+            .values('id', 'reservation_id', 'action', 'date', 'status')[:CHANGES_PAGE_SIZE + 1]]
+    more = len(rows) > CHANGES_PAGE_SIZE
+    rows = rows[:CHANGES_PAGE_SIZE]
+    version = rows[-1]['version'] if more else settled
+    response = JsonResponse({'version': version, 'more': more, 'changes': rows})
+    response['ETag'] = quote_etag(f'v{version}')
+    return response
@@ -0,0 +1,29 @@
+"""Configuración de la conexión a la base a partir de DATABASE_URL y variables de entorno.
+
+- DB_CONN_MAX_AGE: segundos que una conexión se reutiliza entre peticiones (0 = una por petición).
+- DB_CONN_HEALTH_CHECKS: comprueba la conexión persistente antes de reutilizarla.
+- DB_POOL: usa el pool nativo de psycopg (solo PostgreSQL, requiere psycopg[pool]).
+  Con pool la conexión vuelve al pool al terminar cada petición, así que CONN_MAX_AGE queda en 0.
+- DB_POOL_MIN_SIZE, DB_POOL_MAX_SIZE, DB_POOL_TIMEOUT, DB_POOL_MAX_IDLE: tamaño y tiempos del pool,
+  por proceso (cada worker de gunicorn tiene el suyo; max_size >= GUNICORN_THREADS).
+"""
+import dj_database_url
+
+POSTGRES_ENGINES = ('django.db.backends.postgresql',)
+
+
+def database_config(url, env):
+    pool = env.get('DB_POOL', 'False') == 'True'
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=0 if pool else int(env.get('DB_CONN_MAX_AGE', '60')),
+        conn_health_checks=env.get('DB_CONN_HEALTH_CHECKS', 'True') == 'True',
+    )
+    if pool and config['ENGINE'] in POSTGRES_ENGINES:
+        config.setdefault('OPTIONS', {})['pool'] = {
+            'min_size': int(env.get('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(env.get('DB_POOL_MAX_SIZE', '10')),
+            'timeout': float(env.get('DB_POOL_TIMEOUT', '10')),
+            'max_idle': float(env.get('DB_POOL_MAX_IDLE', '300')),
+        }
+    return config
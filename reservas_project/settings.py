@@ -11,10 +11,10 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 import os
-import dj_database_url
 from pathlib import Path
 from dotenv import load_dotenv
 import sys
+from reservas_project.database import database_config
 
 load_dotenv()
 
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'reservas.middleware.PerformanceMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -86,10 +87,33 @@ if (
 else:
     if not DATABASE_URL:
         raise Exception("Falta la variable DATABASE_URL, verifica tus variables en Railway")
+    # Conexiones persistentes con health checks o pool de psycopg (ver reservas_project/database.py)
     DATABASES = {
-        'default': dj_database_url.config(default=DATABASE_URL)
+        'default': database_config(DATABASE_URL, os.environ)
     }
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # booking.book_reservation, book_weekly y book_series comprueban los solapamientos y guardan
+    # en la misma transacción. En SQLite una transacción DEFERRED solo toma el bloqueo de escritura
+    # al primer INSERT, así que dos reservas simultáneas podrían pasar ambas la comprobación;
+    # IMMEDIATE lo toma al abrirla y serializa esas transacciones (en PostgreSQL lo hace lock_space).
+    DATABASES['default'].setdefault('OPTIONS', {}).setdefault('transaction_mode', 'IMMEDIATE')
+
+# Caché: locmem por defecto; CACHE_BACKEND/CACHE_LOCATION permiten usar archivo, Redis, etc.
+# locmem solo sirve con un proceso: los gunicorn*.conf.py pasan a caché en archivo con varios workers.
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', 'reservas'),
+        'TIMEOUT': int(os.environ.get('CACHE_TIMEOUT', '300')),
+    }
+}
+
+# Instrumentación por vista (reservas.middleware.PerformanceMiddleware)
+PERF_SAMPLE_RATE = float(os.environ.get('PERF_SAMPLE_RATE', '0.1'))
+PERF_BUFFER_SIZE = int(os.environ.get('PERF_BUFFER_SIZE', '500'))
+PERF_PUBLISH_SECONDS = int(os.environ.get('PERF_PUBLISH_SECONDS', '10'))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -117,6 +141,20 @@ STATICFILES_DIRS = [BASE_DIR / 'static'] if (BASE_DIR / 'static').exists() else
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Segundos durante los que un reporte terminado se reutiliza para los mismos filtros
+REPORT_JOB_TTL = int(os.environ.get('REPORT_JOB_TTL', '600'))
+# Segundos tras los que un hueco en los ids del registro de cambios se da por definitivo (ver
+# reservas.changes); debe superar la duración de la transacción de escritura más larga
+CHANGES_SETTLE_SECONDS = int(os.environ.get('CHANGES_SETTLE_SECONDS', '30'))
+# Segundos en RUNNING tras los que un reporte se da por perdido (worker caído) y se marca fallido
+REPORT_JOB_STALE_SECONDS = int(os.environ.get('REPORT_JOB_STALE_SECONDS', '1800'))
+# Hilos para renderizar PDF desde las vistas asíncronas de exportación
+EXPORT_RENDER_WORKERS = int(os.environ.get('EXPORT_RENDER_WORKERS', '2'))
+# Filas por parte del PDF (cada parte se renderiza por separado y se unen con pypdf) y procesos
+# para renderizarlas; 0 usa los hilos de EXPORT_RENDER_WORKERS
+EXPORT_PDF_CHUNK_ROWS = int(os.environ.get('EXPORT_PDF_CHUNK_ROWS', '250'))
+EXPORT_PDF_PROCESSES = int(os.environ.get('EXPORT_PDF_PROCESSES', '0'))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
@@ -0,0 +1,9 @@
+"""Ajustes para `manage.py test` (manage.py los elige por defecto para ese comando)."""
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # ConcurrentBookingTests reserva desde varios hilos: la base de tests en memoria compartida
+    # bloquea por tabla y falla al instante; en archivo los hilos esperan el bloqueo de escritura
+    DATABASES['default'].setdefault('TEST', {}).setdefault('NAME', BASE_DIR / 'test_db.sqlite3')
+    DATABASES['default']['OPTIONS'].setdefault('timeout', 20)